@@ -0,0 +1,123 @@
+"""
+プロセス一覧を名前・ユーザー・親プロセス・プロセスツリー・cgroup ごとに集計します
+
+各列を NumPy 配列にしてから np.unique / np.bincount / np.lexsort でまとめて計算するため、
+グループの数やプロセスの数によらず Python のループはグループごとの上位メンバーの取り出しだけです
+"""
+import time
+from typing import List, NamedTuple, Sequence
+
+import numpy as np
+
+__all__ = [
+    "GROUP_KEYS",
+    "ProcessGroup",
+    "aggregate",
+]
+
+GROUP_KEYS = ("name", "user", "parent", "tree", "cgroup")
+MAX_TREE_DEPTH = 64
+
+
+class ProcessGroup(NamedTuple):
+    label: str
+    count: int
+    rss: int
+    vms: int
+    members: List[int]  # RSS の大きい順の pid
+
+
+def _tree_roots(pids: np.ndarray, ppids: np.ndarray) -> np.ndarray:
+    """
+    各プロセスが属するツリーの根 (init の直下、または親が一覧にないプロセス) のインデックス
+    """
+    count = len(pids)
+    order = np.argsort(pids)
+    sorted_pids = pids[order]
+    pos = np.minimum(np.searchsorted(sorted_pids, ppids), max(count - 1, 0))
+    found = (sorted_pids[pos] == ppids) & (ppids > 1)
+    parent = np.where(found, order[pos], np.arange(count))
+
+    # ポインタジャンプで根まで辿る (PID の再利用で循環している場合に備えて回数を制限する)
+    for _ in range(MAX_TREE_DEPTH):
+        grand = parent[parent]
+        if np.array_equal(grand, parent):
+            break
+        parent = grand
+    return parent
+
+
+def aggregate(infos: Sequence[dict], by: str, top: int = 5) -> List[ProcessGroup]:
+    """
+    infos を by ごとに集計し、RSS の合計が大きい順に返します
+    """
+    count = len(infos)
+    if not count:
+        return []
+
+    pids = np.fromiter((info["pid"] for info in infos), np.int64, count)
+    rss = np.fromiter((info["memory_info"].rss for info in infos), np.float64, count)
+    vms = np.fromiter((info["memory_info"].vms for info in infos), np.float64, count)
+    names = [info["name"] for info in infos]
+
+    if by == "name":
+        keys, inverse = np.unique(np.array(names, dtype=object), return_inverse=True)
+        labels = [str(key) for key in keys]
+
+    elif by in ("user", "cgroup"):
+        keys, inverse = np.unique(np.array([info.get(by) or "" for info in infos], dtype=object),
+                                  return_inverse=True)
+        labels = [str(key) or "(不明)" for key in keys]
+
+    elif by == "parent":
+        ppids = np.fromiter((info.get("ppid") or 0 for info in infos), np.int64, count)
+        keys, inverse = np.unique(ppids, return_inverse=True)
+        by_pid = dict(zip(pids.tolist(), names))
+        labels = [f"{by_pid.get(ppid, '?')} ({ppid})" for ppid in keys.tolist()]
+
+    elif by == "tree":
+        ppids = np.fromiter((info.get("ppid") or 0 for info in infos), np.int64, count)
+        keys, inverse = np.unique(_tree_roots(pids, ppids), return_inverse=True)
+        labels = [f"{names[root]} ({pids[root]})" for root in keys.tolist()]
+
+    else:
+        raise ValueError(f"invalid group key: {by!r}")
+
+    inverse = inverse.ravel()
+    groups = len(labels)
+    counts = np.bincount(inverse, minlength=groups)
+    rss_sums = np.bincount(inverse, weights=rss, minlength=groups)
+    vms_sums = np.bincount(inverse, weights=vms, minlength=groups)
+
+    # グループ順、その中は RSS の大きい順に並べて、各グループの先頭 top 件を取り出す
+    order = np.lexsort((-rss, inverse))
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    member_pids = pids[order]
+
+    result = [
+        ProcessGroup(
+            label=labels[group],
+            count=int(counts[group]),
+            rss=int(rss_sums[group]),
+            vms=int(vms_sums[group]),
+            members=member_pids[starts[group]:starts[group] + min(top, counts[group])].tolist(),
+        )
+        for group in np.argsort(-rss_sums, kind="stable").tolist()
+    ]
+    return result
+
+
+if __name__ == "__main__":
+    # 現在のプロセス一覧を各キーで集計し、集計にかかった時間を表示する
+    from scanner import ProcessSnapshotEngine
+
+    _engine = ProcessSnapshotEngine()
+    _engine.update()
+    _infos = list(_engine.processes.values())
+    for _by in GROUP_KEYS:
+        _start = time.perf_counter()
+        _groups = aggregate(_infos, _by)
+        _elapsed = time.perf_counter() - _start
+        print(f"--- {_by}: {len(_groups)} groups, {_elapsed * 1e3:.2f} ms ({len(_infos)} processes)")
+        for _group in _groups[:5]:
+            print(f"  {_group.label:<40} {_group.count:>5} {_group.rss / 1024 ** 2:>10,.1f} MB  {_group.members}")
@@ -0,0 +1,205 @@
+import json
+import traceback
+from pathlib import Path
+
+__all__ = [
+    "REFRESH_RATE_AUTO",
+    "RamNotifyConfig",
+]
+
+REFRESH_RATE_AUTO = 0
+
+
+class RamNotifyConfig(object):
+    def __init__(self, filename: Path):
+        self.config = filename
+        self.virtual_percent = 90
+        self.swap_percent = 90
+        self.virtual_notify = False
+        self.virtual_command_call = False
+        self.virtual_command = ""
+        self.virtual_command_call_repeat = 0
+        self.swap_notify = False
+        self.swap_command_call = False
+        self.swap_command = ""
+        self.swap_command_call_repeat = 0
+        self.swap_custom_size = False
+        self.swap_custom_size_max = 1
+        self.refresh_rate_ms = 5000
+        self.refresh_rate_min_ms = 500
+        self.refresh_rate_max_ms = 1000 * 30
+        self.notify_cool_ms = 1000 * 60 * 30
+        self.task_bar_icon = 0
+        self.enable_processlist_app = False
+        # shadow
+        self.virtual_command_call_delay = 10
+        self.swap_command_call_delay = 10
+        self.forecast = False
+        self.forecast_lead_sec = 60
+        self.forecast_window_sec = 60
+        self.history_file = False
+        self.history_file_max_mb = 16
+        self.pressure_trigger = False
+        self.pressure_stall_ms = 150
+        self.pressure_window_ms = 1000
+        self.pressure_idle_ms = 60000
+        self.processlist_live = False
+        self.processlist_live_interval_ms = 2000
+        self.processlist_memory_detail = False
+        self.processlist_memory_detail_budget_ms = 200
+        self.processlist_growth_window_sec = 300
+        self.processlist_growth_alert = False
+        self.processlist_growth_alert_mb_min = 10
+        self.processlist_plot_backend = "gcdc"
+
+        #
+        self.first_load = False
+
+    @property
+    def history_path(self):
+        return self.config.parent / "history.bin"
+
+    def load(self):
+        if not self.config.is_file():
+            self.save()
+            self.first_load = True
+        else:
+            self.first_load = False
+
+        with self.config.open("r", encoding="utf-8") as file:
+            try:
+                config: dict = json.load(file) or {}
+            except json.JSONDecodeError:
+                traceback.print_exc()
+                config = {}
+
+        try:
+            _virtual = config.get("virtual") or {}
+            self.virtual_percent = int(_virtual.get("percentage") or 90)
+            self.virtual_notify = bool(_virtual.get("notify"))
+            self.virtual_command_call = bool(_virtual.get("call_command"))
+            self.virtual_command = str(_virtual.get("command") or "")
+            self.virtual_command_call_delay = int(_virtual.get("command_call_delay") or 10)
+            self.virtual_command_call_repeat = int(_virtual.get("command_call_repeat") or 0)
+
+            _swap = config.get("swap") or {}
+            self.swap_percent = int(_swap.get("percentage") or 90)
+            self.swap_notify = bool(_swap.get("notify"))
+            self.swap_command_call = bool(_swap.get("call_command"))
+            self.swap_command = str(_swap.get("command") or "")
+            self.swap_command_call_delay = int(_swap.get("command_call_delay") or 10)
+            self.swap_command_call_repeat = int(_swap.get("command_call_repeat") or 0)
+            self.swap_custom_size = bool(_swap.get("custom_size"))
+            self.swap_custom_size_max = int(_swap.get("custom_size_max") or 1)
+
+            self.notify_cool_ms = int(config.get("notify_cool_ms") or 1000 * 60 * 30)
+            self.task_bar_icon = int(config.get("task_bar_icon") or 0)
+            self.enable_processlist_app = bool(config.get("enable_processlist_app"))
+
+            _forecast = config.get("forecast") or {}
+            self.forecast = bool(_forecast.get("enabled"))
+            self.forecast_lead_sec = int(_forecast.get("lead_sec") or 60)
+            self.forecast_window_sec = max(5, int(_forecast.get("window_sec") or 60))
+
+            _history = config.get("history") or {}
+            self.history_file = bool(_history.get("file"))
+            self.history_file_max_mb = max(1, int(_history.get("file_max_mb") or 16))
+
+            _pressure = config.get("pressure") or {}
+            self.pressure_trigger = bool(_pressure.get("trigger"))
+            self.pressure_stall_ms = int(_pressure.get("stall_ms") or 150)
+            self.pressure_window_ms = int(_pressure.get("window_ms") or 1000)
+            self.pressure_idle_ms = max(1000, int(_pressure.get("idle_ms") or 60000))
+
+            _processlist = config.get("processlist") or {}
+            self.processlist_live = bool(_processlist.get("live"))
+            self.processlist_live_interval_ms = max(500, int(_processlist.get("live_interval_ms") or 2000))
+            self.processlist_memory_detail = bool(_processlist.get("memory_detail"))
+            self.processlist_memory_detail_budget_ms = max(10, int(_processlist.get("memory_detail_budget_ms") or 200))
+            self.processlist_growth_window_sec = max(30, int(_processlist.get("growth_window_sec") or 300))
+            self.processlist_growth_alert = bool(_processlist.get("growth_alert"))
+            self.processlist_growth_alert_mb_min = max(1, int(_processlist.get("growth_alert_mb_min") or 10))
+            self.processlist_plot_backend = str(_processlist.get("plot_backend") or "gcdc")
+            if self.processlist_plot_backend not in ("gcdc", "numpy"):
+                self.processlist_plot_backend = "gcdc"
+
+            refresh_rate_ms = 5000
+            if "refresh_rate_ms" in config:
+                refresh_rate_ms = int(config["refresh_rate_ms"])
+            elif "refresh_rate" in config:  # old ver
+                presets = [
+                    500,
+                    1000,
+                    1000 * 5,
+                    1000 * 10,
+                    1000 * 30,
+                    1000 * 60,
+                    1000 * 60 * 5,
+                ]
+                try:
+                    refresh_rate_ms = presets[max(0, min(int(config["refresh_rate"]), len(presets) - 1))]
+                except (KeyError, ValueError):
+                    pass
+            self.refresh_rate_ms = refresh_rate_ms
+            self.refresh_rate_min_ms = max(100, int(config.get("refresh_rate_min_ms") or 500))
+            self.refresh_rate_max_ms = max(self.refresh_rate_min_ms,
+                                           int(config.get("refresh_rate_max_ms") or 1000 * 30))
+
+        except (TypeError, ValueError):
+            traceback.print_exc()
+
+    def save(self):
+        config = dict(
+            version=1,
+            virtual=dict(
+                percentage=self.virtual_percent,
+                notify=self.virtual_notify,
+                call_command=self.virtual_command_call,
+                command=self.virtual_command,
+                command_call_delay=self.virtual_command_call_delay,
+                command_call_repeat=self.virtual_command_call_repeat,
+            ),
+            swap=dict(
+                percentage=self.swap_percent,
+                notify=self.swap_notify,
+                call_command=self.swap_command_call,
+                command=self.swap_command,
+                command_call_delay=self.swap_command_call_delay,
+                command_call_repeat=self.swap_command_call_repeat,
+                custom_size=self.swap_custom_size,
+                custom_size_max=self.swap_custom_size_max,
+            ),
+            task_bar_icon=self.task_bar_icon,
+            refresh_rate_ms=self.refresh_rate_ms,
+            refresh_rate_min_ms=self.refresh_rate_min_ms,
+            refresh_rate_max_ms=self.refresh_rate_max_ms,
+            notify_cool_ms=self.notify_cool_ms,
+            enable_processlist_app=self.enable_processlist_app,
+            forecast=dict(
+                enabled=self.forecast,
+                lead_sec=self.forecast_lead_sec,
+                window_sec=self.forecast_window_sec,
+            ),
+            history=dict(
+                file=self.history_file,
+                file_max_mb=self.history_file_max_mb,
+            ),
+            pressure=dict(
+                trigger=self.pressure_trigger,
+                stall_ms=self.pressure_stall_ms,
+                window_ms=self.pressure_window_ms,
+                idle_ms=self.pressure_idle_ms,
+            ),
+            processlist=dict(
+                live=self.processlist_live,
+                live_interval_ms=self.processlist_live_interval_ms,
+                memory_detail=self.processlist_memory_detail,
+                memory_detail_budget_ms=self.processlist_memory_detail_budget_ms,
+                growth_window_sec=self.processlist_growth_window_sec,
+                growth_alert=self.processlist_growth_alert,
+                growth_alert_mb_min=self.processlist_growth_alert_mb_min,
+                plot_backend=self.processlist_plot_backend,
+            ),
+        )
+        with self.config.open("w", encoding="utf-8") as file:
+            json.dump(config, file, ensure_ascii=False)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 各モジュールはスクリプトとして実行されるため、同じディレクトリのモジュールを名前で import している
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
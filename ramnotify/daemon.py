@@ -0,0 +1,166 @@
+"""
+wx を使わずに監視エンジンだけを実行するヘッドレスモード
+
+    python ramnotify.py --daemon
+"""
+import heapq
+import itertools
+import signal
+import sys
+import threading
+import time
+import traceback
+from pathlib import Path
+from typing import Callable
+
+from config import RamNotifyConfig
+from engine import MonitorEngine
+from history import MemoryHistory
+from historyfile import HistoryWriter
+from pressure import PressureWatcher
+from sampler import MemorySampler
+
+__all__ = [
+    "EventLoop",
+    "main",
+]
+
+
+class _CallLater(object):
+    def __init__(self, loop: "EventLoop", when: float, func: Callable, args: tuple):
+        self._loop = loop
+        self.when = when
+        self.func = func
+        self.args = args
+        self._running = True
+
+    def Stop(self):
+        self._running = False
+
+    def IsRunning(self):
+        return self._running
+
+    def _run(self):
+        if self._running:
+            self._running = False
+            self.func(*self.args)
+
+
+class EventLoop(object):
+    """
+    wx.CallLater / wx.CallAfter 相当の呼び出しを1スレッドで処理する簡易イベントループ
+    """
+
+    def __init__(self):
+        self._queue = []  # type: list[tuple[float, int, _CallLater]]
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._stopped = False
+
+    def call_later(self, millis: float, func: Callable, *args) -> _CallLater:
+        call = _CallLater(self, time.monotonic() + millis / 1000, func, args)
+        with self._cond:
+            heapq.heappush(self._queue, (call.when, next(self._counter), call))
+            self._cond.notify()
+        return call
+
+    def call_after(self, func: Callable, *args) -> _CallLater:
+        return self.call_later(0, func, *args)
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+    def run(self):
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    if self._queue:
+                        delay = self._queue[0][0] - time.monotonic()
+                        if delay <= 0:
+                            break
+                        self._cond.wait(delay)
+                    else:
+                        self._cond.wait()
+
+                if self._stopped:
+                    return
+                _, _, call = heapq.heappop(self._queue)
+
+            try:
+                call._run()
+            except (Exception,):
+                traceback.print_exc()
+
+
+class Daemon(object):
+    def __init__(self, config: RamNotifyConfig):
+        self.config = config
+        self.loop = EventLoop()
+        self.sampler = MemorySampler()
+        self.history = MemoryHistory()
+        self.history_writer = None  # type: HistoryWriter | None
+        self.engine = MonitorEngine(config, call_later=self.loop.call_later, call_after=self.loop.call_after,
+                                    history=self.history)
+        self.pressure_watcher = None  # type: PressureWatcher | None
+        self._tick = None  # type: _CallLater | None
+
+        self.sampler.subscribe(self.history.add)
+        self.sampler.subscribe(self.engine.check_limits)
+        if config.history_file:
+            self.history_writer = HistoryWriter(config.history_path, max_bytes=config.history_file_max_mb * 1024 ** 2)
+            self.sampler.subscribe(self.history_writer.add)
+
+    def on_timer(self):
+        if self._tick:
+            self._tick.Stop()
+
+        snapshot = None
+        try:
+            snapshot = self.sampler.sample()
+        finally:
+            pressure_watched = bool(self.pressure_watcher and self.pressure_watcher.is_running)
+            self._tick = self.loop.call_later(
+                self.engine.get_refresh_rate_ms(snapshot, pressure_watched=pressure_watched), self.on_timer)
+
+    def on_pressure(self):
+        self.loop.call_after(self.on_timer)
+
+    def run(self):
+        if self.config.pressure_trigger:
+            watcher = PressureWatcher(
+                self.on_pressure,
+                stall_ms=self.config.pressure_stall_ms,
+                window_ms=self.config.pressure_window_ms,
+            )
+            if watcher.start():
+                self.pressure_watcher = watcher
+
+        self.loop.call_after(self.on_timer)
+        try:
+            self.loop.run()
+        finally:
+            if self.pressure_watcher:
+                self.pressure_watcher.stop()
+            self.engine.close()
+            self.sampler.close()
+            if self.history_writer:
+                self.history_writer.close()
+
+
+def main():
+    config = RamNotifyConfig(Path(sys.argv[0]).parent / "settings.json")
+    config.load()
+    daemon = Daemon(config)
+
+    signal.signal(signal.SIGINT, lambda *_: daemon.loop.stop())
+    signal.signal(signal.SIGTERM, lambda *_: daemon.loop.stop())
+
+    print(f"RAM-Notify daemon started (config: {config.config})")
+    daemon.run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
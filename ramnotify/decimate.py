@@ -0,0 +1,134 @@
+"""
+グラフに描く点をキャンバスの幅程度まで間引きます
+
+Largest-Triangle-Three-Buckets (LTTB) と、バケットごとの最小値・最大値を残す方法を NumPy で実装しています
+どちらも突出した値 (スパイク) を残すため、細い線でも見た目が大きく変わりません
+"""
+import time
+from typing import Hashable, Optional
+
+import numpy as np
+
+__all__ = [
+    "lttb",
+    "minmax",
+    "DecimationCache",
+]
+
+
+def _bucket_edges(count: int, buckets: int) -> np.ndarray:
+    # 先頭と末尾の点は必ず残すため、その間を buckets 個に分ける
+    return np.linspace(1, count - 1, buckets + 1).astype(np.int64)
+
+
+def lttb(values: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    LTTB で残す点のインデックス (昇順, threshold 件)
+
+    各バケットから、前のバケットで選んだ点と次のバケットの平均点とで作る三角形が最も大きくなる点を選びます
+    """
+    count = len(values)
+    if threshold >= count or threshold < 3:
+        return np.arange(count)
+
+    edges = _bucket_edges(count, threshold - 2)
+    starts, ends = edges[:-1], edges[1:]
+
+    # 次のバケットの平均点 (最後のバケットの次は末尾の点)
+    sums = np.concatenate(([0.], np.cumsum(values)))
+    next_starts = np.append(starts[1:], count - 1)
+    next_ends = np.append(ends[1:], count)
+    next_x = (next_starts + next_ends - 1) / 2
+    next_y = (sums[next_ends] - sums[next_starts]) / (next_ends - next_starts)
+
+    indexes = np.empty(threshold, dtype=np.int64)
+    indexes[0] = 0
+    indexes[-1] = count - 1
+    a = 0
+    for bucket, (start, end) in enumerate(zip(starts.tolist(), ends.tolist())):
+        xs = np.arange(start, end)
+        ys = values[start:end]
+        # 三角形の面積の2倍 (符号を除く)
+        areas = np.abs((a - next_x[bucket]) * (ys - values[a]) - (a - xs) * (next_y[bucket] - values[a]))
+        a = start + int(np.argmax(areas))
+        indexes[bucket + 1] = a
+    return indexes
+
+
+def minmax(values: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    threshold / 2 個のバケットそれぞれの最小値と最大値の点のインデックス (昇順)
+    """
+    count = len(values)
+    buckets = (threshold - 2) // 2
+    if threshold >= count or buckets < 1:
+        return np.arange(count)
+
+    edges = _bucket_edges(count, buckets)
+    size = int(np.max(np.diff(edges)))
+    # バケットの長さを揃えるため、範囲外は各バケットの先頭の点で埋める
+    offsets = edges[:-1, None] + np.arange(size)[None, :]
+    offsets = np.where(offsets < edges[1:, None], offsets, edges[:-1, None])
+    block = values[offsets]
+    rows = np.arange(buckets)
+    picked = np.concatenate((
+        [0],
+        offsets[rows, np.argmin(block, axis=1)],
+        offsets[rows, np.argmax(block, axis=1)],
+        [count - 1],
+    ))
+    return np.unique(picked)
+
+
+class DecimationCache(object):
+    """
+    系列ごとに間引いた結果を保持し、version か threshold が変わるまで再計算しません
+
+    version には値の内容を特定できるもの (履歴の段・統計値・表示範囲・更新番号の組など) を渡してください
+    """
+    METHODS = dict(lttb=lttb, minmax=minmax)
+
+    def __init__(self, method: str = "lttb"):
+        self.method = method
+        self._entries = {}  # type: dict[Hashable, tuple[tuple, np.ndarray]]
+
+    def __repr__(self):
+        return f"<{type(self).__name__} method={self.method!r} entries={len(self._entries)}>"
+
+    def clear(self):
+        self._entries.clear()
+
+    def indexes(self, key: Hashable, values: np.ndarray, threshold: int,
+                version: Optional[Hashable] = None) -> np.ndarray:
+        """
+        values を threshold 件程度に間引いたインデックス (version が None の場合はキャッシュしません)
+        """
+        state = (version, threshold, len(values), self.method)
+        if version is not None:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == state:
+                return entry[1]
+
+        result = self.METHODS[self.method](values, threshold)
+        if version is not None:
+            self._entries[key] = state, result
+        return result
+
+
+if __name__ == "__main__":
+    # 24時間分の秒単位の擬似データを 600 点へ間引くコストと、スパイクが残るかを表示する
+    _rng = np.random.default_rng(0)
+    _values = np.cumsum(_rng.normal(0, 1, 86400)) + 1000
+    _spike = 43210
+    _values[_spike] += 500
+    for _name, _method in DecimationCache.METHODS.items():
+        _start = time.perf_counter()
+        _indexes = _method(_values, 600)
+        _elapsed = time.perf_counter() - _start
+        print(f"{_name:>6}: {_elapsed * 1e3:.2f} ms, {len(_indexes)} points, spike kept: {_spike in _indexes}")
+
+    _cache = DecimationCache()
+    _cache.indexes("physical", _values, 600, version=1)
+    _start = time.perf_counter()
+    _cache.indexes("physical", _values, 600, version=1)
+    print(f"cached: {(time.perf_counter() - _start) * 1e6:.1f} us")
@@ -0,0 +1,312 @@
+import subprocess
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from config import REFRESH_RATE_AUTO, RamNotifyConfig
+from forecast import TrendForecaster
+from history import MemoryHistory
+from sampler import MemorySnapshot
+from scheduler import AdaptiveScheduler
+
+__all__ = [
+    "CoolTime",
+    "Timer",
+    "MonitorEngine",
+]
+
+# wx.CallLater / wx.CallAfter 互換の呼び出し (GUI に依存しないため注入する)
+CallLater = Callable[..., Any]
+CallAfter = Callable[..., None]
+
+
+class CoolTime(object):
+    def __init__(self, cool_seconds: int):
+        self.cool = cool_seconds
+        self.last_check = 0
+
+    @property
+    def is_cool(self):
+        return time.time() - self.last_check > self.cool
+
+    def set(self):
+        self.last_check = time.time()
+
+
+class Timer(object):
+    def __init__(self, id_: str, on_timer, seconds: int = None, *, call_later: CallLater):
+        self.id = id_
+        self.on_timer = on_timer  # type: Callable[[Timer], None]
+        self.delay = seconds or 60
+        self._call_later = call_later
+        self._timer = None  # type: Any  # wx.CallLater 互換 (Stop / IsRunning)
+
+    def __repr__(self):
+        return f"<{type(self).__name__} id={self.id!r} isRunning={self.is_running!r}>"
+
+    def change_delay(self, seconds: int):
+        self.delay = seconds
+
+    def stop(self, *, restart=False):
+        if self._timer:
+            self._timer.Stop()
+            self._timer = None
+            if not restart:
+                print(f"Stop timer: {self!r}")
+            return True
+
+    def start(self):
+        if self.stop(restart=True):
+            print(f"Restart timer: {self!r}")
+        else:
+            print(f"Start timer: {self!r}")
+        self._timer = self._call_later(self.delay * 1000, self._on_time)
+
+    def _on_time(self):
+        self.on_timer(self)
+
+    @property
+    def is_running(self):
+        return self._timer.IsRunning() if self._timer else False
+
+
+class MonitorEngine(object):
+    """
+    しきい値の判定、通知の頻度制御、コマンドの実行を行います
+
+    GUI には依存せず、タイマーとメインスレッドへの呼び出しは call_later / call_after で注入します
+    """
+
+    def __init__(self, config: RamNotifyConfig, *, call_later: CallLater, call_after: CallAfter,
+                 history: MemoryHistory = None):
+        self.config = config
+        self.call_after = call_after
+        self.scheduler = AdaptiveScheduler(config.refresh_rate_min_ms, config.refresh_rate_max_ms)
+        self.forecaster = TrendForecaster(history, config.forecast_window_sec) if history else None
+        # last-cache
+        self.last_virtual_over = False
+        self.last_swap_over = False
+        # timer
+        self.cool_notify = CoolTime(int(config.notify_cool_ms / 1000))
+        self.cool_virtual_command = CoolTime(config.virtual_command_call_delay)
+        self.cool_swap_command = CoolTime(config.swap_command_call_delay)
+        self.wait_virtual_command_wait = False
+        self.wait_swap_command_wait = False
+        self.timer_virtual_command = Timer(
+            "VCmdTimer", self.on_timer_virtual_command,
+            config.virtual_command_call_repeat * 60, call_later=call_later)
+        self.timer_swap_command = Timer(
+            "SCmdTimer", self.on_timer_swap_command,
+            config.swap_command_call_repeat * 60, call_later=call_later)
+        # hooks
+        self.on_notify = None  # type: Callable[[str, str], None] | None
+        self.on_command_state = None  # type: Callable[[str, bool], None] | None
+
+    def close(self):
+        self.timer_virtual_command.stop()
+        self.timer_swap_command.stop()
+
+    def notify(self, title: str, message: str):
+        print(f"notify: {title}: {message}")
+        if self.on_notify:
+            self.on_notify(title, message)
+
+    def predict_seconds(self, snapshot: MemorySnapshot):
+        """
+        (物理メモリ, 論理メモリ) がしきい値に達するまでの推定秒数。予測が無効か、先行時間より先の場合は None
+        """
+        if not (self.config.forecast and self.forecaster):
+            return None, None
+
+        if self.config.swap_custom_size:
+            swap_total = self.config.swap_custom_size_max * (1024 ** 3)
+        else:
+            swap_total = snapshot.swap_total
+
+        lead = self.config.forecast_lead_sec
+        self.forecaster.window = self.config.forecast_window_sec
+        etas = (
+            self.forecaster.seconds_to_limit("physical", snapshot.total, self.config.virtual_percent, snapshot.time),
+            self.forecaster.seconds_to_limit("swap", swap_total, self.config.swap_percent, snapshot.time),
+        )
+        return tuple(eta if eta is not None and eta <= lead else None for eta in etas)
+
+    def check_limits(self, snapshot: MemorySnapshot):
+        # notify / run-command
+        virtual = snapshot.percent
+        swap = self.get_swap_percent(snapshot)  # load from config value
+        virtual_eta, swap_eta = self.predict_seconds(snapshot)
+        notify_send = False
+
+        virtual_over = virtual >= self.config.virtual_percent
+        if virtual_over or virtual_eta is not None:
+            if self.config.virtual_notify and self.cool_notify.is_cool:
+                self.cool_notify.set()
+                if virtual_over:
+                    self.notify("メモリ通知", f"物理メモリ 使用率が{int(virtual)}%です！")
+                else:
+                    self.notify("メモリ通知", f"物理メモリ 使用率が約{int(virtual_eta)}秒後に"
+                                          f"{self.config.virtual_percent}%を超える見込みです (現在 {int(virtual)}%)")
+                notify_send = True
+
+            if self.last_virtual_over:
+                if self.config.virtual_command_call and self.cool_virtual_command.is_cool:
+                    self.cool_virtual_command.set()
+                    self.call_command_virtual()
+
+        self.last_virtual_over = virtual_over or virtual_eta is not None
+        if self.last_virtual_over:
+            if not self.timer_virtual_command.is_running and self.is_enable_virtual_timer:
+                self.timer_virtual_command.start()
+        else:
+            self.timer_virtual_command.stop()
+
+        swap_over = swap >= self.config.swap_percent
+        if swap_over or swap_eta is not None:
+            if self.config.swap_notify and self.cool_notify.is_cool and not notify_send:
+                self.cool_notify.set()
+                if swap_over:
+                    self.notify("メモリ通知", f"論理メモリ 使用率が{int(swap)}%です！")
+                else:
+                    self.notify("メモリ通知", f"論理メモリ 使用率が約{int(swap_eta)}秒後に"
+                                          f"{self.config.swap_percent}%を超える見込みです (現在 {int(swap)}%)")
+
+            if self.last_swap_over:
+                if self.config.swap_command_call and self.cool_swap_command.is_cool:
+                    self.cool_swap_command.set()
+                    self.call_command_swap()
+
+        self.last_swap_over = swap_over or swap_eta is not None
+        if self.last_swap_over:
+            if not self.timer_swap_command.is_running and self.is_enable_swap_timer:
+                self.timer_swap_command.start()
+        else:
+            self.timer_swap_command.stop()
+
+    def on_timer_virtual_command(self, timer: Timer):
+        timer.start()
+        self.call_command_virtual()
+
+    def on_timer_swap_command(self, timer: Timer):
+        timer.start()
+        self.call_command_swap()
+
+    # command
+
+    def call_command(self, command: str, *, on_done: Callable[[Optional[int]], None] = None):
+        print(f"call-command: {command!r}")
+
+        def call():
+            code = None
+            try:
+                process = subprocess.Popen(command, shell=True, start_new_session=True)
+                process.wait()
+                code = process.returncode
+            finally:
+                def finish():
+                    print("call-command complete:", code)
+                    if on_done:
+                        on_done(code)
+                self.call_after(finish)
+
+        th = threading.Thread(target=call, daemon=True)
+        th.start()
+
+    def _set_command_state(self, kind: str, running: bool):
+        if self.on_command_state:
+            self.on_command_state(kind, running)
+
+    def call_command_virtual(self, command: str = None):
+        if self.wait_virtual_command_wait:
+            return
+
+        def done_action(_):
+            self.wait_virtual_command_wait = False
+            self._set_command_state("virtual", False)
+
+        if command is None:
+            command = self.config.virtual_command
+
+        if command:
+            self.wait_virtual_command_wait = True
+            self._set_command_state("virtual", True)
+            self.call_command(command, on_done=done_action)
+
+    def call_command_swap(self, command: str = None):
+        if self.wait_swap_command_wait:
+            return
+
+        def done_action(_):
+            self.wait_swap_command_wait = False
+            self._set_command_state("swap", False)
+
+        if command is None:
+            command = self.config.swap_command
+
+        if command:
+            self.wait_swap_command_wait = True
+            self._set_command_state("swap", True)
+            self.call_command(command, on_done=done_action)
+
+    # config
+
+    def apply_config(self, snapshot: MemorySnapshot):
+        self.timer_virtual_command.stop()
+        if self.is_enable_virtual_timer:
+            self.timer_virtual_command.change_delay(self.config.virtual_command_call_repeat * 60)
+
+            if snapshot.percent >= self.config.virtual_percent:
+                self.timer_virtual_command.start()
+
+        self.timer_swap_command.stop()
+        if self.is_enable_swap_timer:
+            self.timer_swap_command.change_delay(self.config.swap_command_call_repeat * 60)
+
+            if self.get_swap_percent(snapshot) >= self.config.swap_percent:
+                self.timer_swap_command.start()
+
+        self.cool_notify.cool = int(self.config.notify_cool_ms / 1000)
+        self.scheduler.min_ms = self.config.refresh_rate_min_ms
+        self.scheduler.max_ms = self.config.refresh_rate_max_ms
+        self.scheduler.reset()
+
+    def get_swap_percent(self, snapshot: MemorySnapshot, max_size: int = None):
+        if self.config.swap_custom_size or max_size:
+            return snapshot.get_swap_percent(max_size if max_size else self.config.swap_custom_size_max)
+        return snapshot.swap_percent
+
+    def get_refresh_rate_ms(self, snapshot: MemorySnapshot = None, *, pressure_watched: bool = False):
+        """
+        次の監視までの間隔
+
+        pressure_watched: PSI トリガーで起こされる場合 (かつ表示中のウインドウがない場合) に True を渡します。
+        直前の判定でしきい値を下回っていて、一定間隔のサンプルを必要とする機能が無効なら pressure_idle_ms まで間隔を広げます
+        """
+        if self.config.refresh_rate_ms != REFRESH_RATE_AUTO:
+            interval = self.config.refresh_rate_ms
+        elif snapshot is None:
+            return self.scheduler.min_ms
+        else:
+            interval = self.scheduler.next_interval(
+                snapshot.time,
+                snapshot.percent, self.get_swap_percent(snapshot),
+                self.config.virtual_percent, self.config.swap_percent,
+            )
+
+        # しきい値を超えている (超える見込みの) 間は通知とコマンドのために通常の間隔で監視する
+        if pressure_watched and not self.needs_steady_samples and not (self.last_virtual_over or self.last_swap_over):
+            interval = max(interval, self.config.pressure_idle_ms)
+        return interval
+
+    @property
+    def needs_steady_samples(self):
+        # 予測は window 内のサンプル数が、履歴ファイルは記録の間隔がそれぞれ監視間隔に依存する
+        return bool(self.config.forecast or self.config.history_file)
+
+    @property
+    def is_enable_virtual_timer(self):
+        return bool(self.config.virtual_command_call and self.config.virtual_command_call_repeat)
+
+    @property
+    def is_enable_swap_timer(self):
+        return bool(self.config.swap_command_call and self.config.swap_command_call_repeat)
@@ -0,0 +1,67 @@
+from typing import Optional
+
+import numpy as np
+
+from history import MemoryHistory
+
+__all__ = [
+    "TrendForecaster",
+]
+
+
+class TrendForecaster(object):
+    """
+    直近 window 秒の履歴に最小二乗法で直線を当てはめ、使用量がしきい値に達するまでの秒数を推定します
+    """
+
+    def __init__(self, history: MemoryHistory, window: float = 60, min_samples: int = 5):
+        self.history = history
+        self.window = window
+        self.min_samples = min_samples
+
+    def __repr__(self):
+        return f"<{type(self).__name__} window={self.window!r}s>"
+
+    def slope(self, series: str, now: float):
+        """
+        (傾き [bytes/秒], 現在の推定値) または None
+        """
+        tier = self.history.tiers[0]
+        # ring buffer の memoryview をコピーせずに参照する
+        times = np.frombuffer(tier.time_view(), dtype=np.float64)
+        values = np.frombuffer(tier.series(series), dtype=np.float64)
+
+        mask = (times >= now - self.window) & ~np.isnan(values)
+        if np.count_nonzero(mask) < self.min_samples:
+            return None
+
+        times = times[mask]
+        values = values[mask]
+        t_mean = times.mean()
+        v_mean = values.mean()
+        t_centered = times - t_mean
+        denominator = np.dot(t_centered, t_centered)
+        if denominator <= 0:
+            return None
+
+        slope = np.dot(t_centered, values - v_mean) / denominator
+        return float(slope), float(v_mean + slope * (times[-1] - t_mean))
+
+    def seconds_to_limit(self, series: str, total: float, limit_percent: float, now: float) -> Optional[float]:
+        """
+        増加傾向にある場合に、limit_percent へ達するまでの推定秒数 (既に超えている場合は 0)
+        """
+        if total <= 0:
+            return None
+
+        result = self.slope(series, now)
+        if result is None:
+            return None
+
+        slope, current = result
+        limit = total * limit_percent / 100
+        if current >= limit:
+            return 0.0
+        if slope <= 0:
+            return None
+        return (limit - current) / slope
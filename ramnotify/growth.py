@@ -0,0 +1,196 @@
+"""
+プロセスごとの物理メモリ (RSS) の推移を記録し、増え続けているプロセスを見つけます
+
+RSS は pid ごとの行を持つ 2次元のリングバッファ (行: プロセス, 列: サンプル) に保持し、
+全プロセスの傾きと決定係数を最小二乗法でまとめて計算します
+"""
+import time
+from typing import Iterable, List, NamedTuple
+
+import numpy as np
+
+__all__ = [
+    "ProcessGrowth",
+    "GrowthTracker",
+]
+
+NAN = float("nan")
+STEADY_R2 = .8  # これ以上の決定係数なら「一定の割合で増え続けている」とみなす
+
+
+class ProcessGrowth(NamedTuple):
+    pid: int
+    rate: float  # bytes/秒
+    r2: float
+    span: float  # 当てはめに使った期間 (秒)
+    rss: int
+
+    @property
+    def steady(self):
+        return self.r2 >= STEADY_R2
+
+
+class GrowthTracker(object):
+    """
+    直近 window 秒の RSS に直線を当てはめ、プロセスごとの増加速度を求めます
+
+    一覧から消えたプロセスの行は次の add() で解放し、pid が再利用された場合は create_time で区別します
+    """
+
+    def __init__(self, capacity: int = 120, window: float = 300, min_samples: int = 5):
+        self.capacity = capacity
+        self.window = window
+        self.min_samples = min_samples
+        self._rows = {}  # type: dict[int, int]
+        self._free = []  # type: list[int]
+        self._pids = np.full(0, -1, dtype=np.int64)
+        self._create_times = np.zeros(0, dtype=np.float64)
+        self._rss = np.full((0, capacity), NAN, dtype=np.float64)
+        self._times = np.full(capacity, NAN, dtype=np.float64)
+        self._pos = 0
+
+    def __repr__(self):
+        return f"<{type(self).__name__} processes={len(self._rows)} window={self.window!r}s>"
+
+    def __len__(self):
+        return len(self._rows)
+
+    def clear(self):
+        self._rows.clear()
+        self._free[:] = range(len(self._pids) - 1, -1, -1)
+        self._pids.fill(-1)
+        self._rss.fill(NAN)
+        self._times.fill(NAN)
+        self._pos = 0
+
+    def _grow(self):
+        old = len(self._pids)
+        size = max(64, old * 2)
+        self._pids = np.concatenate((self._pids, np.full(size - old, -1, dtype=np.int64)))
+        self._create_times = np.concatenate((self._create_times, np.zeros(size - old, dtype=np.float64)))
+        self._rss = np.vstack((self._rss, np.full((size - old, self.capacity), NAN, dtype=np.float64)))
+        self._free.extend(range(size - 1, old - 1, -1))
+
+    def _allocate(self, pid: int, create_time: float) -> int:
+        if not self._free:
+            self._grow()
+        row = self._free.pop()
+        self._rows[pid] = row
+        self._pids[row] = pid
+        self._create_times[row] = create_time
+        self._rss[row].fill(NAN)
+        return row
+
+    def add(self, time_: float, infos: Iterable[dict]):
+        """
+        time_ 時点のプロセス一覧の RSS を記録します (infos に含まれないプロセスは破棄します)
+        """
+        pos = self._pos
+        self._pos = (pos + 1) % self.capacity
+        self._times[pos] = time_
+        self._rss[:, pos] = NAN
+
+        rows = self._rows
+        seen = []
+        for info in infos:
+            pid = info["pid"]
+            create_time = info.get("create_time", 0.)
+            row = rows.get(pid)
+            if row is None or self._create_times[row] != create_time:
+                if row is not None:
+                    self._free.append(row)
+                row = self._allocate(pid, create_time)
+            self._rss[row, pos] = info["memory_info"].rss
+            seen.append(row)
+
+        alive = np.zeros(len(self._pids), dtype=bool)
+        alive[seen] = True
+        for row in np.flatnonzero((self._pids >= 0) & ~alive).tolist():
+            del rows[int(self._pids[row])]
+            self._pids[row] = -1
+            self._free.append(row)
+
+    def growth(self, now: float = None) -> List[ProcessGrowth]:
+        """
+        直線を当てはめられるだけのサンプルがある全プロセスの増加速度
+        """
+        if now is None:
+            now = time.monotonic()
+        columns = self._times >= now - self.window  # NaN は False になる
+        used = np.flatnonzero(self._pids >= 0)
+        if not used.size or np.count_nonzero(columns) < self.min_samples:
+            return []
+
+        times = self._times[columns] - now
+        values = self._rss[np.ix_(used, columns)]
+        mask = ~np.isnan(values)
+        counts = np.count_nonzero(mask, axis=1)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            # 桁落ちを避けるため、行ごとの平均を引いてから積和を取る
+            t = np.where(mask, times, 0.)
+            t_centered = np.where(mask, t - (t.sum(axis=1) / counts)[:, None], 0.)
+            v_centered = np.where(mask, values - (np.where(mask, values, 0.).sum(axis=1) / counts)[:, None], 0.)
+            tt = np.einsum("ij,ij->i", t_centered, t_centered)
+            tv = np.einsum("ij,ij->i", t_centered, v_centered)
+            vv = np.einsum("ij,ij->i", v_centered, v_centered)
+            slopes = tv / tt
+            r2 = np.where(vv > 0, tv * tv / (tt * vv), 0.)
+            spans = np.where(mask, times, -np.inf).max(axis=1) - np.where(mask, times, np.inf).min(axis=1)
+
+        last = (self._pos - 1) % self.capacity
+        valid = (counts >= self.min_samples) & (tt > 0)
+        return [
+            ProcessGrowth(pid, rate, r2_, span, int(rss) if rss == rss else 0)
+            for pid, rate, r2_, span, rss in zip(
+                self._pids[used][valid].tolist(),
+                slopes[valid].tolist(),
+                r2[valid].tolist(),
+                spans[valid].tolist(),
+                self._rss[used, last][valid].tolist(),
+            )
+        ]
+
+    def top_growers(self, count: int = 20, now: float = None, *, min_rate: float = 0) -> List[ProcessGrowth]:
+        """
+        増加速度が min_rate [bytes/秒] より大きいプロセスを、速い順に最大 count 件
+        """
+        result = [entry for entry in self.growth(now) if entry.rate > min_rate]
+        result.sort(key=lambda entry: entry.rate, reverse=True)
+        return result[:count]
+
+    def leaks(self, min_rate: float, now: float = None) -> List[ProcessGrowth]:
+        """
+        window の半分以上の期間にわたって min_rate [bytes/秒] 以上で一定して増え続けているプロセス
+        """
+        return [
+            entry for entry in self.top_growers(len(self._rows), now, min_rate=min_rate)
+            if entry.steady and entry.span >= self.window / 2
+        ]
+
+
+if __name__ == "__main__":
+    # 増え続けるプロセスを混ぜた擬似的な一覧で、1回あたりの記録と計算のコストを表示する
+    from scanner import MemInfo
+
+    _rng = np.random.default_rng(0)
+    _count = 1000
+    _tracker = GrowthTracker(capacity=120, window=120)
+    _base = _rng.uniform(10, 500, _count) * 1024 ** 2
+    _leaking = set(_rng.choice(_count, 5, replace=False).tolist())
+    _start = time.perf_counter()
+    for _t in range(120):
+        _tracker.add(float(_t), (
+            dict(pid=_pid, create_time=0., memory_info=MemInfo(
+                int(_base[_pid] + _rng.normal(0, 2 * 1024 ** 2) + (_t * 1024 ** 2 if _pid in _leaking else 0)), 0))
+            for _pid in range(_count)
+        ))
+    _elapsed = time.perf_counter() - _start
+    print(f"add: {_elapsed / 120 * 1e3:.2f} ms/sample ({_count} processes)")
+
+    _start = time.perf_counter()
+    _leaks = _tracker.leaks(10 * 1024 ** 2 / 60, now=119.)
+    _elapsed = time.perf_counter() - _start
+    print(f"leaks: {_elapsed * 1e3:.2f} ms, found {sorted(_e.pid for _e in _leaks)} (expected {sorted(_leaking)})")
+    for _entry in _tracker.top_growers(8, now=119.):
+        print(f"  {_entry.pid:>5}  {_entry.rate * 60 / 1024 ** 2:>7.2f} MB/min  r2={_entry.r2:.3f}")
@@ -0,0 +1,183 @@
+import math
+from array import array
+from typing import Dict, Sequence, Tuple
+
+from sampler import MemorySnapshot
+
+__all__ = [
+    "RingBuffer",
+    "HistoryTier",
+    "MemoryHistory",
+]
+
+NAN = float("nan")
+STATS = ("mean", "min", "max")
+
+
+class RingBuffer(object):
+    """
+    array('d') のリングバッファ
+
+    容量の2倍の領域を確保して同じ値を2箇所に書き込むことで、最新 n 件を常にコピーなしの連続した memoryview で返せます
+    """
+
+    def __init__(self, capacity: int, fill: float = NAN):
+        self.capacity = capacity
+        self.count = 0
+        self._data = array("d", [fill]) * (capacity * 2)
+        self._view = memoryview(self._data)
+        self._head = 0  # 次に書き込む位置
+
+    def __len__(self):
+        return self.count
+
+    def append(self, value: float):
+        head = self._head
+        self._data[head] = self._data[head + self.capacity] = value
+        self._head = (head + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def replace_last(self, value: float):
+        last = (self._head - 1) % self.capacity
+        self._data[last] = self._data[last + self.capacity] = value
+
+    @property
+    def last(self):
+        return self._data[(self._head - 1) % self.capacity] if self.count else NAN
+
+    def view(self, count: int = None) -> memoryview:
+        """
+        古い順に並んだ最新 count 件 (未記録の部分は fill の値)
+        """
+        count = self.capacity if count is None else max(0, min(count, self.capacity))
+        end = self._head + self.capacity
+        return self._view[end - count:end]
+
+
+class HistoryTier(object):
+    """
+    resolution 秒ごとのバケットに min/max/mean を集計して capacity 件保持します
+
+    同じバケット内のサンプルは最新のスロットを上書き更新するため、集計値は挿入ごとに反映されます
+    サンプルのなかったバケットは NaN のスロットとして残し、1スロットが常に resolution 秒に対応するようにします
+    """
+
+    def __init__(self, resolution: float, capacity: int, series: Sequence[str]):
+        self.resolution = resolution
+        self.capacity = capacity
+        self.times = RingBuffer(capacity)
+        self.buffers = {
+            name: {stat: RingBuffer(capacity) for stat in STATS} for name in series
+        }  # type: dict[str, dict[str, RingBuffer]]
+        self.version = 0
+        self.appended = 0  # 追加したスロットの総数 (最新のスロットの通し番号 + 1)
+        self._bucket = None  # type: int | None
+        self._sums = {name: 0.0 for name in series}
+        self._count = 0
+
+    def __repr__(self):
+        return f"<{type(self).__name__} resolution={self.resolution!r}s count={self.times.count}/{self.capacity}>"
+
+    @property
+    def span(self):
+        return self.resolution * self.capacity
+
+    def add(self, time: float, values: Dict[str, float]):
+        bucket = int(time // self.resolution)
+
+        if bucket != self._bucket:
+            if self._bucket is not None and bucket > self._bucket + 1:
+                self._skip(bucket)
+            self._bucket = bucket
+            self._count = 1
+            self.times.append(bucket * self.resolution)
+            self.appended += 1
+            for name, value in values.items():
+                self._sums[name] = value
+                for buffer in self.buffers[name].values():
+                    buffer.append(value)
+
+        else:
+            self._count += 1
+            for name, value in values.items():
+                buffers = self.buffers[name]
+                self._sums[name] += value
+                buffers["mean"].replace_last(self._sums[name] / self._count)
+                if value < buffers["min"].last:
+                    buffers["min"].replace_last(value)
+                if value > buffers["max"].last:
+                    buffers["max"].replace_last(value)
+
+        self.version += 1
+
+    def _skip(self, bucket: int):
+        """
+        前回のバケットから bucket の直前までを未記録 (NaN) のスロットで埋めます (最大 capacity 件)
+        """
+        skipped = min(bucket - self._bucket - 1, self.capacity)
+        for empty in range(bucket - skipped, bucket):
+            self.times.append(empty * self.resolution)
+        for buffers in self.buffers.values():
+            for buffer in buffers.values():
+                for _ in range(skipped):
+                    buffer.append(NAN)
+        self.appended += skipped
+
+    def slots(self, span: float, end: float = None) -> Tuple[int, int]:
+        """
+        end 秒 (None は最新) までの span 秒を表示するための (スロット数, 最新から遡るスロット数)
+
+        バケットの時刻から数えるため、サンプルの間隔が resolution と異なっていても表示する時間の範囲は変わりません
+        """
+        count = max(2, min(math.ceil(span / self.resolution), self.capacity))
+        last = self.times.last
+        back = 0
+        if end is not None and last == last:
+            back = int(last // self.resolution) - int(end // self.resolution)
+        return count, max(0, min(back, self.capacity - count))
+
+    def series(self, name: str, stat: str = "mean", count: int = None) -> memoryview:
+        return self.buffers[name][stat].view(count)
+
+    def time_view(self, count: int = None) -> memoryview:
+        return self.times.view(count)
+
+
+class MemoryHistory(object):
+    """
+    メモリ使用量の履歴 (1秒x10分 / 1分x24時間 / 15分x30日)
+
+    MemorySampler に購読させて常時記録します
+    """
+    SERIES = ("physical", "swap")
+    DEFAULT_TIERS = (
+        (1, 60 * 10),
+        (60, 60 * 24),
+        (60 * 15, 4 * 24 * 30),
+    )
+
+    def __init__(self, tiers: Sequence[Tuple[float, int]] = DEFAULT_TIERS):
+        self.tiers = [HistoryTier(resolution, capacity, self.SERIES)
+                      for resolution, capacity in tiers]  # type: list[HistoryTier]
+        self.physical_total = 0
+        self.swap_total = 0
+        self.last_time = NAN
+
+    def add(self, snapshot: MemorySnapshot):
+        self.physical_total = snapshot.total
+        self.swap_total = snapshot.swap_total
+        self.last_time = snapshot.time
+
+        values = dict(physical=float(snapshot.used), swap=float(snapshot.swap_used))
+        for tier in self.tiers:
+            tier.add(snapshot.time, values)
+
+    def tier_for(self, span: float) -> HistoryTier:
+        """
+        span 秒を表示できる最も細かいティア
+        """
+        for tier in self.tiers:
+            if tier.span >= span:
+                return tier
+        return self.tiers[-1]
@@ -0,0 +1,264 @@
+"""
+メモリ使用量の履歴をファイルへ追記する固定長バイナリ形式
+
+    header: magic "RNHS" / u32 version / u32 record_size / u32 reserved
+    record: f64 time / u64 physical_used / u64 physical_total / u64 swap_used / u64 swap_total / u64 swap_in / u64 swap_out
+
+ファイルが max_bytes を超えると history.1.bin へ移動して新しいファイルを作成します
+ヘッダーが一致しないファイル (古い形式や別のファイル) には追記せず、名前に .invalid を付けて退避します
+"""
+import bisect
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+import traceback
+from pathlib import Path
+from typing import Iterator, List, NamedTuple
+
+from sampler import MemorySnapshot
+
+__all__ = [
+    "HistoryRecord",
+    "HistoryWriter",
+    "HistoryReader",
+    "read_history",
+]
+
+MAGIC = b"RNHS"
+VERSION = 1
+HEADER = struct.Struct("<4sIII")
+RECORD = struct.Struct("<dQQQQQQ")
+
+
+class HistoryRecord(NamedTuple):
+    time: float
+    physical_used: int
+    physical_total: int
+    swap_used: int
+    swap_total: int
+    swap_in: int
+    swap_out: int
+
+
+def rotated_path(path: Path):
+    return path.with_name(f"{path.stem}.1{path.suffix}")
+
+
+class HistoryWriter(object):
+    """
+    サンプルをバッファに詰めておき、batch_size 件または flush_interval 秒ごとに1回の write で追記します
+    """
+
+    def __init__(self, path: Path, *, max_bytes: int = 16 * 1024 ** 2,
+                 batch_size: int = 32, flush_interval: float = 10):
+        self.path = path
+        self.max_bytes = max(max_bytes, HEADER.size + RECORD.size * batch_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._buffer = bytearray(RECORD.size * batch_size)
+        self._count = 0
+        self._last_flush = time.monotonic()
+        self._fd = -1
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"<{type(self).__name__} path={str(self.path)!r} size={self._size}>"
+
+    def _open(self):
+        self._fd = os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+        self._size = os.fstat(self._fd).st_size
+        if self._size and not self._check_header():
+            # 別の形式のファイルには追記せず、退避してから作り直す
+            self._close_fd()
+            invalid_path = self.path.with_name(f"{self.path.name}.invalid")
+            os.replace(self.path, invalid_path)
+            print(f"WARN: Unsupported history file was moved to {invalid_path}")
+            return self._open()
+        # 書き込み途中で終了した場合は、不完全なレコード (またはヘッダー) を切り詰めてから追記する
+        if self._size < HEADER.size:
+            size = 0
+        else:
+            size = self._size - (self._size - HEADER.size) % RECORD.size
+        if size != self._size:
+            print(f"WARN: Truncate incomplete history record: {self.path} ({self._size} -> {size} bytes)")
+            os.ftruncate(self._fd, size)
+            self._size = size
+        if self._size == 0:
+            os.write(self._fd, HEADER.pack(MAGIC, VERSION, RECORD.size, 0))
+            self._size = HEADER.size
+
+    def _check_header(self) -> bool:
+        """
+        ファイル先頭のヘッダーがこの形式と一致するか (書き込み途中で途切れたヘッダーは一致する部分だけを比べる)
+        """
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        header = os.read(self._fd, HEADER.size)
+        expected = HEADER.pack(MAGIC, VERSION, RECORD.size, 0)
+        size = min(len(header), HEADER.size - 4)  # reserved は比べない
+        return header[:size] == expected[:size]
+
+    def _rotate(self):
+        os.close(self._fd)
+        self._fd = -1
+        os.replace(self.path, rotated_path(self.path))
+        print(f"Rotate history file: {self!r}")
+        self._open()
+
+    def add(self, snapshot: MemorySnapshot):
+        with self._lock:
+            RECORD.pack_into(
+                self._buffer, self._count * RECORD.size,
+                snapshot.time,
+                snapshot.used, snapshot.total,
+                snapshot.swap_used, snapshot.swap_total,
+                snapshot.swap_sin, snapshot.swap_sout,
+            )
+            self._count += 1
+
+            if self._count >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        self._last_flush = time.monotonic()
+        if not self._count:
+            return
+
+        size = self._count * RECORD.size
+        self._count = 0
+        try:
+            if self._fd == -1:
+                self._open()
+            elif self._size + size > self.max_bytes:
+                self._rotate()
+
+            os.write(self._fd, memoryview(self._buffer)[:size])
+            self._size += size
+
+        except OSError:
+            traceback.print_exc()
+            self._close_fd()
+
+    def _close_fd(self):
+        if self._fd != -1:
+            try:
+                os.close(self._fd)
+            except OSError:
+                pass
+            self._fd = -1
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._close_fd()
+
+
+class HistoryReader(object):
+    """
+    履歴ファイルを mmap で開き、時刻の範囲で検索します
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._map = None  # type: mmap.mmap | None
+        self.count = 0
+
+        with path.open("rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            if size < HEADER.size:
+                return
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, record_size, _ = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            self.close()
+            raise ValueError(f"unsupported history file: {path}")
+
+        # 書き込み途中で終了した末尾の不完全なレコードは無視する
+        self.count = (size - HEADER.size) // RECORD.size
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index: int) -> HistoryRecord:
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        return HistoryRecord._make(RECORD.unpack_from(self._map, HEADER.size + index * RECORD.size))
+
+    def time_at(self, index: int) -> float:
+        return struct.unpack_from("<d", self._map, HEADER.size + index * RECORD.size)[0]
+
+    def _bisect(self, timestamp: float):
+        return bisect.bisect_left(_TimeIndex(self), timestamp)
+
+    def query(self, start: float = None, end: float = None) -> Iterator[HistoryRecord]:
+        if not self.count:
+            return
+        begin = 0 if start is None else self._bisect(start)
+        stop = self.count if end is None else self._bisect(end)
+        if begin >= stop:
+            return
+
+        view = memoryview(self._map)[HEADER.size + begin * RECORD.size:HEADER.size + stop * RECORD.size]
+        try:
+            for values in RECORD.iter_unpack(view):
+                yield HistoryRecord._make(values)
+        finally:
+            view.release()
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self.count = 0
+
+
+class _TimeIndex(object):
+    def __init__(self, reader: HistoryReader):
+        self.reader = reader
+
+    def __len__(self):
+        return self.reader.count
+
+    def __getitem__(self, index: int):
+        return self.reader.time_at(index)
+
+
+def read_history(path: Path, start: float = None, end: float = None) -> List[HistoryRecord]:
+    """
+    ローテート済みのファイルも含めて範囲内のレコードを古い順に読み込みます
+    """
+    records = []
+    for _path in (rotated_path(path), path):
+        if not _path.is_file():
+            continue
+        try:
+            reader = HistoryReader(_path)
+        except (OSError, ValueError):
+            traceback.print_exc()
+            continue
+        try:
+            records.extend(reader.query(start, end))
+        finally:
+            reader.close()
+    return records
+
+
+if __name__ == "__main__":
+    # python historyfile.py [path] [hours]
+    _path = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(__file__).parent / "history.bin"
+    _hours = float(sys.argv[2]) if len(sys.argv) > 2 else 1
+    for _record in read_history(_path, start=time.time() - _hours * 3600):
+        print(
+            time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(_record.time)),
+            f"physical {_record.physical_used / 1024 ** 2:>10,.0f} / {_record.physical_total / 1024 ** 2:,.0f} MB",
+            f"swap {_record.swap_used / 1024 ** 2:>10,.0f} / {_record.swap_total / 1024 ** 2:,.0f} MB",
+            f"in/out {_record.swap_in:,} / {_record.swap_out:,}",
+        )
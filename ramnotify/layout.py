@@ -7,10 +7,10 @@
 import wx
 
 # begin wxGlade: dependencies
+import wx.grid
 # end wxGlade
 
 # begin wxGlade: extracode
-import wx.lib.agw.ultimatelistctrl as ulc
 from widget import PlotCanvas
 # end wxGlade
 
@@ -70,7 +70,7 @@ class RamNotifyPanel(wx.Panel):
         self.btn_call_swap_command = wx.Button(self, wx.ID_ANY, u"実行")
         self.label_swap_command_repeat = wx.StaticText(self, wx.ID_ANY, "")
         self.spin_swap_command_repeat = wx.SpinCtrl(self, wx.ID_ANY, "0", min=0, max=99999999)
-        self.choice_refresh_rate = wx.Choice(self, wx.ID_ANY, choices=[u"0.5秒", u"1秒", u"2秒", u"5秒", u"10秒", u"30秒", u"1分", u"5分"])
+        self.choice_refresh_rate = wx.Choice(self, wx.ID_ANY, choices=[u"自動", u"0.5秒", u"1秒", u"2秒", u"5秒", u"10秒", u"30秒", u"1分", u"5分"])
         self.choice_notify_cool = wx.Choice(self, wx.ID_ANY, choices=[u"1分", u"5分", u"10分", u"15分", u"30分", u"1時間", u"2時間", u"4時間", u"6時間"])
         self.choice_task_bar_icon = wx.Choice(self, wx.ID_ANY, choices=[u"シンプル", u"物理メモリの使用率", u"論理メモリの使用率"])
         self.button_quit = wx.Button(self, wx.ID_ANY, u"終了")
@@ -237,10 +237,14 @@ class ProcessListPanel(wx.Panel):
         self.lab_physical_size = wx.StaticText(self, wx.ID_ANY, "12,345 MB / 12,345 MB", style=wx.ALIGN_RIGHT)
         self.lab_virtual_percent = wx.StaticText(self, wx.ID_ANY, "12.3%")
         self.lab_virtual_size = wx.StaticText(self, wx.ID_ANY, "12,345 MB / 12,345 MB", style=wx.ALIGN_RIGHT)
-        self.list = ulc.UltimateListCtrl(self, wx.ID_ANY, agwStyle=(ulc.ULC_HRULES | ulc.ULC_REPORT | ulc.ULC_SINGLE_SEL | ulc.ULC_BORDER_SELECT))
+        self.choice_range = wx.Choice(self, wx.ID_ANY, choices=[u"1分", u"10分", u"1時間", u"24時間"])
+        self.txt_search = wx.SearchCtrl(self, wx.ID_ANY, "")
+        self.choice_group = wx.Choice(self, wx.ID_ANY, choices=[u"グループなし", u"名前", u"ユーザー", u"親プロセス", u"プロセスツリー", u"cgroup", u"増加傾向"])
+        self.list = wx.grid.Grid(self, wx.ID_ANY, size=(1, 1))
         self.lab_reading = wx.StaticText(self, wx.ID_ANY, "", style=wx.ALIGN_CENTER)
         self.txt_commandline = wx.TextCtrl(self, wx.ID_ANY, "", style=wx.TE_READONLY)
         self.btn_read = wx.Button(self, wx.ID_ANY, u"リスト更新")
+        self.check_live = wx.CheckBox(self, wx.ID_ANY, u"自動更新")
         self.lab_select_process = wx.StaticText(self, wx.ID_ANY, "label_5", style=wx.ST_NO_AUTORESIZE)
         self.btn_restart = wx.Button(self, wx.ID_ANY, u"再起動")
         self.btn_terminate = wx.Button(self, wx.ID_ANY, u"終了")
@@ -248,7 +252,11 @@ class ProcessListPanel(wx.Panel):
         self.__set_properties()
         self.__do_layout()
 
+        self.Bind(wx.EVT_CHOICE, self.on_choice, self.choice_range)
+        self.Bind(wx.EVT_TEXT, self.on_search_text, self.txt_search)
+        self.Bind(wx.EVT_CHOICE, self.on_choice, self.choice_group)
         self.Bind(wx.EVT_BUTTON, self.on_button, self.btn_read)
+        self.Bind(wx.EVT_CHECKBOX, self.on_check, self.check_live)
         self.Bind(wx.EVT_BUTTON, self.on_button, self.btn_restart)
         self.Bind(wx.EVT_BUTTON, self.on_button, self.btn_terminate)
         # end wxGlade
@@ -260,6 +268,10 @@ class ProcessListPanel(wx.Panel):
         self.btn_read.SetMinSize((-1, 23))
         self.btn_restart.SetMinSize((-1, 23))
         self.btn_terminate.SetMinSize((-1, 23))
+        self.txt_search.SetDescriptiveText(u"名前・コマンドラインで絞り込み")
+        self.txt_search.ShowCancelButton(True)
+        self.choice_range.SetSelection(0)
+        self.choice_group.SetSelection(0)
         # end wxGlade
 
     def __do_layout(self):
@@ -267,6 +279,7 @@ class ProcessListPanel(wx.Panel):
         sizer_1 = wx.BoxSizer(wx.VERTICAL)
         sizer_footer = wx.BoxSizer(wx.HORIZONTAL)
         self.sizer_list = wx.BoxSizer(wx.HORIZONTAL)
+        sizer_search = wx.BoxSizer(wx.HORIZONTAL)
         sizer_3 = wx.BoxSizer(wx.HORIZONTAL)
         self.sizer_mem_info = wx.BoxSizer(wx.VERTICAL)
         sizer_6 = wx.BoxSizer(wx.HORIZONTAL)
@@ -290,17 +303,22 @@ class ProcessListPanel(wx.Panel):
         sizer_6.Add(self.lab_virtual_percent, 0, wx.ALIGN_CENTER_VERTICAL, 0)
         self.sizer_mem_info.Add(sizer_6, 0, wx.EXPAND, 0)
         self.sizer_mem_info.Add(self.lab_virtual_size, 0, 0, 0)
+        self.sizer_mem_info.Add(self.choice_range, 0, wx.EXPAND | wx.TOP, 8)
         sizer_3.Add(self.sizer_mem_info, 0, wx.EXPAND | wx.LEFT, 12)
         sizer_1.Add(sizer_3, 2, wx.ALL | wx.EXPAND, 12)
         static_line_2 = wx.StaticLine(self, wx.ID_ANY)
         sizer_1.Add(static_line_2, 0, wx.EXPAND, 0)
+        sizer_search.Add(self.txt_search, 1, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 8)
+        sizer_search.Add(self.choice_group, 0, wx.ALIGN_CENTER_VERTICAL, 0)
+        sizer_1.Add(sizer_search, 0, wx.EXPAND | wx.LEFT | wx.RIGHT | wx.TOP, 12)
         self.sizer_list.Add(self.list, 1, wx.EXPAND, 0)
         self.sizer_list.Add(self.lab_reading, 1, wx.ALIGN_CENTER_VERTICAL, 0)
         sizer_1.Add(self.sizer_list, 5, wx.EXPAND | wx.LEFT | wx.RIGHT | wx.TOP, 12)
         sizer_1.Add(self.txt_commandline, 0, wx.EXPAND | wx.LEFT | wx.RIGHT, 12)
         static_line_1 = wx.StaticLine(self, wx.ID_ANY)
         sizer_1.Add(static_line_1, 0, wx.EXPAND | wx.TOP, 12)
-        sizer_footer.Add(self.btn_read, 0, wx.RIGHT, 8)
+        sizer_footer.Add(self.btn_read, 0, wx.RIGHT, 4)
+        sizer_footer.Add(self.check_live, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 8)
         label_4 = wx.StaticText(self, wx.ID_ANY, u"選択:")
         sizer_footer.Add(label_4, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 8)
         sizer_footer.Add(self.lab_select_process, 1, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 8)
@@ -316,6 +334,18 @@ class ProcessListPanel(wx.Panel):
         print("Event handler 'on_button' not implemented!")
         event.Skip()
 
+    def on_search_text(self, event):  # wxGlade: ProcessListPanel.<event_handler>
+        print("Event handler 'on_search_text' not implemented!")
+        event.Skip()
+
+    def on_choice(self, event):  # wxGlade: ProcessListPanel.<event_handler>
+        print("Event handler 'on_choice' not implemented!")
+        event.Skip()
+
+    def on_check(self, event):  # wxGlade: ProcessListPanel.<event_handler>
+        print("Event handler 'on_check' not implemented!")
+        event.Skip()
+
 # end of class ProcessListPanel
 
 class MyApp(wx.App):
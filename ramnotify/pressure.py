@@ -0,0 +1,126 @@
+import errno
+import os
+import select
+import threading
+import traceback
+from typing import Callable
+
+__all__ = [
+    "PressureWatcher",
+]
+
+
+class PressureWatcher(object):
+    """
+    Linux PSI (/proc/pressure/memory) のトリガーを登録し、メモリストールが発生した時に on_pressure を呼び出します
+
+    on_pressure は監視スレッドから呼ばれます
+    """
+    PATH = "/proc/pressure/memory"
+
+    def __init__(self, on_pressure: Callable[[], None], stall_ms: int = 150, window_ms: int = 1000, kind: str = "some"):
+        self.on_pressure = on_pressure
+        self.stall_ms = stall_ms
+        self.window_ms = window_ms
+        self.kind = kind
+        self._fd = -1
+        self._wakeup = None  # type: tuple[int, int] | None
+        self._thread = None  # type: threading.Thread | None
+
+    def __repr__(self):
+        return (f"<{type(self).__name__} trigger={self.trigger!r} "
+                f"isRunning={self.is_running!r}>")
+
+    @property
+    def trigger(self):
+        return f"{self.kind} {self.stall_ms * 1000} {self.window_ms * 1000}"
+
+    @property
+    def is_running(self):
+        return bool(self._thread and self._thread.is_alive())
+
+    @classmethod
+    def is_available(cls):
+        return hasattr(select, "poll") and os.path.exists(cls.PATH)
+
+    def start(self):
+        if self.is_running:
+            return True
+        if not self.is_available():
+            print(f"WARN: {self.PATH} is not available")
+            return False
+
+        try:
+            fd = os.open(self.PATH, os.O_RDWR | os.O_NONBLOCK)
+        except OSError as e:
+            print(f"WARN: Failed to open {self.PATH}: {e}")
+            return False
+
+        try:
+            try:
+                os.write(fd, self.trigger.encode("ascii") + b"\0")
+            except OSError as e:
+                # 特権のないプロセスは 2秒単位のウインドウしか登録できない
+                if e.errno != errno.EINVAL or self.window_ms % 2000 == 0:
+                    raise
+                self.window_ms = -(-self.window_ms // 2000) * 2000
+                print(f"WARN: Retry pressure trigger with window {self.window_ms}ms")
+                os.write(fd, self.trigger.encode("ascii") + b"\0")
+        except OSError as e:
+            os.close(fd)
+            print(f"WARN: Failed to register pressure trigger {self.trigger!r}: {e}")
+            return False
+
+        self._fd = fd
+        self._wakeup = os.pipe()
+        self._thread = th = threading.Thread(target=self._run, args=(fd, self._wakeup[0]), daemon=True)
+        th.start()
+        print(f"Start pressure watcher: {self!r}")
+        return True
+
+    def stop(self):
+        if self._wakeup is None:
+            return
+        try:
+            os.write(self._wakeup[1], b"\0")
+        except OSError:
+            pass
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1)
+        self._thread = None
+        for fd in (self._fd, *self._wakeup):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        self._fd = -1
+        self._wakeup = None
+        print(f"Stop pressure watcher: {self!r}")
+
+    def _run(self, fd: int, wakeup_fd: int):
+        poll = select.poll()
+        poll.register(fd, select.POLLPRI)
+        poll.register(wakeup_fd, select.POLLIN)
+
+        while True:
+            try:
+                events = poll.poll()
+            except InterruptedError:
+                continue
+            except OSError:
+                traceback.print_exc()
+                return
+
+            for event_fd, event in events:
+                if event_fd == wakeup_fd:
+                    return
+
+                if event & select.POLLERR:
+                    print(f"WARN: pressure trigger was closed: {self!r}")
+                    return
+
+                if event & select.POLLPRI:
+                    try:
+                        self.on_pressure()
+                    except (Exception,):
+                        traceback.print_exc()
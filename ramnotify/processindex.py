@@ -0,0 +1,133 @@
+import bisect
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+__all__ = [
+    "ProcessIndex",
+]
+
+# 列ごとのソートキー (末尾の pid は同値のときの並び順を固定するため)
+COLUMN_KEYS: Tuple[Callable[[dict], tuple], ...] = (
+    lambda info: (info["pid"],),
+    lambda info: (info["name"].lower(), info["pid"]),
+    lambda info: (info["memory_info"].rss, info["pid"]),
+    lambda info: (info["memory_info"].vms, info["pid"]),
+)
+MEMORY_COLUMNS = (2, 3)
+
+
+class ProcessIndex(object):
+    """
+    全ての列についてソート済みのキーを保持するプロセス一覧
+
+    追加・削除・メモリ使用量の更新は bisect で該当するキーだけを入れ替え、列や昇順/降順の切り替えでは並べ直しを行いません
+    """
+
+    def __init__(self):
+        self.processes = {}  # type: dict[int, dict]
+        self.column = 0
+        self.descending = False
+        self._keys = {}  # type: dict[int, list[tuple]]  # pid -> 列ごとの現在のキー
+        self._sorted = [[] for _ in COLUMN_KEYS]  # type: list[list[tuple]]
+
+    def __repr__(self):
+        return f"<{type(self).__name__} count={len(self.processes)} column={self.column} desc={self.descending}>"
+
+    def __len__(self):
+        return len(self.processes)
+
+    def __getitem__(self, row: int) -> dict:
+        """
+        現在の並び順で row 番目のプロセス
+        """
+        keys = self._sorted[self.column]
+        if not 0 <= row < len(keys):
+            raise IndexError(row)
+        if self.descending:
+            row = len(keys) - 1 - row
+        return self.processes[keys[row][-1]]
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+    def set_order(self, column: int, descending: bool):
+        self.column = column
+        self.descending = descending
+
+    def index_of(self, pid: int) -> Optional[int]:
+        """
+        現在の並び順での pid の行番号
+        """
+        keys = self._keys.get(pid)
+        if keys is None:
+            return None
+        sorted_keys = self._sorted[self.column]
+        row = bisect.bisect_left(sorted_keys, keys[self.column])
+        return len(sorted_keys) - 1 - row if self.descending else row
+
+    def ordered(self, column: int, descending: bool = False) -> Iterator[dict]:
+        """
+        column の並び順でプロセスを返します (現在の並び順は変更しません)
+        """
+        keys = self._sorted[column]
+        for key in (reversed(keys) if descending else keys):
+            yield self.processes[key[-1]]
+
+    def select(self, pids: Iterable[int]) -> List[dict]:
+        """
+        pids のプロセスを現在の並び順で返します
+        """
+        rows = [(self.index_of(pid), pid) for pid in pids if pid in self.processes]
+        rows.sort()
+        return [self.processes[pid] for _, pid in rows]
+
+    def clear(self):
+        self.processes.clear()
+        self._keys.clear()
+        for keys in self._sorted:
+            keys.clear()
+
+    def rebuild(self, infos: Iterable[dict]):
+        """
+        全てのプロセスを入れ替えます (1列ごとに1回だけソートします)
+        """
+        self.clear()
+        for info in infos:
+            pid = info["pid"]
+            self.processes[pid] = info
+            self._keys[pid] = [key(info) for key in COLUMN_KEYS]
+        for column, sorted_keys in enumerate(self._sorted):
+            sorted_keys.extend(keys[column] for keys in self._keys.values())
+            sorted_keys.sort()
+
+    def add(self, info: dict):
+        pid = info["pid"]
+        if pid in self.processes:
+            self.remove(pid)
+        keys = [key(info) for key in COLUMN_KEYS]
+        self.processes[pid] = info
+        self._keys[pid] = keys
+        for column, sorted_keys in enumerate(self._sorted):
+            bisect.insort(sorted_keys, keys[column])
+
+    def remove(self, pid: int) -> Optional[dict]:
+        info = self.processes.pop(pid, None)
+        if info is None:
+            return None
+        keys = self._keys.pop(pid)
+        for column, sorted_keys in enumerate(self._sorted):
+            del sorted_keys[bisect.bisect_left(sorted_keys, keys[column])]
+        return info
+
+    def update_memory(self, pid: int, memory_info) -> bool:
+        info = self.processes.get(pid)
+        if info is None:
+            return False
+        info["memory_info"] = memory_info
+        keys = self._keys[pid]
+        for column in MEMORY_COLUMNS:
+            sorted_keys = self._sorted[column]
+            del sorted_keys[bisect.bisect_left(sorted_keys, keys[column])]
+            keys[column] = COLUMN_KEYS[column](info)
+            bisect.insort(sorted_keys, keys[column])
+        return True
@@ -1,23 +1,32 @@
-import multiprocessing
 import subprocess
 import threading
 import time
 import traceback
-from collections import deque, namedtuple
 from enum import Enum
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Dict, Optional, Sequence, Union
 
 import psutil
 import wx
-import wx.lib.agw.ultimatelistctrl as ulc
+import wx.grid
 
+from aggregate import GROUP_KEYS, aggregate
+from growth import GrowthTracker, ProcessGrowth
+from history import MemoryHistory
 from layout import ProcessListPanel
+from processindex import ProcessIndex
+from sampler import MemorySampler, MemorySnapshot
+from scanner import MemInfo, ProcessBatch, ProcessDiff, ProcessScanner, read_process
+from search import TrigramIndex
+from smaps import MemoryDetailWorker
 from util import freezing
-from widget import PlotLine, PyGauge
+from widget import GaugeCellRenderer, PlotLine
 
-DummyFormatter = namedtuple("DummyFormatter", ["format"])
 DEFAULT_SORT_TYPE_DIRECTION = (False, False, True, True)
+GROWERS_COUNT = 50  # 増加傾向の表示で並べる最大件数
+PLOT_RANGES = (60, 60 * 10, 60 * 60, 60 * 60 * 24)  # choice_range の各項目の表示範囲 (秒)
+PLOT_SPAN_MIN = 30
+PLOT_ZOOM_STEP = 1.25
 
 
 class SortType(Enum):
@@ -54,24 +63,116 @@ class MemoryInfo:
         return self.used / self.total
 
 
-def _dump_process(pid: int):
-    return psutil.Process(pid).as_dict(["pid", "name", "memory_info", "cmdline"])
+def _format_size(size: int):
+    return f"{round(size / 1024 / 1024, 1):,} MB"
 
 
-def _dump_processes(ret_info: dict, wait: multiprocessing.Event):
-    try:
-        for proc in psutil.process_iter(["pid", "name", "memory_info", "cmdline"]):
-            ret_info[proc.pid] = proc.info
-    finally:
-        wait.set()
+# グループ表示時の列ごとのソートキー
+GROUP_SORT_KEYS = (
+    lambda group: (group["count"], group["memory_info"].rss),
+    lambda group: group["name"].lower(),
+    lambda group: group["memory_info"].rss,
+    lambda group: group["memory_info"].vms,
+)
 
 
-def _format_gauge_label(label: str):
-    return DummyFormatter(lambda *_: label)
+def _row_key(info: dict):
+    return ("group", info["name"]) if info.get("group") else info["pid"]
+
+
+class ProcessTable(wx.grid.GridTableBase):
+    """
+    表示順に並んだプロセス情報 (rows) を参照する仮想テーブル
+
+    グリッドは画面に見えている行の値だけを問い合わせるため、プロセス数が増えても描画コストは変わりません
+    """
+    COLUMNS = ("PID", "プロセス", "物理", "仮想", "USS", "PSS", "増加")
+    DETAIL_COLUMNS = (4, 5)
+    GROWTH_COLUMN = 6
+
+    def __init__(self, app: "ProcessListApp"):
+        wx.grid.GridTableBase.__init__(self)
+        self.app = app
+        self.rows = []  # type: Sequence[dict]
+        self._row_count = 0
+
+    def GetNumberRows(self):
+        return len(self.rows)
+
+    def GetNumberCols(self):
+        return len(self.COLUMNS)
+
+    def GetColLabelValue(self, col):
+        if col == 0 and self.app.group_by:
+            return "数"
+        return self.COLUMNS[col]
+
+    def GetRowLabelValue(self, row):
+        return ""
+
+    def IsEmptyCell(self, row, col):
+        return False
+
+    def GetValue(self, row, col):
+        info = self.rows[row]
+        if col == 0:
+            return str(info["count"] if info.get("group") else info["pid"])
+        elif col == 1:
+            return info["name"]
+        elif col in self.DETAIL_COLUMNS:
+            if info.get("group"):
+                return ""
+            detail = self.app.memory_detail.get(info["pid"], info.get("create_time", 0.))
+            if detail is None:
+                return "-"
+            return _format_size(detail.uss if col == 4 else detail.pss)
+        elif col == self.GROWTH_COLUMN:
+            if info.get("group"):
+                return ""
+            growth = self.app.growth_rates.get(info["pid"])
+            if growth is None:
+                return "-"
+            return f"{growth.rate * 60 / 1024 ** 2:+,.1f} MB/分"
+        return self.GetGaugeValue(row, col)[1]
+
+    def SetValue(self, row, col, value):
+        pass
+
+    def GetGaugeValue(self, row, col):
+        mem_info = self.rows[row]["memory_info"]
+        if col == 2:
+            used, total = mem_info.rss, self.app.p_mem.used
+        else:
+            used, total = mem_info.vms, self.app.v_mem.used
+        return (used / total if total else 0.), _format_size(used)
+
+    def set_rows(self, rows: Sequence[dict]):
+        """
+        行を差し替え、行数の変化だけをグリッドへ通知します
+        """
+        old_count, new_count = self._row_count, len(rows)
+        self.rows = rows
+        self._row_count = new_count
+
+        grid = self.GetView()  # type: wx.grid.Grid
+        if not grid:
+            return
+        grid.BeginBatch()
+        try:
+            if new_count < old_count:
+                grid.ProcessTableMessage(wx.grid.GridTableMessage(
+                    self, wx.grid.GRIDTABLE_NOTIFY_ROWS_DELETED, new_count, old_count - new_count))
+            elif new_count > old_count:
+                grid.ProcessTableMessage(wx.grid.GridTableMessage(
+                    self, wx.grid.GRIDTABLE_NOTIFY_ROWS_APPENDED, new_count - old_count))
+        finally:
+            grid.EndBatch()
+        grid.ForceRefresh()
 
 
 class ProcessListApp(ProcessListPanel):
-    def __init__(self, frame: Optional[wx.Frame], config: "RamNotifyConfig"):
+    def __init__(self, frame: Optional[wx.Frame], config: "RamNotifyConfig",
+                 sampler: MemorySampler, history: MemoryHistory):
         if frame is None:
             style = wx.CAPTION | wx.SYSTEM_MENU | wx.CLIP_CHILDREN | wx.CLOSE_BOX | wx.MINIMIZE_BOX
             self.frame = frame = wx.Frame(None, size=(450, 500), style=style, title="プロセス一覧")
@@ -80,22 +181,44 @@ class ProcessListApp(ProcessListPanel):
 
         ProcessListPanel.__init__(self, frame)
         self.config = config
+        self.sampler = sampler
+        self.history = history
         self.sort_type = SortType.P_USED_DESC
         #
         self.refresh_rate = 1  # 0.5
         self.plot_count = 0
-        self.p_mem_line_points = deque([-1] * 60, maxlen=60)
-        self.v_mem_line_points = deque([-1] * 60, maxlen=60)
+        self.plot_span = PLOT_RANGES[0]
+        self.plot_end = None  # type: float | None
+        self._plot_drag = None  # type: tuple | None
         self.p_mem = MemoryInfo(0, 0, 0)
         self.v_mem = MemoryInfo(0, 0, 0)
         #
         self._thread_interrupt = threading.Event()
         self._thread = None  # type: threading.Thread | None
-        self._multiprocessing_manager = manager = multiprocessing.Manager()
-        self._multiprocessing_dict = manager.dict()
-        self._multiprocessing_wait = manager.Event()
+        self._scanner = ProcessScanner()
+        self.index = ProcessIndex()
+        self.search_index = TrigramIndex()
+        self.search_query = ""
+        self.group_by = None  # type: str | None
+        self.memory_detail = MemoryDetailWorker(
+            lambda: wx.CallAfter(self._on_memory_detail_update),
+            budget=config.processlist_memory_detail_budget_ms / 1000,
+        )
+        self.growth = GrowthTracker(
+            capacity=max(60, config.processlist_growth_window_sec * 1000 // config.processlist_live_interval_ms + 1),
+            window=config.processlist_growth_window_sec,
+        )
+        self.growth_rates: Dict[int, ProcessGrowth] = {}
+        self.show_growers = False
+        self._growth_notified = {}  # type: dict[int, float]
+        self.processes = self.index.processes  # pid -> 一覧に表示中のプロセス情報 (変更は index を通して行う)
         self._reading = False
-        self._deselect_flag = False
+        self._live_pending = False
+        self._last_live_scan = 0.
+        self._queued_results = []  # type: list[ProcessBatch | ProcessDiff]
+        self._resync = False
+        # hooks
+        self.on_notify: Optional[Callable[[str, str], None]] = None
         #
         self._init()
 
@@ -106,28 +229,51 @@ class ProcessListApp(ProcessListPanel):
         self.lab_virtual_percent.SetLabel("")
         self.lab_virtual_size.SetLabel("")
 
-        self.list.ClearAll()
-        header = (
-            ("PID", 50, ulc.ULC_FORMAT_LEFT),
-            ("プロセス", 164, ulc.ULC_FORMAT_LEFT),
-            ("物理", 83, ulc.ULC_FORMAT_RIGHT),
-            ("仮想", 83, ulc.ULC_FORMAT_RIGHT),
-        )
-        for idx, (label, width, fmt) in enumerate(header):
-            item = ulc.UltimateListItem()
-            item.SetText(label)
-            item.SetAlign(fmt)
-            self.list.InsertColumnInfo(idx, item)
-            self.list.SetColumnWidth(idx, width)
-
+        lists = self.list
+        self.table = ProcessTable(self)
+        lists.SetTable(self.table, True, wx.grid.Grid.SelectRows)
+        lists.EnableEditing(False)
+        lists.EnableDragRowSize(False)
+        lists.SetRowLabelSize(0)
+        lists.SetColLabelSize(22)
+        lists.SetDefaultRowSize(22)
+        lists.SetCellHighlightPenWidth(0)
+        lists.SetCellHighlightROPenWidth(0)
+        lists.SetGridLineColour(wx.Colour(230, 230, 230))
+        lists.SetColLabelAlignment(wx.ALIGN_LEFT, wx.ALIGN_CENTER)
+        for col, width in enumerate((50, 164, 83, 83, 70, 70, 90)):
+            lists.SetColSize(col, width)
+        for col in ProcessTable.DETAIL_COLUMNS + (ProcessTable.GROWTH_COLUMN,):
+            attr = wx.grid.GridCellAttr()
+            attr.SetAlignment(wx.ALIGN_RIGHT, wx.ALIGN_CENTER)
+            lists.SetColAttr(col, attr)
+        self.show_memory_detail(self.config.processlist_memory_detail)
+        lists.HideCol(ProcessTable.GROWTH_COLUMN)
+        for col, colour in ((2, wx.Colour(222, 147, 230)), (3, wx.Colour(227, 202, 136))):
+            attr = wx.grid.GridCellAttr()
+            attr.SetRenderer(GaugeCellRenderer(colour))
+            lists.SetColAttr(col, attr)
+
+        self.check_live.SetValue(self.config.processlist_live)
+        self.choice_range.SetSelection(PLOT_RANGES.index(self.plot_span))
+        plot_window = self.canvas.canvas
+        plot_window.SetToolTip("ホイールで拡大・縮小、ドラッグで移動、ダブルクリックで最新に戻ります")
+        plot_window.Bind(wx.EVT_MOUSEWHEEL, self.on_plot_wheel)
+        plot_window.Bind(wx.EVT_LEFT_DOWN, self.on_plot_left_down)
+        plot_window.Bind(wx.EVT_LEFT_UP, self.on_plot_left_up)
+        plot_window.Bind(wx.EVT_MOTION, self.on_plot_motion)
+        plot_window.Bind(wx.EVT_LEFT_DCLICK, self.on_plot_dclick)
+        plot_window.Bind(wx.EVT_CONTEXT_MENU, self.on_plot_menu)
+        self.canvas.set_backend(self.config.processlist_plot_backend)
         self.update_select_process(None)
         self.update_list_layout(True)
 
-        self.list.Bind(ulc.EVT_LIST_ITEM_SELECTED, self.on_list_select)
-        self.list.Bind(ulc.EVT_LIST_ITEM_DESELECTED, self.on_list_deselect)
-        self.list.Bind(ulc.EVT_LIST_COL_CLICK, self.on_list_col_click)
-        self.list._mainWin.Bind(wx.EVT_SCROLLWIN, self.on_list_scroll)
-        self.list.Bind(wx.EVT_KEY_DOWN, self.on_list_char)
+        lists.Bind(wx.grid.EVT_GRID_SELECT_CELL, self.on_list_select)
+        lists.Bind(wx.grid.EVT_GRID_LABEL_LEFT_CLICK, self.on_list_col_click)
+        lists.Bind(wx.grid.EVT_GRID_LABEL_RIGHT_CLICK, self.on_list_label_menu)
+        # KEY_DOWN のキーコードは Shift や IME の入力を反映しないため、文字として届く EVT_CHAR で受け取る
+        lists.Bind(wx.EVT_CHAR, self.on_list_char)
+        self.txt_search.Bind(wx.EVT_SEARCHCTRL_CANCEL_BTN, self.on_search_cancel)
 
         self.frame.Bind(wx.EVT_SHOW, self.on_frame_show)
         self.frame.Bind(wx.EVT_CLOSE, self.on_frame_close)
@@ -157,12 +303,12 @@ class ProcessListApp(ProcessListPanel):
             self.update_select_process(None)
             self.update_list_layout(True)
 
-            def _clear():
-                self.clear_lists()
-                self.p_mem_line_points = deque([-1] * 60, maxlen=60)
-                self.v_mem_line_points = deque([-1] * 60, maxlen=60)
+            wx.CallAfter(self.clear_lists)
 
-            wx.CallAfter(_clear)
+    def close(self):
+        self.stop(all_clear=False)
+        self._scanner.close()
+        self.memory_detail.stop()
 
     def _run_loop(self, interrupt: threading.Event):
         while not interrupt.is_set():
@@ -178,36 +324,73 @@ class ProcessListApp(ProcessListPanel):
 
     def _run(self):
         try:
-            wx.CallAfter(self.put_memory_usage)
+            # 監視側が直前に取得したスナップショットがあれば共有する
+            snapshot = self.sampler.get(max_age=self.refresh_rate / 2)
+            wx.CallAfter(self.put_memory_usage, snapshot)
 
         except (Exception,):
             traceback.print_exc()
 
-    def put_memory_usage(self):
-        p_mem = psutil.virtual_memory()
-        v_mem = psutil.swap_memory()
+        if self.config.processlist_live:
+            self._run_live()
+
+        if self.config.processlist_memory_detail:
+            wx.CallAfter(self._request_memory_detail)
+
+    def _run_live(self):
+        # 前回の差分がまだ反映されていない場合や、一覧を読み込み中の場合は見送る (次回の差分にまとめて含まれる)
+        if self._live_pending or self._reading or self._resync or not self.processes:
+            return
+        if time.monotonic() - self._last_live_scan < self.config.processlist_live_interval_ms / 1000:
+            return
 
-        total = p_mem.total
-        used = total - p_mem.available
+        self._last_live_scan = time.monotonic()
+        try:
+            diff = self._scanner.diff()
+        except (Exception,):
+            traceback.print_exc()
+            return
+
+        if diff:
+            self._live_pending = True
+            wx.CallAfter(self._apply_live_diff, diff)
+
+    def _apply_live_diff(self, diff: Union[ProcessBatch, ProcessDiff]):
+        # 受け取った差分はワーカー側の基準を進めているため、捨てると一覧がずれたままになる
+        try:
+            if self._reading:
+                # 読み込み中の結果と合わせて、受け取った順に反映する
+                self._queued_results.append(diff)
+                return
+            if not self.processes:
+                # 一覧が消去された後は反映できないため、次回の読み込みで全件を取得し直す
+                self._resync = True
+                return
+            with freezing(self.list):
+                self.apply_scan_result(diff)
+                self.track_growth()
+                self.sort_lists(keep_scroll=True)
+        except (Exception,):
+            traceback.print_exc()
+            self._resync = True
+            wx.CallAfter(self.read_processes)
+        finally:
+            self._live_pending = False
+
+    def put_memory_usage(self, snapshot: MemorySnapshot):
+        total = snapshot.total
+        used = snapshot.used
         percent = used / total * 100
         self.p_mem.total = total
         self.p_mem.used = used
-        self.p_mem.available = p_mem.available
+        self.p_mem.available = snapshot.available
         self.lab_physical_percent.SetLabel(f"{round(percent, 1)} %")
         total /= 1024 ** 2
         used /= 1024 ** 2
         self.lab_physical_size.SetLabel(f"{round(used):,} MB / {round(total):,} MB")
-        self.p_mem_line_points.append(used)
-        p_line = PlotLine(
-            min_value=0,
-            max_value=total,
-            values=self.p_mem_line_points,
-            color=wx.Colour(170, 80, 180),
-            fill_color=wx.Colour(170, 80, 180, 70),
-        )
 
-        total = v_mem.total
-        used = v_mem.used
+        total = snapshot.swap_total
+        used = snapshot.swap_used
         percent = used / total * 100
         self.v_mem.total = total
         self.v_mem.used = used
@@ -216,18 +399,127 @@ class ProcessListApp(ProcessListPanel):
         total /= 1024 ** 2
         used /= 1024 ** 2
         self.lab_virtual_size.SetLabel(f"{round(used):,} MB / {round(total):,} MB")
-        self.v_mem_line_points.append(used)
+
+        self.sizer_mem_info.Layout()
+        self.plot_count += 1
+        self.draw_plot()
+
+    def _plot_view(self):
+        """
+        表示範囲を収められる最も細かい履歴の段と、その段での (表示する件数, 最新から遡る件数)
+        """
+        latest = self.history.last_time
+        back_seconds = 0.
+        if self.plot_end is not None and latest == latest:
+            back_seconds = max(0., latest - self.plot_end)
+
+        tier = self.history.tier_for(self.plot_span + back_seconds)
+        count, back = tier.slots(self.plot_span, self.plot_end)
+        return tier, count, back
+
+    def draw_plot(self):
+        if not self.history.physical_total:
+            return
+
+        tier, count, back = self._plot_view()
+        # 1秒より粗い段は各バケットの最大値で描き、短い山も見えるようにする
+        stat = "mean" if tier is self.history.tiers[0] else "max"
+        # 間引いた結果のキャッシュは、表示している段・統計値・範囲のいずれかが変われば作り直す
+        version = (self.history.tiers.index(tier), stat, back, count, tier.version)
+        p_line = PlotLine(
+            min_value=0,
+            max_value=self.history.physical_total,
+            values=tier.series("physical", stat, count + back)[:count],
+            version=version,
+            color=wx.Colour(170, 80, 180),
+            fill_color=wx.Colour(170, 80, 180, 70),
+        )
         v_line = PlotLine(
             min_value=0,
-            max_value=total,
-            values=self.v_mem_line_points,
+            max_value=self.history.swap_total or 1,
+            values=tier.series("swap", stat, count + back)[:count],
+            version=version,
             color=wx.Colour(210, 162, 39),
             fill_color=wx.Colour(210, 162, 39, 40),
         )
 
-        self.sizer_mem_info.Layout()
-        self.plot_count += 1
-        self.canvas.draw([v_line, p_line])
+        # 最新スロットの通し番号を渡し、スロットが増えた分だけスクロールさせる
+        position = tier.appended - 1 - back if tier.appended else None
+        self.canvas.divider = max(1, round(count / 12))
+        self.canvas.draw([v_line, p_line], position=position)
+
+    def set_plot_range(self, span: float, end: Optional[float] = None):
+        """
+        グラフの表示範囲を span 秒に変更します (end が None または最新以降の場合は最新に追従します)
+        """
+        self.plot_span = max(PLOT_SPAN_MIN, min(span, self.history.tiers[-1].span))
+        latest = self.history.last_time
+        if end is not None and latest == latest and end >= latest:
+            end = None
+        self.plot_end = end
+        self.draw_plot()
+
+    def on_plot_wheel(self, event: wx.MouseEvent):
+        rotation = event.GetWheelRotation()
+        if not rotation:
+            return
+        width = max(1, self.canvas.canvas.GetClientSize().width)
+        latest = self.history.last_time
+        if latest != latest:
+            return
+
+        # カーソル位置の時刻を固定したまま拡大・縮小する
+        end = latest if self.plot_end is None else self.plot_end
+        ratio = 1 - max(0., min(event.GetX() / width, 1.))
+        anchor = end - self.plot_span * ratio
+        span = self.plot_span / PLOT_ZOOM_STEP if rotation > 0 else self.plot_span * PLOT_ZOOM_STEP
+        span = max(PLOT_SPAN_MIN, min(span, self.history.tiers[-1].span))
+        self.set_plot_range(span, None if self.plot_end is None else anchor + span * ratio)
+
+    def on_plot_left_down(self, event: wx.MouseEvent):
+        event.Skip()
+        latest = self.history.last_time
+        if latest != latest:
+            return
+        self._plot_drag = event.GetX(), (latest if self.plot_end is None else self.plot_end)
+        window = self.canvas.canvas
+        if not window.HasCapture():
+            window.CaptureMouse()
+
+    def on_plot_motion(self, event: wx.MouseEvent):
+        event.Skip()
+        if self._plot_drag is None or not event.Dragging():
+            return
+        start_x, start_end = self._plot_drag
+        width = max(1, self.canvas.canvas.GetClientSize().width)
+        self.set_plot_range(self.plot_span, start_end - (event.GetX() - start_x) / width * self.plot_span)
+
+    def on_plot_left_up(self, event: wx.MouseEvent):
+        event.Skip()
+        self._plot_drag = None
+        window = self.canvas.canvas
+        if window.HasCapture():
+            window.ReleaseMouse()
+
+    def on_plot_dclick(self, event: wx.MouseEvent):
+        event.Skip()
+        self.set_plot_range(self.plot_span)
+
+    def on_plot_menu(self, _: wx.ContextMenuEvent):
+        menu = wx.Menu()
+        item = menu.AppendCheckItem(wx.ID_ANY, "NumPy で描画")
+        item.Check(self.canvas.backend == "numpy")
+        menu.Bind(wx.EVT_MENU, lambda _: self.set_plot_backend("numpy" if item.IsChecked() else "gcdc"), item)
+        self.canvas.canvas.PopupMenu(menu)
+        menu.Destroy()
+
+    def set_plot_backend(self, backend: str):
+        self.canvas.set_backend(backend)
+        self.config.processlist_plot_backend = backend
+        try:
+            self.config.save()
+        except (Exception,):
+            traceback.print_exc()
 
     def on_frame_show(self, event):
         event.Skip()
@@ -253,25 +545,31 @@ class ProcessListApp(ProcessListPanel):
         finally:
             event.Skip()
 
-    def on_list_select(self, event: ulc.UltimateListEvent):
-        self._deselect_flag = False
-        info = self.list.GetItemPyData(event.GetIndex())
-        self.update_select_process(info)
+    def on_check(self, event: wx.CommandEvent):
         event.Skip()
+        if event.GetEventObject() is self.check_live:
+            self.config.processlist_live = self.check_live.GetValue()
+            try:
+                self.config.save()
+            except (Exception,):
+                traceback.print_exc()
 
-    def on_list_deselect(self, event: ulc.UltimateListEvent):
-        self._deselect_flag = True
+    def on_list_select(self, event: wx.grid.GridEvent):
         event.Skip()
+        row = event.GetRow()
+        if 0 <= row < len(self.table.rows):
+            self.list.SelectRow(row)
+            self.update_select_process(self.table.rows[row])
+        else:
+            self.update_select_process(None)
 
-        def _deselect():
-            if self._deselect_flag:
-                self.update_select_process(None)
-
-        wx.CallAfter(_deselect)
-
-    def on_list_col_click(self, event: ulc.UltimateListEvent):
-        event.Skip()
-        column = event.GetColumn()
+    def on_list_col_click(self, event: wx.grid.GridEvent):
+        column = event.GetCol()
+        if event.GetRow() != -1 or column < 0:
+            event.Skip()
+            return
+        if column >= len(DEFAULT_SORT_TYPE_DIRECTION) or self.show_growers:  # 増加傾向は常に増加の速い順
+            return
 
         e_type, desc = self.sort_type.value
         if e_type == column:
@@ -280,53 +578,181 @@ class ProcessListApp(ProcessListPanel):
             self.sort_type = SortType((column, DEFAULT_SORT_TYPE_DIRECTION[column]))
         self.sort_lists()
 
-    def on_list_scroll(self, event: wx.ScrollWinEvent):
-        event.Skip()
-        wx.CallAfter(self.list.Refresh)  # fix item visibility
-
     def on_list_char(self, event: wx.KeyEvent):
-        first_char = chr(event.GetUnicodeKey()).lower()
+        key = event.GetUnicodeKey()
+        # Shift は大文字や記号の入力に使うため、Ctrl/Alt のショートカットだけを除外する
+        if key == wx.WXK_NONE or key < 0x20 or key == 0x7f or event.HasModifiers():
+            event.Skip()
+            return
+        # 一覧で文字を入力した場合は検索欄へ送る
+        self.txt_search.SetFocus()
+        self.txt_search.AppendText(chr(key))
+
+    def on_search_text(self, event: wx.CommandEvent):
+        event.Skip()
+        query = self.txt_search.GetValue().strip()
+        if query != self.search_query:
+            self.search_query = query
+            self.sort_lists()
 
+    def on_choice(self, event: wx.CommandEvent):
+        event.Skip()
+        if event.GetEventObject() is self.choice_range:
+            self.set_plot_range(PLOT_RANGES[self.choice_range.GetSelection()])
+
+        if event.GetEventObject() is self.choice_group:
+            selection = self.choice_group.GetSelection()
+            self.group_by = GROUP_KEYS[selection - 1] if 0 < selection <= len(GROUP_KEYS) else None
+            self.show_growers = selection == len(GROUP_KEYS) + 1
+            if self.show_growers:
+                self.list.ShowCol(ProcessTable.GROWTH_COLUMN)
+            else:
+                self.list.HideCol(ProcessTable.GROWTH_COLUMN)
+            self.update_select_process(None)
+            self.sort_lists()
+            self.list.GetGridColLabelWindow().Refresh()
+
+    def on_list_label_menu(self, event: wx.grid.GridEvent):
+        menu = wx.Menu()
+        item = menu.AppendCheckItem(wx.ID_ANY, "USS/PSS を表示")
+        item.Check(self.config.processlist_memory_detail)
+        menu.Bind(wx.EVT_MENU, lambda _: self.show_memory_detail(item.IsChecked()), item)
+        alert_item = menu.AppendCheckItem(
+            wx.ID_ANY, f"増加傾向を通知 ({self.config.processlist_growth_alert_mb_min} MB/分 以上)")
+        alert_item.Check(self.config.processlist_growth_alert)
+        menu.Bind(wx.EVT_MENU, lambda _: self.set_growth_alert(alert_item.IsChecked()), alert_item)
+        self.list.PopupMenu(menu)
+        menu.Destroy()
+
+    def show_memory_detail(self, show: bool):
+        """
+        USS/PSS 列の表示を切り替えます (表示中のみバックグラウンドで取得します)
+        """
         lists = self.list
-        count = lists.GetItemCount()
-        offset = lists.GetFirstSelected() + 1
-        for n in range(count):
-            index = (offset + n) % count
-            info = lists.GetItemPyData(index)
-            if info["name"].lower().startswith(first_char):
-                lists.Select(index)
-                lists.Focus(index)
-                wx.CallAfter(lists.Update)
-                break
+        for col in ProcessTable.DETAIL_COLUMNS:
+            if show:
+                lists.ShowCol(col)
+            else:
+                lists.HideCol(col)
+
+        if show == self.config.processlist_memory_detail:
+            if show:
+                self.memory_detail.start()
+            return
+
+        self.config.processlist_memory_detail = show
+        try:
+            self.config.save()
+        except (Exception,):
+            traceback.print_exc()
+
+        if show:
+            self.memory_detail.start()
+            self._request_memory_detail()
+        else:
+            self.memory_detail.stop()
+
+    def set_growth_alert(self, enabled: bool):
+        self.config.processlist_growth_alert = enabled
+        try:
+            self.config.save()
+        except (Exception,):
+            traceback.print_exc()
+
+    def track_growth(self):
+        """
+        現在の一覧の RSS を記録し、増加速度を計算し直します
+        """
+        now = time.monotonic()
+        self.growth.add(now, self.processes.values())
+        self.growth_rates = {entry.pid: entry for entry in self.growth.growth(now)}
+        if self.config.processlist_growth_alert:
+            self._check_growth_alert(now)
+
+    def _check_growth_alert(self, now: float):
+        notified = self._growth_notified
+        for pid in notified.keys() - self.processes.keys():
+            del notified[pid]
+
+        cool = self.config.notify_cool_ms / 1000
+        min_rate = self.config.processlist_growth_alert_mb_min * 1024 ** 2 / 60
+        for entry in self.growth.leaks(min_rate, now):
+            if now - notified.get(entry.pid, -cool) < cool:
+                continue
+            notified[entry.pid] = now
+            info = self.processes[entry.pid]
+            message = (f"{info['name']} (PID: {entry.pid}) のメモリ使用量が "
+                       f"{entry.rate * 60 / 1024 ** 2:,.1f} MB/分 で増え続けています ({_format_size(entry.rss)})")
+            print(f"growth: {message}")
+            if self.on_notify:
+                self.on_notify("メモリ使用量の増加", message)
+
+    def _request_memory_detail(self):
+        # 物理メモリの使用量が大きい順に取得させる
+        self.memory_detail.request([
+            (info["pid"], info.get("create_time", 0.)) for info in self.index.ordered(2, descending=True)
+        ])
+
+    def _on_memory_detail_update(self):
+        if self.config.processlist_memory_detail:
+            self.list.ForceRefresh()
+
+    def on_search_cancel(self, event: wx.CommandEvent):
         event.Skip()
+        self.txt_search.ChangeValue("")
+        self.search_query = ""
+        self.sort_lists()
+        self.list.SetFocus()
+
+    def get_selected_row(self) -> int:
+        rows = self.list.GetSelectedRows()
+        return rows[0] if rows else -1
 
-    def _append_process_item_to_list(self, proc_info):
+    def get_selected_process(self) -> Optional[dict]:
+        row = self.get_selected_row()
+        return self.table.rows[row] if row != -1 else None
+
+    def select_row(self, row: int, *, ensure_visible=True):
         lists = self.list
-        index = lists.GetItemCount()
-        mem_info = proc_info["memory_info"]
-        p_used = mem_info.rss
-        p_used_str = f"{round(p_used / 1024 / 1024, 1):,} MB"
-        v_used = mem_info.vms
-        v_used_str = f"{round(v_used / 1024 / 1024, 1):,} MB"
-
-        lists.Append((str(proc_info["pid"]), proc_info["name"], "", ""))
-
-        p_gauge = PyGauge(lists, style=wx.GA_HORIZONTAL)
-        p_gauge._barColour = [wx.Colour(222, 147, 230)]
-        p_gauge.SetDrawValue(drawPercent=True, formatString=_format_gauge_label(p_used_str))
-        p_gauge.SetValue(round(p_used / self.p_mem.used * 100))
-        p_gauge_item = lists.GetItem(index, 2)  # type: ulc.UltimateListItem
-        p_gauge_item.SetWindow(p_gauge, expand=True)
-        lists.SetItem(p_gauge_item)
-
-        v_gauge = PyGauge(lists, style=wx.GA_HORIZONTAL)
-        v_gauge._barColour = [wx.Colour(227, 202, 136)]
-        v_gauge.SetDrawValue(drawPercent=True, formatString=_format_gauge_label(v_used_str))
-        v_gauge.SetValue(round(v_used / self.v_mem.used * 100))
-        v_gauge_item = lists.GetItem(index, 3)  # type: ulc.UltimateListItem
-        v_gauge_item.SetWindow(v_gauge, expand=True)
-        lists.SetItem(v_gauge_item)
-        lists.SetItemPyData(index, proc_info)
+        lists.SetGridCursor(row, 0)
+        lists.SelectRow(row)
+        if ensure_visible:
+            lists.MakeCellVisible(row, 0)
+
+    def _add_process(self, proc_info: dict):
+        self.index.add(proc_info)
+        self.search_index.add(proc_info)
+
+    def _remove_process(self, pid: int):
+        self.search_index.remove(pid)
+        if self.index.remove(pid) is not None:
+            self.sort_lists()
+
+    def apply_process_diff(self, diff: ProcessDiff):
+        """
+        ProcessScanner.diff() の結果を一覧へ反映します (表示は sort_lists で更新されます)
+        """
+        index = self.index
+        search_index = self.search_index
+        for pid in diff.removed:
+            index.remove(pid)
+            search_index.remove(pid)
+        for pid, mem_info in diff.changed():
+            index.update_memory(pid, mem_info)
+        # PID が再利用された場合は removed と added の両方に含まれるため、既存の pid は置き換える
+        for info in diff.added.records():
+            index.add(info)
+            search_index.add(info)
+
+    def apply_scan_result(self, result: Union[ProcessBatch, ProcessDiff]):
+        """
+        ProcessScanner の結果を一覧へ反映します (ProcessBatch の場合は全件を作り直します)
+        """
+        if isinstance(result, ProcessDiff):
+            self.apply_process_diff(result)
+        else:
+            self.index.rebuild(result.records())
+            self.search_index.rebuild(self.index.processes.values())
 
     def update_select_process(self, proc_info: Optional[dict]):
         if proc_info is None:
@@ -334,6 +760,16 @@ class ProcessListApp(ProcessListPanel):
             self.lab_select_process.SetLabel("")
             self.btn_restart.Disable()
             self.btn_terminate.Disable()
+        elif proc_info.get("group"):
+            with freezing(self):
+                self.btn_restart.Disable()
+                self.btn_terminate.Disable()
+                members = (self.processes.get(pid) for pid in proc_info["members"])
+                self.txt_commandline.ChangeValue(", ".join(
+                    f"{info['name']} ({info['pid']}) {_format_size(info['memory_info'].rss)}"
+                    for info in members if info))
+                self.txt_commandline.SetInsertionPoint(0)
+                self.lab_select_process.SetLabel(f"{proc_info['name']} ({proc_info['count']} プロセス)")
         else:
             with freezing(self):
                 self.btn_restart.Enable()
@@ -359,42 +795,41 @@ class ProcessListApp(ProcessListPanel):
         self.update_list_layout(True)
 
         self._reading = True
-        wait = self._multiprocessing_wait
-        wait.clear()
-        ret_info = self._multiprocessing_dict
-        ret_info.clear()
-        p = multiprocessing.Process(target=_dump_processes, args=(ret_info, wait), daemon=True)
-        p.start()
+        resync = self._resync
+        self._resync = False
 
         def _waiter():
+            result = None
             try:
-                while not wait.is_set():
-                    wx.CallAfter(_progress)
-                    time.sleep(.05)
-
-                self.lab_reading.SetLabel("リストを作成中...")
-                self.sizer_list.Layout()
+                on_progress = lambda count: wx.CallAfter(_progress, count)
+                if self.processes and not resync:
+                    result = self._scanner.diff(on_progress=on_progress)
+                else:
+                    result = self._scanner.scan(on_progress=on_progress)
+            except (Exception,):
+                traceback.print_exc()
             finally:
-                wx.CallAfter(_done)
+                wx.CallAfter(_done, result)
 
-        def _progress():
-            process_count = len(ret_info)
+        def _progress(process_count: int):
             self.lab_reading.SetLabel(f"プロセスを読み込み中 ({process_count})")
             self.sizer_list.Layout()
 
-        def _done():
+        def _done(result: Union[ProcessBatch, ProcessDiff, None]):
             try:
-                with freezing(self.list):
-                    self.clear_lists()
-                    for info in ret_info.values():
-                        self._append_process_item_to_list(info)
+                self.lab_reading.SetLabel("リストを作成中...")
+                self.sizer_list.Layout()
+                results = self._queued_results
+                self._queued_results = []
+                if result is None:
+                    self._resync = True
+                else:
+                    results.append(result)
+                for entry in sorted(results, key=lambda e: e.sequence):
+                    self.apply_scan_result(entry)
+                self.track_growth()
 
             finally:
-                try:
-                    p.terminate()
-                except (Exception,):
-                    traceback.print_exc()
-
                 self._reading = False
                 self.btn_read.Enable()
                 self.update_list_layout(False)
@@ -403,49 +838,74 @@ class ProcessListApp(ProcessListPanel):
 
         threading.Thread(target=_waiter, daemon=True).start()
 
-    def sort_lists(self, *, select_pid: int = None):
+    def sort_lists(self, *, select_pid: int = None, keep_scroll=False):
         e_type, desc = self.sort_type.value
 
-        lists = self.list
-        lines = lists._mainWin._lines  # type: list[ulc.UltimateListLineData]
+        select_key = select_pid
+        if select_key is None:
+            selected = self.get_selected_process()
+            select_key = selected and _row_key(selected)
 
-        def _key(e: ulc.UltimateListLineData):
-            info = e._items[0]._pyData
-            value = self.sort_type.value_by(info)
-            return value.lower() if isinstance(value, str) else value
+        # 各列のキーは ProcessIndex が常にソート済みで保持しているため、並び順を切り替えるだけ
+        self.index.set_order(e_type, desc)
+        if self.search_query:
+            rows = self.index.select(self.search_index.search(self.search_query))
+        else:
+            rows = self.index
 
-        lines.sort(key=_key, reverse=desc)
+        if self.group_by:
+            rows = sorted(self._group_rows(rows), key=GROUP_SORT_KEYS[e_type], reverse=desc)
+        elif self.show_growers:
+            rows = self._grower_rows(rows)
 
+        lists = self.list
         with freezing(lists):
-            lists.SortItems(func=lambda *_: 0)
-            # lists.Select()
+            lists.ClearSelection()
+            self.table.set_rows(rows)
 
-            if select_pid is not None:
-                for idx, line in enumerate(lines):
-                    info = line._items[0]._pyData
-                    if info["pid"] == select_pid:
-                        lists.Select(idx)
-                        wx.CallAfter(lists.Update)
-                        break
+            if select_key is not None:
+                if rows is self.index:
+                    row = self.index.index_of(select_key)
+                else:
+                    row = next((idx for idx, info in enumerate(rows) if _row_key(info) == select_key), None)
+                if row is not None:
+                    self.select_row(row, ensure_visible=not keep_scroll)
+                else:
+                    self.update_select_process(None)
+
+    def _group_rows(self, rows: Sequence[dict]):
+        # 集計に並び順は関係ないため、全件の場合はインデックスを経由せずに渡す
+        infos = list(self.processes.values()) if rows is self.index else rows
+        for group in aggregate(infos, self.group_by):
+            yield dict(
+                pid=None,
+                name=group.label,
+                count=group.count,
+                memory_info=MemInfo(group.rss, group.vms),
+                members=group.members,
+                cmdline=None,
+                group=True,
+            )
+
+    def _grower_rows(self, rows: Sequence[dict]):
+        growth_rates = self.growth_rates
+        growers = sorted((growth_rates[info["pid"]] for info in rows
+                          if info["pid"] in growth_rates and growth_rates[info["pid"]].rate > 0),
+                         key=lambda entry: entry.rate, reverse=True)
+        return [self.processes[entry.pid] for entry in growers[:GROWERS_COUNT]]
 
     def clear_lists(self):
+        self.growth.clear()
+        self.growth_rates = {}
+        self.index.clear()
+        self.search_index.clear()
         with freezing(self.list):
-            for index in range(self.list.GetItemCount()):
-                win = self.list.GetItemWindow(index, col=2)  # type: wx.Window
-                if win:
-                    win.Destroy()
-                    self.list.DeleteItemWindow(index, col=2)
-                win = self.list.GetItemWindow(index, col=3)
-                if win:
-                    win.Destroy()
-                    self.list.DeleteItemWindow(index, col=3)
-
-            self.list.DeleteAllItems()
+            self.list.ClearSelection()
+            self.table.set_rows(self.index)
 
     def _kill_select(self):
-        selected = self.list.GetFirstSelected()
-        if selected != -1:
-            info = self.list.GetItemPyData(selected)
+        info = self.get_selected_process()
+        if info is not None:
             pid = info["pid"]
             name = info["name"]
             result = removed = False
@@ -503,13 +963,12 @@ class ProcessListApp(ProcessListPanel):
                         process.wait(timeout=5)
                     except psutil.TimeoutExpired:
                         return
-                self.list.DeleteItem(selected)
+                self._remove_process(pid)
                 self.update_select_process(None)
 
     def _terminate_select(self):
-        selected = self.list.GetFirstSelected()
-        if selected != -1:
-            info = self.list.GetItemPyData(selected)
+        info = self.get_selected_process()
+        if info is not None:
             pid = info["pid"]
             name = info["name"]
             result = removed = False
@@ -565,13 +1024,12 @@ class ProcessListApp(ProcessListPanel):
                         process.wait(timeout=5)
                     except psutil.TimeoutExpired:
                         return
-                self.list.DeleteItem(selected)
+                self._remove_process(pid)
                 self.update_select_process(None)
 
     def _restart_select(self):
-        selected = self.list.GetFirstSelected()
-        if selected != -1:
-            info = self.list.GetItemPyData(selected)
+        info = self.get_selected_process()
+        if info is not None:
             pid = info["pid"]
             name = info["name"]
             cmdline = info["cmdline"] or None
@@ -643,25 +1101,29 @@ class ProcessListApp(ProcessListPanel):
                         process.wait(timeout=5)
                     except psutil.TimeoutExpired:
                         return
-                self.list.DeleteItem(selected)
+                self._remove_process(pid)
                 self.update_select_process(None)
 
             if new_process:
                 try:
-                    new_process_info = _dump_process(new_process.pid)
-                except psutil.Error as e:
+                    new_process_info = read_process(new_process.pid)
+                except (psutil.Error, OSError) as e:
                     print(f"WARN: Failed to get info: {e}")
                 else:
-                    self._append_process_item_to_list(new_process_info)
-                    self.sort_lists(select_pid=new_process.pid)
+                    if new_process_info is not None:
+                        self._add_process(new_process_info)
+                        self.sort_lists(select_pid=new_process.pid)
 
 
 if __name__ == '__main__':
     _app = wx.App()
-    from ramnotify import RamNotifyConfig
+    from config import RamNotifyConfig
     config = RamNotifyConfig(Path("../settings.json"))
     config.load()
-    app = ProcessListApp(None, config)
+    sampler = MemorySampler()
+    history = MemoryHistory()
+    sampler.subscribe(history.add)
+    app = ProcessListApp(None, config, sampler, history)
     app.frame.SetPosition((50, -(50 + app.frame.GetSize()[1])))
     app.frame.Show()
     _app.MainLoop()
@@ -1,21 +1,28 @@
-import json
+import io
 import multiprocessing
 import signal
-import subprocess
 import sys
-import threading
-import time
 import traceback
 import webbrowser
 from pathlib import Path
-from typing import List, Callable, Optional, TYPE_CHECKING
+from typing import List, TYPE_CHECKING
+
+if __name__ == "__main__" and "--daemon" in sys.argv[1:]:
+    # wx を読み込まずにヘッドレスで監視する
+    from daemon import main
+    sys.exit(main())
 
-import psutil
 import wx
 import wx.adv
 
-import embedded_image
+from config import REFRESH_RATE_AUTO, RamNotifyConfig
+from engine import MonitorEngine
+from history import MemoryHistory
+from historyfile import HistoryWriter
 from layout import RamNotifyPanel
+from pressure import PressureWatcher
+from resources import DEFAULT_PACK_PATH, ResourcePack
+from sampler import MemorySampler, MemorySnapshot
 
 if TYPE_CHECKING:
     from processlist import ProcessListApp
@@ -37,6 +44,7 @@ __date__ = "240228"
 
 GITHUB_URL = "https://github.com/Necnion8/RAMNotify"
 REFRESH_RATE_VALS = [
+    REFRESH_RATE_AUTO,
     500,
     1000,
     1000 * 2,
@@ -64,190 +72,54 @@ def find_near_vals(value: int, values: List[int]):
     return near_value, values.index(near_value)
 
 
-class CoolTime(object):
-    def __init__(self, cool_seconds: int):
-        self.cool = cool_seconds
-        self.last_check = 0
-
-    @property
-    def is_cool(self):
-        return time.time() - self.last_check > self.cool
-
-    def set(self):
-        self.last_check = time.time()
-
-
-class Timer(object):
-    def __init__(self, id_: str, on_timer, seconds: int = None):
-        self.id = id_
-        self.on_timer = on_timer  # type: Callable[[Timer], None]
-        self.delay = seconds or 60
-        self._timer: Optional[wx.CallLater] = None
-
-    def __repr__(self):
-        return f"<{type(self).__name__} id={self.id!r} isRunning={self.is_running!r}>"
-
-    def change_delay(self, seconds: int):
-        self.delay = seconds
-
-    def stop(self, *, restart=False):
-        if self._timer:
-            self._timer.Stop()
-            self._timer = None
-            if not restart:
-                print(f"Stop timer: {self!r}")
-            return True
-
-    def start(self):
-        if self.stop(restart=True):
-            print(f"Restart timer: {self!r}")
-        else:
-            print(f"Start timer: {self!r}")
-        self._timer = wx.CallLater(self.delay * 1000, self._on_time)
-
-    def _on_time(self):
-        self.on_timer(self)
-
-    @property
-    def is_running(self):
-        return self._timer.IsRunning() if self._timer else False
-
-
 class EmbeddedImage:
-    APP_ICON: wx.Icon
-    GAUGES: List[wx.Icon]
+    # 画像は初めて使われた時にデコードしてキャッシュする
+    _pack = None  # type: ResourcePack | None
+    _bitmaps = {}  # type: dict[str, wx.Bitmap]
+    _icons = {}  # type: dict[str, wx.Icon]
 
     @classmethod
     def init(cls):
-        cls.APP_ICON = embedded_image.mem_x512.GetIcon()
-        cls.GAUGES = [
-            embedded_image.gauge0.GetIcon(),
-            embedded_image.gauge1.GetIcon(),
-            embedded_image.gauge2.GetIcon(),
-            embedded_image.gauge3.GetIcon(),
-            embedded_image.gauge4.GetIcon(),
-            embedded_image.gauge5.GetIcon(),
-            embedded_image.gauge6.GetIcon(),
-            embedded_image.gauge7.GetIcon(),
-            embedded_image.gauge8.GetIcon(),
-            embedded_image.gauge9.GetIcon(),
-            embedded_image.gauge10.GetIcon(),
-        ]
-
-
-class RamNotifyConfig(object):
-    def __init__(self, filename: Path):
-        self.config = filename
-        self.virtual_percent = 90
-        self.swap_percent = 90
-        self.virtual_notify = False
-        self.virtual_command_call = False
-        self.virtual_command = ""
-        self.virtual_command_call_repeat = 0
-        self.swap_notify = False
-        self.swap_command_call = False
-        self.swap_command = ""
-        self.swap_command_call_repeat = 0
-        self.swap_custom_size = False
-        self.swap_custom_size_max = 1
-        self.refresh_rate_ms = 5000
-        self.notify_cool_ms = 1000 * 60 * 30
-        self.task_bar_icon = 0
-        self.enable_processlist_app = False
-        # shadow
-        self.virtual_command_call_delay = 10
-        self.swap_command_call_delay = 10
-
-        #
-        self.first_load = False
-
-    def load(self):
-        if not self.config.is_file():
-            self.save()
-            self.first_load = True
-        else:
-            self.first_load = False
+        try:
+            cls._pack = ResourcePack(DEFAULT_PACK_PATH)
+        except (OSError, ValueError) as e:
+            print(f"WARN: Failed to open resource pack, fallback to embedded_image: {e}")
+            cls._pack = None
 
-        with self.config.open("r", encoding="utf-8") as file:
-            try:
-                config: dict = json.load(file) or {}
-            except json.JSONDecodeError:
-                traceback.print_exc()
-                config = {}
+    @classmethod
+    def close(cls):
+        if cls._pack:
+            cls._pack.close()
+            cls._pack = None
 
-        try:
-            _virtual = config.get("virtual") or {}
-            self.virtual_percent = int(_virtual.get("percentage") or 90)
-            self.virtual_notify = bool(_virtual.get("notify"))
-            self.virtual_command_call = bool(_virtual.get("call_command"))
-            self.virtual_command = str(_virtual.get("command") or "")
-            self.virtual_command_call_delay = int(_virtual.get("command_call_delay") or 10)
-            self.virtual_command_call_repeat = int(_virtual.get("command_call_repeat") or 0)
-
-            _swap = config.get("swap") or {}
-            self.swap_percent = int(_swap.get("percentage") or 90)
-            self.swap_notify = bool(_swap.get("notify"))
-            self.swap_command_call = bool(_swap.get("call_command"))
-            self.swap_command = str(_swap.get("command") or "")
-            self.swap_command_call_delay = int(_swap.get("command_call_delay") or 10)
-            self.swap_command_call_repeat = int(_swap.get("command_call_repeat") or 0)
-            self.swap_custom_size = bool(_swap.get("custom_size"))
-            self.swap_custom_size_max = int(_swap.get("custom_size_max") or 1)
-
-            self.notify_cool_ms = int(config.get("notify_cool_ms") or 1000 * 60 * 30)
-            self.task_bar_icon = int(config.get("task_bar_icon") or 0)
-            self.enable_processlist_app = bool(config.get("enable_processlist_app"))
-
-            refresh_rate_ms = 5000
-            if "refresh_rate_ms" in config:
-                refresh_rate_ms = int(config["refresh_rate_ms"])
-            elif "refresh_rate" in config:  # old ver
-                presets = [
-                    500,
-                    1000,
-                    1000 * 5,
-                    1000 * 10,
-                    1000 * 30,
-                    1000 * 60,
-                    1000 * 60 * 5,
-                ]
-                try:
-                    refresh_rate_ms = presets[max(0, min(int(config["refresh_rate"]), len(presets) - 1))]
-                except (KeyError, ValueError):
-                    pass
-            self.refresh_rate_ms = refresh_rate_ms
-
-        except (TypeError, ValueError):
-            traceback.print_exc()
+    @classmethod
+    def get_bitmap(cls, name: str) -> wx.Bitmap:
+        bitmap = cls._bitmaps.get(name)
+        if bitmap is None:
+            data = cls._pack.get(name) if cls._pack else None
+            if data is not None:
+                bitmap = wx.Bitmap(wx.Image(io.BytesIO(data), wx.BITMAP_TYPE_PNG))
+            else:
+                import embedded_image
+                bitmap = getattr(embedded_image, name).GetBitmap()
+            cls._bitmaps[name] = bitmap
+        return bitmap
 
-    def save(self):
-        config = dict(
-            version=1,
-            virtual=dict(
-                percentage=self.virtual_percent,
-                notify=self.virtual_notify,
-                call_command=self.virtual_command_call,
-                command=self.virtual_command,
-                command_call_delay=self.virtual_command_call_delay,
-                command_call_repeat=self.virtual_command_call_repeat,
-            ),
-            swap=dict(
-                percentage=self.swap_percent,
-                notify=self.swap_notify,
-                call_command=self.swap_command_call,
-                command=self.swap_command,
-                command_call_delay=self.swap_command_call_delay,
-                command_call_repeat=self.swap_command_call_repeat,
-                custom_size=self.swap_custom_size,
-                custom_size_max=self.swap_custom_size_max,
-            ),
-            task_bar_icon=self.task_bar_icon,
-            refresh_rate_ms=self.refresh_rate_ms,
-            notify_cool_ms=self.notify_cool_ms,
-            enable_processlist_app=self.enable_processlist_app,
-        )
-        with self.config.open("w", encoding="utf-8") as file:
-            json.dump(config, file, ensure_ascii=False)
+    @classmethod
+    def get_icon(cls, name: str) -> wx.Icon:
+        icon = cls._icons.get(name)
+        if icon is None:
+            icon = cls._icons[name] = wx.Icon()
+            icon.CopyFromBitmap(cls.get_bitmap(name))
+        return icon
+
+    @classmethod
+    def app_icon(cls):
+        return cls.get_icon("mem_x512")
+
+    @classmethod
+    def gauge(cls, level: int):
+        return cls.get_icon(f"gauge{max(0, min(level, 10))}")
 
 
 class RamNotify(RamNotifyPanel):
@@ -256,27 +128,28 @@ class RamNotify(RamNotifyPanel):
         self.frame = frame
         self.config = RamNotifyConfig(Path(sys.argv[0]).parent / "settings.json")
         self.load_all()
+        self.sampler = MemorySampler()
+        self.history = MemoryHistory()
+        self.history_writer = None  # type: HistoryWriter | None
+        self.engine = MonitorEngine(self.config, call_later=wx.CallLater, call_after=wx.CallAfter,
+                                    history=self.history)
         self.task_bar = MyTaskBar("RAM-Notify", self)
         self.timer = wx.Timer(self)  # refresh timer
         self.processlist_app = None  # type: ProcessListApp | None
-        # last-cache
-        self.last_virtual_over = False
-        self.last_swap_over = False
-        # timer
-        self.cool_notify = CoolTime(int(self.config.notify_cool_ms / 1000))
-        self.cool_virtual_command = CoolTime(self.config.virtual_command_call_delay)
-        self.cool_swap_command = CoolTime(self.config.swap_command_call_delay)
-        self.wait_virtual_command_wait = False
-        self.wait_swap_command_wait = False
-        self.timer_virtual_command = Timer("VCmdTimer", self.on_timer_virtual_command)
-        self.timer_swap_command = Timer("SCmdTimer", self.on_timer_swap_command)
+        self.pressure_watcher = None  # type: PressureWatcher | None
         # load
+        self.engine.on_notify = self.task_bar.ShowBalloon
+        self.engine.on_command_state = self.on_command_state
+        self.sampler.subscribe(self.history.add)
+        self.sampler.subscribe(self._on_memory_sample)
+        self.start_history_writer()
         self.register_signals()
         self.frame.Bind(wx.EVT_CLOSE, lambda e: self.hide_frame(save=False))
         self.Bind(wx.EVT_TIMER, self.on_timer)
         self.task_bar.Bind(wx.adv.EVT_TASKBAR_LEFT_DCLICK, self.on_icon_click)
         self.on_timer()
-        self.button_github.SetBitmap(embedded_image.github_icon.GetBitmap())
+        self.start_pressure_watcher()
+        self.button_github.SetBitmap(EmbeddedImage.get_bitmap("github_icon"))
         self.button_github.SetToolTip(GITHUB_URL)
 
         if self.config.enable_processlist_app:
@@ -288,7 +161,16 @@ class RamNotify(RamNotifyPanel):
             self.show_frame()
 
     def app_exit(self):
+        if self.processlist_app:
+            self.processlist_app.close()
+        if self.pressure_watcher:
+            self.pressure_watcher.stop()
+        self.engine.close()
+        self.sampler.close()
+        if self.history_writer:
+            self.history_writer.close()
         self.task_bar.Destroy()
+        EmbeddedImage.close()
         wx.Exit()
 
     def register_signals(self):
@@ -347,10 +229,10 @@ class RamNotify(RamNotifyPanel):
             self.on_timer()
 
         elif event.GetEventObject() is self.btn_call_virtual_command:
-            self.call_command_virtual(self.text_virtual_command.GetValue())
+            self.engine.call_command_virtual(self.text_virtual_command.GetValue())
 
         elif event.GetEventObject() is self.btn_call_swap_command:
-            self.call_command_swap(self.text_swap_command.GetValue())
+            self.engine.call_command_swap(self.text_swap_command.GetValue())
 
         elif event.GetEventObject() is self.button_github:
             webbrowser.open(GITHUB_URL)
@@ -358,85 +240,87 @@ class RamNotify(RamNotifyPanel):
         event.Skip()
 
     def on_timer(self, _=None, *, force_update=False):
-        self.timer.Start(self.config.refresh_rate_ms, oneShot=wx.TIMER_ONE_SHOT)
-
-        frame = getattr(wx.GetApp(), "frame", None)
-        is_shown = frame.IsShown() if frame else False
-
-        virtual = psutil.virtual_memory().percent
-        if is_shown and self.check_swap_custom_size.GetValue():
-            swap = self.get_swap_percent(self.spin_swap_custom_max.GetValue())
+        snapshot = None
+        try:
+            snapshot = self.sampler.sample()
+            if force_update and not self.frame.IsShown():
+                self.update_gauges(snapshot)
+        finally:
+            # ゲージやプロセス一覧のグラフを表示している間は、PSI の監視中でも通常の間隔で更新する
+            pressure_watched = bool(self.pressure_watcher and self.pressure_watcher.is_running
+                                    and not self.is_window_shown)
+            self.timer.Start(self.engine.get_refresh_rate_ms(snapshot, pressure_watched=pressure_watched),
+                             oneShot=wx.TIMER_ONE_SHOT)
+
+    def _on_memory_sample(self, snapshot: MemorySnapshot):
+        # sampler は別スレッドから呼ばれることがある
+        if wx.IsMainThread():
+            self.on_memory_sample(snapshot)
         else:
-            swap = self.get_swap_percent()
+            wx.CallAfter(self.on_memory_sample, snapshot)
 
+    def on_memory_sample(self, snapshot: MemorySnapshot):
+        self.update_task_bar_icon(snapshot)
+        if self.frame.IsShown():
+            self.update_gauges(snapshot)
+        self.engine.check_limits(snapshot)
+
+    def update_task_bar_icon(self, snapshot: MemorySnapshot):
         icon_mode = self.config.task_bar_icon
         if icon_mode == 1:
-            icon = EmbeddedImage.GAUGES[round(virtual / 10)]
+            icon = EmbeddedImage.gauge(round(snapshot.percent / 10))
         elif icon_mode == 2:
-            icon = EmbeddedImage.GAUGES[round(swap / 10)]
+            icon = EmbeddedImage.gauge(round(self.engine.get_swap_percent(snapshot) / 10))
         else:
-            icon = EmbeddedImage.GAUGES[0]
+            icon = EmbeddedImage.gauge(0)
         self.task_bar.change_icon(icon)
 
-        if force_update or is_shown:
-            self.gauge_used_virtual.SetValue(int(virtual))
-            self.text_used_virtual.ChangeValue(f"{virtual}%")
-            self.gauge_used_swap.SetValue(int(swap))
-            self.text_used_swap.ChangeValue(f"{swap}%")
-
-        # notify / run-command
-        swap = self.get_swap_percent()  # load from config value
-        notify_send = False
-
-        if virtual >= self.config.virtual_percent:
-            if self.config.virtual_notify and self.cool_notify.is_cool:
-                self.cool_notify.set()
-                self.task_bar.ShowBalloon("メモリ通知", f"物理メモリ 使用率が{int(virtual)}%です！")
-                notify_send = True
-
-            if self.last_virtual_over:
-                if self.config.virtual_command_call and self.cool_virtual_command.is_cool:
-                    self.cool_virtual_command.set()
-                    self.call_command_virtual()
-
-        self.last_virtual_over = virtual >= self.config.virtual_percent
-        if self.last_virtual_over:
-            if not self.timer_virtual_command.is_running and self.is_enable_virtual_timer:
-                self.timer_virtual_command.start()
-        else:
-            self.timer_virtual_command.stop()
-
-        if swap >= self.config.swap_percent:
-            if self.config.swap_notify and self.cool_notify.is_cool and not notify_send:
-                self.cool_notify.set()
-                self.task_bar.ShowBalloon("メモリ通知", f"論理メモリ 使用率が{int(virtual)}%です！")
-
-            if self.last_swap_over:
-                if self.config.swap_command_call and self.cool_swap_command.is_cool:
-                    self.cool_swap_command.set()
-                    self.call_command_swap()
-
-        self.last_swap_over = swap >= self.config.swap_percent
-        if self.last_swap_over:
-            if not self.timer_swap_command.is_running and self.is_enable_swap_timer:
-                self.timer_swap_command.start()
+    def update_gauges(self, snapshot: MemorySnapshot):
+        virtual = snapshot.percent
+        if self.check_swap_custom_size.GetValue():
+            swap = self.engine.get_swap_percent(snapshot, self.spin_swap_custom_max.GetValue())
         else:
-            self.timer_swap_command.stop()
+            swap = snapshot.swap_percent
+
+        self.gauge_used_virtual.SetValue(int(virtual))
+        self.text_used_virtual.ChangeValue(f"{virtual}%")
+        self.gauge_used_swap.SetValue(int(swap))
+        self.text_used_swap.ChangeValue(f"{swap}%")
+
+    def on_pressure(self):
+        # PSI トリガーによる割り込み (監視スレッドから呼ばれる)
+        wx.CallAfter(self.on_timer)
 
     # noinspection PyMethodMayBeStatic
     def on_icon_click(self, _):
         self.show_frame()
 
-    def on_timer_virtual_command(self, timer: Timer):
-        timer.start()
-        self.call_command_virtual()
-
-    def on_timer_swap_command(self, timer: Timer):
-        timer.start()
-        self.call_command_swap()
+    def on_command_state(self, kind: str, running: bool):
+        if kind == "virtual":
+            self.btn_call_virtual_command.Enable(not running)
+        elif kind == "swap":
+            self.btn_call_swap_command.Enable(not running)
 
     # control
 
+    def start_history_writer(self):
+        if not self.config.history_file:
+            return
+        self.history_writer = HistoryWriter(
+            self.config.history_path, max_bytes=self.config.history_file_max_mb * 1024 ** 2)
+        self.sampler.subscribe(self.history_writer.add)
+
+    def start_pressure_watcher(self):
+        if not self.config.pressure_trigger:
+            return
+        watcher = PressureWatcher(
+            self.on_pressure,
+            stall_ms=self.config.pressure_stall_ms,
+            window_ms=self.config.pressure_window_ms,
+        )
+        if watcher.start():
+            self.pressure_watcher = watcher
+
     def hide_frame(self, save=True):
         self.frame.Hide()
         try:
@@ -448,6 +332,10 @@ class RamNotify(RamNotifyPanel):
             else:
                 self.load_all()  # reset
 
+    @property
+    def is_window_shown(self):
+        return bool(self.frame.IsShown() or (self.processlist_app and self.processlist_app.frame.IsShown()))
+
     def show_frame(self):
         _shown = self.frame.IsShown()
         self.frame.Show()
@@ -502,89 +390,8 @@ class RamNotify(RamNotifyPanel):
         if max_size is not None:
             self.spin_swap_custom_max.SetValue(max_size)
 
-    # noinspection PyMethodMayBeStatic
-    def call_command(self, command: str, *, on_done: Callable[[Optional[int]], None] = None):
-        print(f"call-command: {command!r}")
-
-        def call():
-            code = None
-            try:
-                process = subprocess.Popen(command, shell=True, start_new_session=True)
-                process.wait()
-                code = process.returncode
-            finally:
-                def finish():
-                    print("call-command complete:", code)
-                    if on_done:
-                        on_done(code)
-                wx.CallAfter(finish)
-
-        th = threading.Thread(target=call, daemon=True)
-        th.start()
-
-    def call_command_virtual(self, command: str = None):
-        if self.wait_virtual_command_wait:
-            return
-
-        def done_action(_):
-            self.btn_call_virtual_command.Enable(True)
-            self.wait_virtual_command_wait = False
-
-        if command is None:
-            command = self.config.virtual_command
-
-        if command:
-            self.wait_virtual_command_wait = True
-            self.btn_call_virtual_command.Enable(False)
-            self.call_command(command, on_done=done_action)
-
-    def call_command_swap(self, command: str = None):
-        if self.wait_swap_command_wait:
-            return
-
-        def done_action(_):
-            self.btn_call_swap_command.Enable(True)
-            self.wait_swap_command_wait = False
-
-        if command is None:
-            command = self.config.swap_command
-
-        if command:
-            self.wait_swap_command_wait = True
-            self.btn_call_swap_command.Enable(False)
-            self.call_command(command, on_done=done_action)
-
     # config
 
-    def get_swap_percent(self, max_size: int = None):
-        if self.config.swap_custom_size or max_size:
-            max_ = max_size if max_size else self.config.swap_custom_size_max
-
-            total = max_ * (1024 ** 3)
-            swap = psutil.swap_memory()
-            percent = round(max(min(swap.used / total * 100, 100), 0), 1)
-
-        else:
-            percent = psutil.swap_memory().percent
-
-        return percent
-
-    @property
-    def is_enable_virtual_timer(self):
-        return bool(self.config.virtual_command_call and self.config.virtual_command_call_repeat)
-
-    @property
-    def is_enable_swap_timer(self):
-        return bool(self.config.swap_command_call and self.config.swap_command_call_repeat)
-
-    @property
-    def is_over_virtual_limit(self):
-        return psutil.virtual_memory().percent >= self.config.virtual_percent
-
-    @property
-    def is_over_swap_limit(self):
-        return psutil.swap_memory().percent >= self.config.swap_percent
-
     def load_all(self):
         self.config.load()
         self.set_virtual_limit(self.config.virtual_percent)
@@ -629,22 +436,7 @@ class RamNotify(RamNotifyPanel):
         self.config.notify_cool_ms = NOTIFY_COOLS_VALS[self.choice_notify_cool.GetSelection()]
         self.config.enable_processlist_app = self.check_processlist.GetValue()
 
-        self.timer_virtual_command.stop()
-        if self.is_enable_virtual_timer:
-            self.timer_virtual_command.change_delay(self.config.virtual_command_call_repeat * 60)
-
-            if self.is_over_virtual_limit:
-                self.timer_virtual_command.start()
-
-        self.timer_swap_command.stop()
-        if self.is_enable_swap_timer:
-            self.timer_swap_command.start()
-
-            if self.is_over_swap_limit:
-                self.timer_swap_command.change_delay(self.config.swap_command_call_repeat * 60)
-
-        self.cool_notify.cool = int(self.config.notify_cool_ms / 1000)
-
+        self.engine.apply_config(self.sampler.get(max_age=1))
         self.config.save()
 
     # process list app
@@ -652,11 +444,12 @@ class RamNotify(RamNotifyPanel):
     def init_processlist(self):
         style = wx.CAPTION | wx.SYSTEM_MENU | wx.CLIP_CHILDREN | wx.CLOSE_BOX | wx.FRAME_NO_TASKBAR
         frame = wx.Frame(None, size=(450, 500), style=style, title="プロセス一覧")
-        frame.SetIcon(EmbeddedImage.APP_ICON)
+        frame.SetIcon(EmbeddedImage.app_icon())
 
         try:
             from processlist import ProcessListApp
-            app = ProcessListApp(frame, self.config)
+            app = ProcessListApp(frame, self.config, self.sampler, self.history)
+            app.on_notify = self.engine.notify
 
         except (Exception,):
             traceback.print_exc()
@@ -757,7 +550,7 @@ class MyTaskBar(wx.adv.TaskBarIcon):
         self.app_name = app_name
         self.parent = parent
         self.last_title = ""
-        self.last_icon = EmbeddedImage.GAUGES[0]
+        self.last_icon = EmbeddedImage.gauge(0)
         self.change_icon(init=True)
 
     def change_icon(self, icon: wx.Icon = None, title: str = None, *, init=False):
@@ -793,16 +586,15 @@ class MyTaskBar(wx.adv.TaskBarIcon):
 
         gauge = 20
 
-        virtual = psutil.virtual_memory()
-        menu.Append(create_label(f"物理メモリ - {virtual.percent}%    ({byte_to_label(virtual.available)} 利用可能)"))
-        bar1 = int((virtual.percent/100) * gauge)
+        snapshot = self.parent.sampler.get(max_age=1)
+        menu.Append(create_label(f"物理メモリ - {snapshot.percent}%    ({byte_to_label(snapshot.available)} 利用可能)"))
+        bar1 = int((snapshot.percent/100) * gauge)
         bar2 = gauge - bar1
         progress = f"[{bar1*'⬛'}{bar2*'⬜'}]"
         menu.Append(create_label(progress))
 
-        swap = psutil.swap_memory()
-        swap_percent = self.parent.get_swap_percent()
-        menu.Append(create_label(f"論理メモリ - {swap_percent}%    ({byte_to_label(swap.free)} 利用可能)"))
+        swap_percent = self.parent.engine.get_swap_percent(snapshot)
+        menu.Append(create_label(f"論理メモリ - {swap_percent}%    ({byte_to_label(snapshot.swap_free)} 利用可能)"))
         bar1 = int((swap_percent/100) * gauge)
         bar2 = gauge - bar1
         progress = f"[{bar1*'⬛'}{bar2*'⬜'}]"
@@ -827,11 +619,11 @@ class MyTaskBar(wx.adv.TaskBarIcon):
         return menu
 
     def on_menu_virtual_call_command(self, event):
-        self.parent.call_command_virtual()
+        self.parent.engine.call_command_virtual()
         event.Skip()
 
     def on_menu_swap_call_command(self, event):
-        self.parent.call_command_swap()
+        self.parent.engine.call_command_swap()
         event.Skip()
 
     def on_menu_settings(self, event):
@@ -839,8 +631,8 @@ class MyTaskBar(wx.adv.TaskBarIcon):
         event.Skip()
 
     def on_menu_exit(self, _):
-        self.Destroy()
-        wx.Exit()
+        # 履歴の書き出しやワーカーの終了を行うため、必ず app_exit を通す
+        self.parent.app_exit()
 
 
 class MyFrame(wx.Frame):
@@ -849,7 +641,7 @@ class MyFrame(wx.Frame):
         kwds["style"] = kwds.get("style", 0) | wx.CAPTION | wx.CLIP_CHILDREN | wx.CLOSE_BOX | wx.SYSTEM_MENU
         wx.Frame.__init__(self, *args, **kwds)
         self.SetSize((400, 600))
-        self.SetIcon(EmbeddedImage.APP_ICON)
+        self.SetIcon(EmbeddedImage.app_icon())
         self.panel = RamNotify(self, self, wx.ID_ANY)
 
         self.__set_properties()
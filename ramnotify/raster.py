@@ -0,0 +1,152 @@
+"""
+PlotCanvas 用に、グラフを NumPy の RGB 配列へ直接描画します
+
+塗りつぶし・線・グリッドを列ごとの範囲マスクでまとめて描くため、描画の回数は系列の数だけで点の数によりません
+(アンチエイリアスはかかりません)
+"""
+import time
+from typing import Sequence, Tuple
+
+import numpy as np
+
+__all__ = [
+    "Rasterizer",
+]
+
+Colour = Tuple[int, int, int, int]  # (r, g, b, alpha)
+
+
+class Rasterizer(object):
+    """
+    width x height の RGB 配列 (行優先, 1画素3バイト) を確保して使い回します
+
+    pixels はそのまま wx.Bitmap.FromBuffer / CopyFromBuffer に渡せます
+    """
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.pixels = np.zeros((height, width, 3), dtype=np.uint8)
+        self._rows = np.arange(height, dtype=np.float32)[:, None]
+        self._columns = np.arange(width, dtype=np.float64)
+        self._luts = {}  # type: dict[Colour, np.ndarray]
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.width}x{self.height}>"
+
+    def resize(self, width: int, height: int):
+        if (width, height) != (self.width, self.height):
+            self.__init__(width, height)
+
+    def clear(self, colour: Colour):
+        self.pixels[:] = colour[:3]
+
+    def _lut(self, colour: Colour) -> np.ndarray:
+        """
+        各チャンネルについて、元の値 (0~255) に colour を重ねた値の表
+        """
+        lut = self._luts.get(colour)
+        if lut is None:
+            alpha = colour[3] / 255
+            base = np.arange(256, dtype=np.float64)
+            lut = np.rint(base + (np.asarray(colour[:3], dtype=np.float64)[:, None] - base) * alpha)
+            self._luts[colour] = lut = lut.astype(np.uint8)
+        return lut
+
+    def _blend(self, mask: np.ndarray, colour: Colour, top: int = 0):
+        """
+        mask (top 行目から mask の行数分の範囲) の画素に colour を重ねます
+        """
+        if colour[3] <= 0:
+            return
+        pixels = self.pixels[top:top + len(mask)]
+        # 浮動小数点での合成より、チャンネルごとの表引きの方がメモリの読み書きが少ない
+        if colour[3] >= 255:
+            for channel in range(3):
+                np.copyto(pixels[:, :, channel], colour[channel], where=mask)
+        else:
+            lut = self._lut(colour)
+            for channel in range(3):
+                plane = pixels[:, :, channel]
+                np.copyto(plane, lut[channel].take(plane), where=mask)
+
+    def hlines(self, ys: Sequence[int], colour: Colour):
+        ys = [y for y in ys if 0 <= y < self.height]
+        mask = np.zeros((self.height, self.width), dtype=bool)
+        mask[ys, :] = True
+        self._blend(mask, colour)
+
+    def vlines(self, xs: Sequence[int], colour: Colour):
+        xs = [x for x in xs if 0 <= x < self.width]
+        mask = np.zeros((self.height, self.width), dtype=bool)
+        mask[:, xs] = True
+        self._blend(mask, colour)
+
+    def _column_heights(self, points: np.ndarray):
+        """
+        折れ線を画素の列ごとに補間した y 座標と、折れ線が存在する列のマスク
+        """
+        xs = points[:, 0].astype(np.float64)
+        ys = points[:, 1].astype(np.float64)
+        columns = self._columns
+        heights = np.interp(columns, xs, ys).astype(np.float32)
+        inside = (columns >= xs[0]) & (columns <= xs[-1])
+        return heights, inside
+
+    def fill_area(self, points: np.ndarray, colour: Colour):
+        """
+        折れ線 points ((x, y) の配列, x は昇順) の下側を塗りつぶします
+        """
+        if len(points) < 2:
+            return
+        heights, inside = self._column_heights(points)
+        # 塗りつぶしが始まる行より上は計算しない
+        top = max(0, min(self.height, int(heights[inside].min()) if inside.any() else self.height))
+        rows = self._rows[top:]
+        self._blend((rows >= heights[None, :]) & inside[None, :], colour, top)
+
+    def polyline(self, points: np.ndarray, colour: Colour, width: int = 2):
+        """
+        折れ線を描きます (各列で、隣の列との間の縦方向の区間を塗って線をつなげる)
+        """
+        if len(points) < 2:
+            return
+        heights, inside = self._column_heights(points)
+        # 画素の行にそろえてから太さの分を広げる (width が奇数でも水平な部分が消えないように)
+        heights = np.rint(heights)
+        following = np.append(heights[1:], heights[-1])
+        low = np.minimum(heights, following) - width // 2
+        high = np.maximum(heights, following) + (width - 1) // 2
+        top = max(0, int(low.min()))
+        bottom = min(self.height, int(np.ceil(high.max())) + 1)
+        if top >= bottom:
+            return
+        rows = self._rows[top:bottom]
+        self._blend((rows >= low[None, :]) & (rows <= high[None, :]) & inside[None, :], colour, top)
+
+    def finish(self) -> np.ndarray:
+        return self.pixels
+
+
+if __name__ == "__main__":
+    # PlotCanvas と同じ構成 (グリッド + 塗りつぶし付きの2系列) を描く1フレームあたりの時間を表示する
+    _rng = np.random.default_rng(0)
+    for _width, _height, _count in ((300, 120, 60), (600, 200, 600), (1200, 300, 1200)):
+        _raster = Rasterizer(_width, _height)
+        _xs = np.rint(np.linspace(0, _width, _count)).astype(np.int64)
+        _lines = [
+            np.column_stack((_xs, np.clip(np.cumsum(_rng.normal(0, 2, _count)) + _height / 2, 0, _height)))
+            for _ in range(2)
+        ]
+        _frames = 50
+        _start = time.perf_counter()
+        for _ in range(_frames):
+            _raster.clear((0, 0, 0, 255))
+            _raster.hlines(range(0, _height, round(_height / 10)), (60, 60, 60, 255))
+            _raster.vlines(range(0, _width, round(_width / 12)), (60, 60, 60, 255))
+            for _points, _colour in zip(_lines, ((210, 162, 39), (170, 80, 180))):
+                _raster.fill_area(_points, _colour + (70,))
+                _raster.polyline(_points, _colour + (255,))
+            _raster.finish()
+        _elapsed = (time.perf_counter() - _start) / _frames
+        print(f"{_width}x{_height} ({_count} points): {_elapsed * 1e3:.2f} ms/frame")
@@ -0,0 +1,110 @@
+"""
+画像リソースをまとめたバイナリパック (images.pak)
+
+    magic "RNPK" / u32 count / (u16 name_len, name, u32 offset, u32 size) * count / data...
+
+ファイルは mmap で開き、要求された画像だけを取り出します。
+embedded_image.py を更新した時は `python resources.py` でパックを作り直してください。
+"""
+import ast
+import base64
+import mmap
+import struct
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+__all__ = [
+    "ResourcePack",
+    "build_pack",
+    "DEFAULT_PACK_PATH",
+]
+
+MAGIC = b"RNPK"
+DEFAULT_PACK_PATH = Path(__file__).parent / "images.pak"
+
+_HEADER = struct.Struct("<4sI")
+_NAME_LEN = struct.Struct("<H")
+_ENTRY = struct.Struct("<II")
+
+
+class ResourcePack(object):
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = path.open("rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            self._file.close()
+            raise
+        self._entries = self._read_index()
+
+    def __contains__(self, name: str):
+        return name in self._entries
+
+    def _read_index(self) -> Dict[str, Tuple[int, int]]:
+        buf = self._map
+        magic, count = _HEADER.unpack_from(buf, 0)
+        if magic != MAGIC:
+            raise ValueError(f"invalid resource pack: {self.path}")
+
+        entries = {}
+        pos = _HEADER.size
+        for _ in range(count):
+            name_len, = _NAME_LEN.unpack_from(buf, pos)
+            pos += _NAME_LEN.size
+            name = bytes(buf[pos:pos + name_len]).decode("utf-8")
+            pos += name_len
+            entries[name] = _ENTRY.unpack_from(buf, pos)
+            pos += _ENTRY.size
+        return entries
+
+    def get(self, name: str) -> Optional[bytes]:
+        entry = self._entries.get(name)
+        if entry is None:
+            return None
+        offset, size = entry
+        return self._map[offset:offset + size]
+
+    def close(self):
+        self._entries = {}
+        self._map.close()
+        self._file.close()
+
+
+def build_pack(path: Path, items: Iterable[Tuple[str, bytes]]):
+    items = [(name.encode("utf-8"), data) for name, data in items]
+    offset = _HEADER.size + sum(_NAME_LEN.size + len(name) + _ENTRY.size for name, _ in items)
+
+    index = [_HEADER.pack(MAGIC, len(items))]
+    for name, data in items:
+        index.append(_NAME_LEN.pack(len(name)) + name + _ENTRY.pack(offset, len(data)))
+        offset += len(data)
+
+    with path.open("wb") as file:
+        file.write(b"".join(index))
+        for _, data in items:
+            file.write(data)
+
+
+def read_embedded_images(source: Path):
+    """
+    embedded_image.py を wx を使わずに解析し、(名前, PNGデータ) を返します
+    """
+    tree = ast.parse(source.read_text(encoding="utf-8"))
+    for node in tree.body:
+        if not (isinstance(node, ast.Assign) and isinstance(node.value, ast.Call)):
+            continue
+        func = node.value.func
+        if not (isinstance(func, ast.Name) and func.id == "PyEmbeddedImage"):
+            continue
+        name = node.targets[0].id
+        yield name, base64.b64decode(ast.literal_eval(node.value.args[0]))
+
+
+if __name__ == "__main__":
+    _src = Path(__file__).parent / "embedded_image.py"
+    _dst = Path(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PACK_PATH
+    _items = list(read_embedded_images(_src))
+    build_pack(_dst, _items)
+    print(f"{len(_items)} images -> {_dst} ({_dst.stat().st_size:,} bytes)")
@@ -0,0 +1,233 @@
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Callable, NamedTuple
+
+import psutil
+
+__all__ = [
+    "MemorySnapshot",
+    "MemorySampler",
+    "PsutilBackend",
+    "ProcMeminfoBackend",
+    "create_backend",
+]
+
+
+class MemorySnapshot(NamedTuple):
+    time: float
+    total: int
+    available: int
+    percent: float
+    swap_total: int
+    swap_used: int
+    swap_free: int
+    swap_percent: float
+    swap_sin: int
+    swap_sout: int
+
+    @property
+    def used(self):
+        return self.total - self.available
+
+    def get_swap_percent(self, max_size: int = None):
+        if max_size:
+            total = max_size * (1024 ** 3)
+            return round(max(min(self.swap_used / total * 100, 100), 0), 1)
+        return self.swap_percent
+
+
+class PsutilBackend(object):
+    name = "psutil"
+
+    # noinspection PyMethodMayBeStatic
+    def read(self) -> MemorySnapshot:
+        virtual = psutil.virtual_memory()
+        swap = psutil.swap_memory()
+        return MemorySnapshot(
+            time=time.time(),
+            total=virtual.total,
+            available=virtual.available,
+            percent=virtual.percent,
+            swap_total=swap.total,
+            swap_used=swap.used,
+            swap_free=swap.free,
+            swap_percent=swap.percent,
+            swap_sin=swap.sin,
+            swap_sout=swap.sout,
+        )
+
+    def close(self):
+        pass
+
+
+class ProcMeminfoBackend(object):
+    """
+    /proc/meminfo と /proc/vmstat を開いたまま保持し、先頭から pread し直して必要な値だけを読み取ります (Linux のみ)
+    """
+    name = "procfs"
+    MEMINFO_PATH = "/proc/meminfo"
+    VMSTAT_PATH = "/proc/vmstat"
+
+    def __init__(self):
+        self._page_size = os.sysconf("SC_PAGE_SIZE")
+        self._meminfo_fd = os.open(self.MEMINFO_PATH, os.O_RDONLY)
+        try:
+            self._vmstat_fd = os.open(self.VMSTAT_PATH, os.O_RDONLY)
+        except OSError:
+            os.close(self._meminfo_fd)
+            raise
+        self._meminfo_buf = bytearray(8192)
+        self._vmstat_buf = bytearray(16384)
+        self._offsets = {}  # type: dict[bytes, int]  # 前回見つかったフィールドの位置
+        # 初回読み込みで必要なフィールドが揃っているか確認する
+        self.read()
+
+    @staticmethod
+    def _pread(fd: int, buf: bytearray):
+        size = os.preadv(fd, [buf], 0)
+        if size >= len(buf):  # 溢れた場合は拡張して読み直す
+            buf.extend(bytes(len(buf)))
+            return ProcMeminfoBackend._pread(fd, buf)
+        return size
+
+    def _field(self, buf: bytearray, size: int, key: bytes, end: bytes):
+        start = self._offsets.get(key, 0)
+        if not buf.startswith(key, start, size):
+            start = buf.find(key, 0, size)
+            if start == -1:
+                return None
+            self._offsets[key] = start
+        start += len(key)
+        return int(buf[start:buf.find(end, start, size)])
+
+    def read(self) -> MemorySnapshot:
+        buf = self._meminfo_buf
+        size = self._pread(self._meminfo_fd, buf)
+        total = self._field(buf, size, b"MemTotal:", b" kB") * 1024
+        available = self._field(buf, size, b"\nMemAvailable:", b" kB")
+        if available is None:  # kernel < 3.14
+            available = sum(self._field(buf, size, key, b" kB") or 0
+                            for key in (b"\nMemFree:", b"\nBuffers:", b"\nCached:"))
+        available *= 1024
+        swap_total = self._field(buf, size, b"\nSwapTotal:", b" kB") * 1024
+        swap_free = self._field(buf, size, b"\nSwapFree:", b" kB") * 1024
+        swap_used = swap_total - swap_free
+
+        buf = self._vmstat_buf
+        size = self._pread(self._vmstat_fd, buf)
+        swap_sin = (self._field(buf, size, b"\npswpin ", b"\n") or 0) * self._page_size
+        swap_sout = (self._field(buf, size, b"\npswpout ", b"\n") or 0) * self._page_size
+
+        return MemorySnapshot(
+            time=time.time(),
+            total=total,
+            available=available,
+            percent=round((total - available) / total * 100, 1),
+            swap_total=swap_total,
+            swap_used=swap_used,
+            swap_free=swap_free,
+            swap_percent=round(swap_used / swap_total * 100, 1) if swap_total else 0.0,
+            swap_sin=swap_sin,
+            swap_sout=swap_sout,
+        )
+
+    def close(self):
+        for fd in (self._meminfo_fd, self._vmstat_fd):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        self._meminfo_fd = self._vmstat_fd = -1
+
+
+def create_backend():
+    if sys.platform.startswith("linux"):
+        try:
+            return ProcMeminfoBackend()
+        except (OSError, TypeError, ValueError, AttributeError):
+            traceback.print_exc()
+            print("WARN: /proc/meminfo backend is not available, fallback to psutil")
+    return PsutilBackend()
+
+
+class MemorySampler(object):
+    def __init__(self, backend=None):
+        self.backend = backend or create_backend()
+        self.latest = None  # type: MemorySnapshot | None
+        self._subscribers = []  # type: list[Callable[[MemorySnapshot], None]]
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback: Callable[[MemorySnapshot], None]):
+        with self._lock:
+            if callback not in self._subscribers:
+                self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[MemorySnapshot], None]):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def read(self) -> MemorySnapshot:
+        try:
+            return self.backend.read()
+        except (OSError, TypeError, ValueError):
+            if isinstance(self.backend, PsutilBackend):
+                raise
+            traceback.print_exc()
+            print(f"WARN: {self.backend.name} backend failed, fallback to psutil")
+            self.backend.close()
+            self.backend = PsutilBackend()
+            return self.backend.read()
+
+    def close(self):
+        self.backend.close()
+
+    def sample(self) -> MemorySnapshot:
+        """
+        新しいスナップショットを取得し、全ての購読者へ配信します
+        """
+        with self._lock:
+            snapshot = self.latest = self.read()
+            subscribers = list(self._subscribers)
+
+        for callback in subscribers:
+            try:
+                callback(snapshot)
+            except (Exception,):
+                traceback.print_exc()
+        return snapshot
+
+    def get(self, max_age: float) -> MemorySnapshot:
+        """
+        max_age 秒以内のスナップショットがあれば再利用し、なければ新しく取得します
+
+        ここで取得したスナップショットは購読者へ配信しません (配信は定期的な sample() だけが行います)
+        """
+        snapshot = self.latest
+        if snapshot is None or time.time() - snapshot.time > max_age:
+            with self._lock:
+                snapshot = self.latest
+                if snapshot is None or time.time() - snapshot.time > max_age:
+                    snapshot = self.latest = self.read()
+        return snapshot
+
+
+if __name__ == "__main__":
+    # 各バックエンドの1サンプルあたりのコストを計測する
+    _count = 20000
+    _backends = [PsutilBackend()]
+    if sys.platform.startswith("linux"):
+        _backends.insert(0, ProcMeminfoBackend())
+
+    for _backend in _backends:
+        _backend.read()
+        _start = time.perf_counter()
+        for _ in range(_count):
+            _backend.read()
+        _elapsed = time.perf_counter() - _start
+        print(f"{_backend.name:>8}: {_elapsed / _count * 1e6:.2f} us/sample")
+        print(f"          {_backend.read()}")
+        _backend.close()
@@ -0,0 +1,653 @@
+import multiprocessing
+import os
+import struct
+import sys
+import threading
+import time
+import traceback
+from array import array
+from collections import namedtuple
+from multiprocessing.connection import Connection
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, Union
+
+import psutil
+
+try:
+    import pwd
+except ImportError:  # Windows
+    pwd = None
+
+__all__ = [
+    "MemInfo",
+    "ProcessBatch",
+    "ProcessDiff",
+    "ProcessSnapshotEngine",
+    "ProcessScanner",
+    "PsutilProcessSource",
+    "ProcfsProcessSource",
+    "create_source",
+    "read_process",
+]
+
+PROGRESS_POLL_INTERVAL = .05
+
+MemInfo = namedtuple("MemInfo", ["rss", "vms"])
+
+
+class ProcessBatch(object):
+    """
+    プロセス一覧をまとめて転送するための列指向のデータ
+
+    数値は array の列、文字列 (プロセス名・コマンドライン・実行ファイル・ユーザー・cgroup) は1つの文字列テーブルに詰めて、1回のメッセージで送ります
+    """
+    MAGIC = b"RNPB"
+    HEADER = struct.Struct("<4sI")
+    CMDLINE_SEP = "\0"
+    STRINGS = 5  # name, cmdline, exe, user, cgroup
+
+    def __init__(self):
+        self.pids = array("q")
+        self.ppids = array("q")
+        self.create_times = array("d")
+        self.rss = array("Q")
+        self.vms = array("Q")
+        self.has_cmdline = array("B")
+        self.names = []  # type: list[str]
+        self.cmdlines = []  # type: list[str]  # 引数を "\0" で連結したもの
+        self.exes = []  # type: list[str]
+        self.users = []  # type: list[str]
+        self.cgroups = []  # type: list[str]
+        self.sequence = 0  # ProcessScanner が応答を受け取った順の番号 (転送はしない)
+
+    def __len__(self):
+        return len(self.pids)
+
+    def append(self, info: dict):
+        mem_info = info["memory_info"]
+        cmdline = info["cmdline"]
+        self.pids.append(info["pid"])
+        self.ppids.append(info.get("ppid") or 0)
+        self.create_times.append(info.get("create_time") or 0.0)
+        self.rss.append(mem_info.rss if mem_info else 0)
+        self.vms.append(mem_info.vms if mem_info else 0)
+        self.has_cmdline.append(cmdline is not None)
+        self.names.append(info["name"] or "")
+        self.cmdlines.append(self.CMDLINE_SEP.join(cmdline or ()))
+        self.exes.append(info.get("exe") or "")
+        self.users.append(info.get("user") or "")
+        self.cgroups.append(info.get("cgroup") or "")
+
+    def _columns(self):
+        return self.pids, self.ppids, self.create_times, self.rss, self.vms, self.has_cmdline
+
+    def _string_columns(self):
+        return self.names, self.cmdlines, self.exes, self.users, self.cgroups
+
+    def to_bytes(self) -> bytes:
+        strings = [s.encode("utf-8", "surrogateescape") for column in self._string_columns() for s in column]
+        offsets = array("I", [0])
+        total = 0
+        for s in strings:
+            total += len(s)
+            offsets.append(total)
+
+        return b"".join((
+            self.HEADER.pack(self.MAGIC, len(self)),
+            *(column.tobytes() for column in self._columns()),
+            offsets.tobytes(),
+            *strings,
+        ))
+
+    @classmethod
+    def from_bytes(cls, data: bytes, offset: int = 0) -> "ProcessBatch":
+        magic, count = cls.HEADER.unpack_from(data, offset)
+        if magic != cls.MAGIC:
+            raise ValueError("invalid process batch")
+
+        batch = cls()
+        view = memoryview(data)
+        pos = offset + cls.HEADER.size
+        for column in batch._columns():
+            size = column.itemsize * count
+            column.frombytes(view[pos:pos + size])
+            pos += size
+
+        offsets = array("I")
+        size = offsets.itemsize * (count * cls.STRINGS + 1)
+        offsets.frombytes(view[pos:pos + size])
+        pos += size
+
+        blob = data[pos:pos + offsets[-1]].decode("utf-8", "surrogateescape")
+        if blob.isascii():  # 大半のケースでは文字オフセットとバイトオフセットが一致する
+            strings = [blob[offsets[i]:offsets[i + 1]] for i in range(count * cls.STRINGS)]
+        else:
+            raw = view[pos:]
+            strings = [bytes(raw[offsets[i]:offsets[i + 1]]).decode("utf-8", "surrogateescape")
+                       for i in range(count * cls.STRINGS)]
+        (batch.names, batch.cmdlines, batch.exes,
+         batch.users, batch.cgroups) = (strings[i * count:(i + 1) * count] for i in range(cls.STRINGS))
+        return batch
+
+    def record(self, idx: int) -> dict:
+        cmdline = self.cmdlines[idx]
+        return dict(
+            pid=self.pids[idx],
+            ppid=self.ppids[idx],
+            create_time=self.create_times[idx],
+            name=self.names[idx],
+            exe=self.exes[idx],
+            user=self.users[idx],
+            cgroup=self.cgroups[idx],
+            memory_info=MemInfo(self.rss[idx], self.vms[idx]),
+            cmdline=(cmdline.split(self.CMDLINE_SEP) if cmdline else []) if self.has_cmdline[idx] else None,
+        )
+
+    def records(self) -> Iterator[dict]:
+        for idx in range(len(self)):
+            yield self.record(idx)
+
+
+class ProcessDiff(object):
+    """
+    前回のスキャンからの差分
+
+    removed: 終了したプロセスの pid / changed: メモリ使用量が変化したプロセスの (pid, rss, vms) / added: 新しいプロセス
+    """
+    MAGIC = b"RNPD"
+    HEADER = struct.Struct("<4sII")
+
+    def __init__(self):
+        self.removed = array("q")
+        self.changed_pids = array("q")
+        self.changed_rss = array("Q")
+        self.changed_vms = array("Q")
+        self.added = ProcessBatch()
+        self.sequence = 0  # ProcessScanner が応答を受け取った順の番号 (転送はしない)
+
+    def __repr__(self):
+        return (f"<{type(self).__name__} added={len(self.added)} "
+                f"removed={len(self.removed)} changed={len(self.changed_pids)}>")
+
+    def __bool__(self):
+        return bool(self.removed or self.changed_pids or self.added)
+
+    def changed(self) -> Iterator[Tuple[int, MemInfo]]:
+        for pid, rss, vms in zip(self.changed_pids, self.changed_rss, self.changed_vms):
+            yield pid, MemInfo(rss, vms)
+
+    def _columns(self):
+        return self.changed_pids, self.changed_rss, self.changed_vms
+
+    def to_bytes(self) -> bytes:
+        return b"".join((
+            self.HEADER.pack(self.MAGIC, len(self.removed), len(self.changed_pids)),
+            self.removed.tobytes(),
+            *(column.tobytes() for column in self._columns()),
+            self.added.to_bytes(),
+        ))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "ProcessDiff":
+        magic, removed, changed = cls.HEADER.unpack_from(data, 0)
+        if magic != cls.MAGIC:
+            raise ValueError("invalid process diff")
+
+        diff = cls()
+        view = memoryview(data)
+        pos = cls.HEADER.size
+        for column, count in ((diff.removed, removed), *((column, changed) for column in diff._columns())):
+            size = column.itemsize * count
+            column.frombytes(view[pos:pos + size])
+            pos += size
+        diff.added = ProcessBatch.from_bytes(data, pos)
+        return diff
+
+
+class PsutilProcessSource(object):
+    name = "psutil"
+
+    def __init__(self):
+        self._procs = {}  # type: dict[int, psutil.Process]
+
+    # noinspection PyMethodMayBeStatic
+    def pids(self) -> Iterable[int]:
+        return psutil.pids()
+
+    def read_stat(self, pid: int):
+        """
+        (create_time, name, MemInfo, ppid) を返します (終了している場合は None)
+        """
+        proc = self._procs.get(pid)
+        try:
+            if proc is None or not proc.is_running():
+                self._procs[pid] = proc = psutil.Process(pid)
+            with proc.oneshot():
+                # 保護されたプロセスは項目ごとに AccessDenied になるため、読めない項目は既定値にする
+                try:
+                    mem_info = proc.memory_info()
+                    mem_info = MemInfo(mem_info.rss, mem_info.vms)
+                except psutil.AccessDenied:
+                    mem_info = None
+                try:
+                    create_time = proc.create_time()
+                except psutil.AccessDenied:
+                    create_time = 0.
+                try:
+                    name = proc.name()
+                except psutil.AccessDenied:
+                    name = ""
+                try:
+                    ppid = proc.ppid()
+                except psutil.AccessDenied:
+                    ppid = 0
+                return create_time, name, mem_info, ppid
+        except (psutil.NoSuchProcess, psutil.ZombieProcess):
+            self._procs.pop(pid, None)
+            return None
+
+    def read_static(self, pid: int, name: str):
+        """
+        (name, cmdline, exe, user, cgroup) を返します
+        """
+        proc = self._procs.get(pid)
+        info = proc.as_dict(["cmdline", "exe", "username"]) if proc else {}
+        return name, info.get("cmdline"), info.get("exe") or "", info.get("username") or "", ""
+
+    def forget(self, pid: int):
+        self._procs.pop(pid, None)
+
+
+class ProcfsProcessSource(object):
+    """
+    /proc/<pid>/stat, cmdline, exe を直接読み取ります (Linux のみ)
+
+    psutil.Process や namedtuple をプロセスごとに作らず、読み込みバッファも使い回します
+    """
+    name = "procfs"
+    PROC_PATH = "/proc"
+    COMM_LENGTH = 15  # TASK_COMM_LEN - 1
+
+    def __init__(self):
+        self._page_size = os.sysconf("SC_PAGE_SIZE")
+        self._clock_ticks = os.sysconf("SC_CLK_TCK")
+        self._boot_time = psutil.boot_time()
+        self._buf = bytearray(512)
+        self._cmdline_buf = bytearray(4096)
+        self._users = {}  # type: dict[int, str]
+        # 自分自身を読めるか確認する
+        if self.read_stat(os.getpid()) is None:
+            raise OSError(f"cannot read {self.PROC_PATH}/<pid>/stat")
+
+    @staticmethod
+    def _read(path: str, buf: bytearray) -> int:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            size = os.readv(fd, [buf])
+            while size == len(buf):  # 溢れた場合は拡張して続きを読む
+                buf.extend(bytes(len(buf)))
+                size += os.readv(fd, [memoryview(buf)[size:]])
+            return size
+        finally:
+            os.close(fd)
+
+    def pids(self) -> Iterable[int]:
+        with os.scandir(self.PROC_PATH) as entries:
+            return [int(entry.name) for entry in entries if entry.name.isdigit()]
+
+    def read_stat(self, pid: int):
+        """
+        (create_time, name, MemInfo, ppid) を返します (終了している場合は None)
+        """
+        buf = self._buf
+        try:
+            size = self._read(f"{self.PROC_PATH}/{pid}/stat", buf)
+        except OSError:
+            return None
+
+        # comm には空白や括弧が含まれうるため、最後の ")" で区切る
+        end = buf.rfind(b")", 0, size)
+        name = buf[buf.find(b"(") + 1:end].decode("utf-8", "surrogateescape")
+        fields = buf[end + 2:size].split(None, 22)
+        try:
+            create_time = self._boot_time + int(fields[19]) / self._clock_ticks
+            mem_info = MemInfo(int(fields[21]) * self._page_size, int(fields[20]))
+            ppid = int(fields[1])
+        except (ValueError, IndexError):
+            return None
+        return create_time, name, mem_info, ppid
+
+    def _read_cmdline(self, pid: int) -> Optional[List[str]]:
+        buf = self._cmdline_buf
+        try:
+            size = self._read(f"{self.PROC_PATH}/{pid}/cmdline", buf)
+        except OSError:
+            return None
+        if not size:
+            return []
+        data = bytes(buf[:size])
+        if data.endswith(b"\0"):
+            data = data[:-1]
+        elif b"\0" not in data:  # setproctitle などで書き換えられた場合は空白区切り (psutil と同じ扱い)
+            return data.decode("utf-8", "surrogateescape").split()
+        return data.decode("utf-8", "surrogateescape").split("\0")
+
+    def _read_user(self, pid: int) -> str:
+        try:
+            uid = os.stat(f"{self.PROC_PATH}/{pid}").st_uid
+        except OSError:
+            return ""
+        user = self._users.get(uid)
+        if user is None:
+            try:
+                user = pwd.getpwuid(uid).pw_name if pwd else str(uid)
+            except KeyError:
+                user = str(uid)
+            self._users[uid] = user
+        return user
+
+    def _read_cgroup(self, pid: int) -> str:
+        buf = self._buf
+        try:
+            size = self._read(f"{self.PROC_PATH}/{pid}/cgroup", buf)
+        except OSError:
+            return ""
+        unified = memory = ""
+        for line in buf[:size].decode("utf-8", "surrogateescape").splitlines():
+            hierarchy, _, rest = line.partition(":")
+            controllers, _, path = rest.partition(":")
+            if hierarchy == "0" and not controllers:
+                unified = path
+            elif "memory" in controllers.split(","):
+                memory = path
+        # cgroup v1 と混在している場合は memory コントローラーの階層を優先する
+        return unified if unified not in ("", "/") or not memory else memory
+
+    def read_static(self, pid: int, name: str):
+        """
+        (name, cmdline, exe, user, cgroup) を返します
+        """
+        cmdline = self._read_cmdline(pid)
+        if cmdline and len(name) >= self.COMM_LENGTH:
+            # comm は 15 文字で切り詰められるため、cmdline から完全な名前を補う (psutil と同じ扱い)
+            exe_name = os.path.basename(cmdline[0])
+            if exe_name.startswith(name):
+                name = exe_name
+
+        exe = ""
+        if cmdline:  # カーネルスレッドは実行ファイルを持たない
+            try:
+                exe = os.readlink(f"{self.PROC_PATH}/{pid}/exe")
+            except OSError:
+                pass
+        return name, cmdline, exe, self._read_user(pid), self._read_cgroup(pid)
+
+    def forget(self, pid: int):
+        pass
+
+
+def create_source():
+    if sys.platform.startswith("linux"):
+        try:
+            return ProcfsProcessSource()
+        except (OSError, ValueError, AttributeError):
+            traceback.print_exc()
+            print("WARN: /proc process scanner is not available, fallback to psutil")
+    return PsutilProcessSource()
+
+
+def read_process(pid: int, source=None) -> Optional[dict]:
+    """
+    1つのプロセスの情報をスキャン結果と同じ形式 (ProcessBatch.record) で返します (終了している場合は None)
+    """
+    # ワーカーと同じ取得方法にして、create_time などの値を揃える
+    source = source or create_source()
+    stat = source.read_stat(pid)
+    if stat is None:
+        return None
+    create_time, name, mem_info, ppid = stat
+    name, cmdline, exe, user, cgroup = source.read_static(pid, name)
+    # 取得できなかった項目の補い方をスキャン結果と揃えるため、ProcessBatch を通す
+    batch = ProcessBatch()
+    batch.append(dict(
+        pid=pid, ppid=ppid, create_time=create_time, name=name, exe=exe, user=user, cgroup=cgroup,
+        memory_info=mem_info, cmdline=cmdline,
+    ))
+    return batch.record(0)
+
+
+class ProcessSnapshotEngine(object):
+    """
+    (pid, create_time) をキーにプロセス情報をキャッシュし、再スキャンではメモリ使用量だけを読み直します
+
+    名前やコマンドラインなど変化しない情報はプロセスの生存中に1回だけ取得します (PID が再利用された場合は別プロセスとして扱います)
+    """
+
+    def __init__(self, source=None):
+        self.source = source or create_source()
+        self.processes = {}  # type: dict[int, dict]
+
+    def __repr__(self):
+        return f"<{type(self).__name__} source={self.source.name!r} processes={len(self.processes)}>"
+
+    def update(self, counter=None) -> ProcessDiff:
+        try:
+            return self._update(counter)
+        except (OSError, ValueError):
+            if isinstance(self.source, PsutilProcessSource):
+                raise
+            traceback.print_exc()
+            print(f"WARN: {self.source.name} process scanner failed, fallback to psutil")
+            self.source = PsutilProcessSource()
+            return self._update(counter)
+
+    def _update(self, counter=None) -> ProcessDiff:
+        source = self.source
+        processes = self.processes
+        diff = ProcessDiff()
+        alive = set()
+
+        if counter is not None:
+            counter.value = 0
+
+        for pid in source.pids():
+            stat = source.read_stat(pid)
+            if stat is None:
+                continue  # 既に終了している
+            create_time, name, mem_info, ppid = stat
+
+            info = processes.get(pid)
+            if info is not None and info["create_time"] != create_time:
+                # PID が再利用された
+                diff.removed.append(pid)
+                info = None
+
+            if info is None:
+                name, cmdline, exe, user, cgroup = source.read_static(pid, name)
+                processes[pid] = info = dict(
+                    pid=pid, ppid=ppid, create_time=create_time, name=name, exe=exe, user=user, cgroup=cgroup,
+                    memory_info=mem_info, cmdline=cmdline,
+                )
+                diff.added.append(info)
+
+            elif info["memory_info"] != mem_info:
+                info["memory_info"] = mem_info
+                diff.changed_pids.append(pid)
+                diff.changed_rss.append(mem_info.rss if mem_info else 0)
+                diff.changed_vms.append(mem_info.vms if mem_info else 0)
+
+            alive.add(pid)
+            if counter is not None:
+                counter.value += 1
+
+        for pid in processes.keys() - alive:
+            del processes[pid]
+            source.forget(pid)
+            diff.removed.append(pid)
+
+        return diff
+
+    def snapshot(self) -> ProcessBatch:
+        batch = ProcessBatch()
+        for info in self.processes.values():
+            batch.append(info)
+        return batch
+
+
+def _worker_main(conn: Connection, counter):
+    engine = ProcessSnapshotEngine()
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            break
+        if request is None:
+            break
+
+        try:
+            if request == "scan":
+                engine.update(counter)
+                conn.send_bytes(b"D" + engine.snapshot().to_bytes())
+            elif request == "diff":
+                conn.send_bytes(b"D" + engine.update(counter).to_bytes())
+            else:
+                conn.send_bytes(b"E" + f"unknown request: {request!r}".encode())
+        except (BrokenPipeError, EOFError):
+            break
+        except Exception as e:
+            traceback.print_exc()
+            conn.send_bytes(b"E" + f"{type(e).__name__}: {e}".encode())
+
+
+class ProcessScanner(object):
+    """
+    プロセス一覧を取得するワーカープロセスを最初の要求時に起動し、以降は使い回します
+
+    ワーカー側で ProcessSnapshotEngine を保持するため、diff() は前回の scan() / diff() からの差分だけを返します
+    """
+
+    def __init__(self):
+        self._process = None  # type: multiprocessing.Process | None
+        self._conn = None  # type: Connection | None
+        self._counter = None
+        self._lock = threading.Lock()
+        self._sequence = 0
+
+    @property
+    def is_running(self):
+        return bool(self._process and self._process.is_alive())
+
+    def _start_worker(self):
+        parent_conn, child_conn = multiprocessing.Pipe()
+        self._counter = counter = multiprocessing.RawValue("i", 0)
+        self._process = p = multiprocessing.Process(target=_worker_main, args=(child_conn, counter), daemon=True)
+        p.start()
+        child_conn.close()
+        self._conn = parent_conn
+        print(f"Start process scanner: pid={p.pid}")
+
+    def _request(self, request, on_progress: Callable[[int], None] = None) -> bytes:
+        if not self.is_running:
+            self._start_worker()
+
+        self._conn.send(request)
+        last_count = -1
+        while not self._conn.poll(PROGRESS_POLL_INTERVAL):
+            if not self.is_running:
+                raise EOFError("scanner worker is not running")
+            count = self._counter.value
+            if on_progress and count != last_count:
+                last_count = count
+                on_progress(count)
+
+        data = self._conn.recv_bytes()
+        if data[:1] == b"E":
+            raise RuntimeError(data[1:].decode())
+        return data[1:]
+
+    def _request_retry(self, request, on_progress: Callable[[int], None] = None) -> Tuple[bytes, int]:
+        """
+        (応答, 応答の通し番号) を返します
+
+        ワーカーは要求を1つずつ処理するため、通し番号の順に反映すれば複数のスレッドから要求しても差分の順序が保たれます
+        """
+        with self._lock:
+            try:
+                data = self._request(self._rebase(request), on_progress)
+            except (EOFError, OSError):
+                # ワーカーが終了していた場合は一度だけ起動し直す
+                traceback.print_exc()
+                self._stop_worker()
+                data = self._request(self._rebase(request), on_progress)
+            self._sequence += 1
+            return data, self._sequence
+
+    def _rebase(self, request):
+        # 起動し直したワーカーは前回の基準を持たないため、差分の代わりに全件を返させる
+        if request == "diff" and not self.is_running:
+            return "scan"
+        return request
+
+    def scan(self, on_progress: Callable[[int], None] = None) -> ProcessBatch:
+        """
+        全プロセスの情報を取得します (ワーカーの応答を待つため、GUIスレッド以外から呼び出してください)
+        """
+        data, sequence = self._request_retry("scan", on_progress)
+        batch = ProcessBatch.from_bytes(data)
+        batch.sequence = sequence
+        return batch
+
+    def diff(self, on_progress: Callable[[int], None] = None) -> Union[ProcessDiff, ProcessBatch]:
+        """
+        前回のスキャンからの差分を取得します
+
+        ワーカーが起動し直した場合は前回の基準がないため ProcessBatch (全件) を返します
+        受け取り側は一覧を作り直してください (ワーカーが止まっている間に終了したプロセスを残さないため)
+        """
+        data, sequence = self._request_retry("diff", on_progress)
+        if data[:len(ProcessBatch.MAGIC)] == ProcessBatch.MAGIC:
+            result = ProcessBatch.from_bytes(data)  # type: ProcessDiff | ProcessBatch
+        else:
+            result = ProcessDiff.from_bytes(data)
+        result.sequence = sequence
+        return result
+
+    def _stop_worker(self):
+        if self._conn:
+            try:
+                self._conn.send(None)
+            except (OSError, ValueError):
+                pass
+            self._conn.close()
+            self._conn = None
+        if self._process:
+            self._process.join(timeout=1)
+            if self._process.is_alive():
+                self._process.terminate()
+            self._process = None
+
+    def close(self):
+        with self._lock:
+            self._stop_worker()
+
+
+if __name__ == "__main__":
+    # 各スキャン方法の1プロセスあたりのコストを計測する (full: 毎回すべて取得 / incremental: 差分のみ)
+    _count = 20
+    _sources = [PsutilProcessSource]
+    if sys.platform.startswith("linux"):
+        _sources.insert(0, ProcfsProcessSource)
+
+    for _source in _sources:
+        for _mode in ("full", "incremental"):
+            _engine = ProcessSnapshotEngine(_source())
+            _engine.update()
+            _processes = 0
+            _start = time.perf_counter()
+            for _ in range(_count):
+                if _mode == "full":
+                    _engine = ProcessSnapshotEngine(_source())
+                _engine.update()
+                _processes += len(_engine.processes)
+            _elapsed = time.perf_counter() - _start
+            print(f"{_source.name:>8} {_mode:>11}: {_elapsed / _count * 1e3:.2f} ms/scan, "
+                  f"{_elapsed / _processes * 1e6:.2f} us/process ({_processes // _count} processes)")
@@ -0,0 +1,51 @@
+__all__ = [
+    "AdaptiveScheduler",
+]
+
+
+class AdaptiveScheduler(object):
+    """
+    しきい値までの余裕と使用率の変化速度から、次の監視間隔を決めます
+
+    余裕が far_margin ポイント以上あれば max_ms、しきい値に近づくほど min_ms に近づきます。
+    使用率が上昇している場合は、指標ごとのしきい値に到達するまでの時間のうち最も短いものに対して最低 samples_to_limit 回は監視できる間隔に縮めます。
+    """
+
+    def __init__(self, min_ms: int = 500, max_ms: int = 30000, far_margin: float = 30, samples_to_limit: int = 4):
+        self.min_ms = min_ms
+        self.max_ms = max_ms
+        self.far_margin = far_margin
+        self.samples_to_limit = samples_to_limit
+        self._last = None  # type: tuple[float, float, float] | None
+
+    def __repr__(self):
+        return f"<{type(self).__name__} min={self.min_ms!r}ms max={self.max_ms!r}ms>"
+
+    def reset(self):
+        self._last = None
+
+    def next_interval(self, time: float,
+                      virtual: float, swap: float, virtual_limit: float, swap_limit: float) -> int:
+        min_ms, max_ms = self.min_ms, max(self.min_ms, self.max_ms)
+        margin = min(virtual_limit - virtual, swap_limit - swap)
+
+        last, self._last = self._last, (time, virtual, swap)
+
+        if margin <= 0:
+            return min_ms
+
+        ratio = min(margin / self.far_margin, 1)
+        interval = min_ms + (max_ms - min_ms) * ratio * ratio
+
+        if last is not None and time > last[0]:
+            elapsed = time - last[0]
+            # 指標ごとに、しきい値に到達するまでの時間 (余裕 / 上昇速度) を求めて最も短いものに合わせる
+            to_limit = [
+                (limit - value) / ((value - previous) / elapsed)
+                for value, previous, limit in ((virtual, last[1], virtual_limit), (swap, last[2], swap_limit))
+                if value > previous
+            ]
+            if to_limit:
+                interval = min(interval, min(to_limit) * 1000 / self.samples_to_limit)
+
+        return int(max(min_ms, min(interval, max_ms)))
@@ -0,0 +1,106 @@
+from typing import Iterable, Set
+
+__all__ = [
+    "TrigramIndex",
+]
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex(object):
+    """
+    プロセス名とコマンドラインの小文字テキストから作るトライグラム索引
+
+    3文字以上の検索語は各トライグラムの pid 集合の積で候補を絞ってから部分一致を確認し、
+    直前の検索語を含む検索語 (入力を1文字ずつ追加した場合など) は前回の結果だけを絞り込みます
+    """
+
+    def __init__(self):
+        self.texts = {}  # type: dict[int, str]
+        self._postings = {}  # type: dict[str, set[int]]
+        self._last_query = None  # type: str | None
+        self._last_result = set()  # type: set[int]
+
+    def __len__(self):
+        return len(self.texts)
+
+    @staticmethod
+    def make_text(info: dict) -> str:
+        cmdline = info.get("cmdline") or ()
+        return "\n".join((info["name"] or "", " ".join(cmdline))).lower()
+
+    def _invalidate(self):
+        self._last_query = None
+        self._last_result = set()
+
+    def add(self, info: dict):
+        pid = info["pid"]
+        if pid in self.texts:
+            self.remove(pid)
+        self.texts[pid] = text = self.make_text(info)
+        postings = self._postings
+        for trigram in _trigrams(text):
+            pids = postings.get(trigram)
+            if pids is None:
+                postings[trigram] = {pid}
+            else:
+                pids.add(pid)
+        self._invalidate()
+
+    def remove(self, pid: int):
+        text = self.texts.pop(pid, None)
+        if text is None:
+            return
+        postings = self._postings
+        for trigram in _trigrams(text):
+            pids = postings.get(trigram)
+            if pids is not None:
+                pids.discard(pid)
+                if not pids:
+                    del postings[trigram]
+        self._invalidate()
+
+    def rebuild(self, infos: Iterable[dict]):
+        self.clear()
+        postings = self._postings
+        for info in infos:
+            pid = info["pid"]
+            self.texts[pid] = text = self.make_text(info)
+            for trigram in _trigrams(text):
+                pids = postings.get(trigram)
+                if pids is None:
+                    postings[trigram] = {pid}
+                else:
+                    pids.add(pid)
+
+    def clear(self):
+        self.texts.clear()
+        self._postings.clear()
+        self._invalidate()
+
+    def search(self, query: str) -> Set[int]:
+        """
+        名前またはコマンドラインに query を含むプロセスの pid (大文字小文字を区別しない)
+        """
+        query = query.lower()
+        if not query:
+            return set(self.texts)
+
+        texts = self.texts
+        last_query = self._last_query
+        if last_query is not None and last_query in query:
+            # 前回の検索語を含むので、前回の結果の中から探せば十分
+            candidates = self._last_result  # type: Iterable[int]
+        elif len(query) >= 3:
+            posting_sets = [self._postings.get(trigram) or set() for trigram in _trigrams(query)]
+            posting_sets.sort(key=len)
+            candidates = posting_sets[0].intersection(*posting_sets[1:])
+        else:
+            candidates = texts
+
+        result = {pid for pid in candidates if query in texts[pid]}
+        self._last_query = query
+        self._last_result = result
+        return result
@@ -0,0 +1,175 @@
+"""
+プロセスの USS (専有メモリ) と PSS (共有ページを按分したメモリ) をバックグラウンドで取得します
+
+Linux では /proc/<pid>/smaps_rollup を読み、それ以外では psutil.Process.memory_full_info() を使います
+"""
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+import psutil
+
+__all__ = [
+    "MemoryDetail",
+    "MemoryDetailWorker",
+    "read_memory_detail",
+]
+
+SMAPS_ROLLUP_PATH = "/proc/{pid}/smaps_rollup"
+USS_FIELDS = (b"Private_Clean:", b"Private_Dirty:", b"Private_Hugetlb:")
+
+
+class MemoryDetail(NamedTuple):
+    uss: int
+    pss: int
+
+
+def _read_smaps_rollup(pid: int) -> Optional[MemoryDetail]:
+    fd = os.open(SMAPS_ROLLUP_PATH.format(pid=pid), os.O_RDONLY)
+    try:
+        data = os.read(fd, 4096)
+    finally:
+        os.close(fd)
+
+    uss = pss = 0
+    found = False
+    for line in data.split(b"\n"):
+        key, _, value = line.partition(b" ")
+        if key == b"Pss:":
+            pss = int(value.split()[0]) * 1024
+            found = True
+        elif key in USS_FIELDS:
+            uss += int(value.split()[0]) * 1024
+    return MemoryDetail(uss, pss) if found else None
+
+
+def _read_psutil(pid: int) -> Optional[MemoryDetail]:
+    info = psutil.Process(pid).memory_full_info()
+    uss = getattr(info, "uss", None)
+    if uss is None:
+        return None
+    return MemoryDetail(uss, getattr(info, "pss", uss))
+
+
+def read_memory_detail(pid: int) -> Optional[MemoryDetail]:
+    """
+    pid の USS/PSS (取得できない場合は None)
+    """
+    try:
+        if sys.platform.startswith("linux"):
+            try:
+                return _read_smaps_rollup(pid)
+            except FileNotFoundError:
+                if not os.path.exists(f"/proc/{pid}"):
+                    return None
+                # kernel < 4.14 には smaps_rollup がない
+        return _read_psutil(pid)
+    except (OSError, ValueError, psutil.Error):
+        return None
+
+
+class MemoryDetailWorker(object):
+    """
+    USS/PSS を読み取るスレッド
+
+    request() で渡された順 (メモリ使用量の大きい順) に、1回の要求につき budget 秒まで読み取ります
+    結果は (pid, create_time) ごとにキャッシュし、max_age 秒より古いものだけを読み直します
+    """
+
+    def __init__(self, on_update: Callable[[], None] = None, *, budget: float = .2, max_age: float = 10):
+        self.on_update = on_update
+        self.budget = budget
+        self.max_age = max_age
+        self._cache = {}  # type: dict[tuple[int, float], tuple[float, MemoryDetail | None]]
+        self._queue = []  # type: list[tuple[int, float]]
+        self._cond = threading.Condition()
+        self._thread = None  # type: threading.Thread | None
+        self._stopped = threading.Event()  # スレッドごとに作り直す (古いスレッドが再開しないように)
+
+    def __repr__(self):
+        return f"<{type(self).__name__} cached={len(self._cache)} budget={self.budget!r}s>"
+
+    def start(self):
+        if self._thread and self._thread.is_alive() and not self._stopped.is_set():
+            return
+        self._stopped = stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(stopped, ), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        スレッドを止め、読み取り中のプロセスが終わるまで待ちます
+        """
+        with self._cond:
+            self._stopped.set()
+            self._queue = []
+            self._cond.notify_all()
+        thread, self._thread = self._thread, None
+        if thread and thread is not threading.current_thread():
+            thread.join(self.budget + 1)
+
+    def get(self, pid: int, create_time: float) -> Optional[MemoryDetail]:
+        entry = self._cache.get((pid, create_time))
+        return entry[1] if entry else None
+
+    def request(self, processes: Sequence[Tuple[int, float]]):
+        """
+        processes: 優先度の高い順の (pid, create_time)
+
+        前回の要求で未処理のものは破棄し、今回の一覧に含まれないキャッシュは削除します
+        """
+        alive = set(processes)
+        with self._cond:
+            for key in self._cache.keys() - alive:
+                del self._cache[key]
+            self._queue = list(processes)
+            self._cond.notify()
+
+    def _run(self, stopped: threading.Event):
+        while True:
+            with self._cond:
+                while not self._queue and not stopped.is_set():
+                    self._cond.wait()
+                if stopped.is_set():
+                    return
+                queue, self._queue = self._queue, []
+
+            try:
+                if self._process(queue, stopped) and self.on_update:
+                    self.on_update()
+            except (Exception,):
+                traceback.print_exc()
+
+    def _process(self, queue: List[Tuple[int, float]], stopped: threading.Event) -> bool:
+        cache = self._cache
+        deadline = time.monotonic() + self.budget
+        updated = False
+        for key in queue:
+            if stopped.is_set() or self._queue:  # 新しい要求が来たらそちらを優先する
+                break
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            entry = cache.get(key)
+            if entry and now - entry[0] < self.max_age:
+                continue
+            detail = read_memory_detail(key[0])
+            with self._cond:
+                cache[key] = (now, detail)
+            updated = True
+        return updated
+
+
+if __name__ == "__main__":
+    # 全プロセスの USS/PSS を読み取り、1プロセスあたりのコストを表示する
+    _pids = psutil.pids()
+    _start = time.perf_counter()
+    _details = {_pid: read_memory_detail(_pid) for _pid in _pids}
+    _elapsed = time.perf_counter() - _start
+    print(f"{_elapsed * 1e3:.2f} ms ({_elapsed / len(_pids) * 1e6:.1f} us/process, {len(_pids)} processes)")
+    _details = {_pid: _detail for _pid, _detail in _details.items() if _detail}
+    for _pid, _detail in sorted(_details.items(), key=lambda e: -e[1].pss)[:10]:
+        print(f"  {_pid:>7}  uss {_detail.uss / 1024 ** 2:>9,.1f} MB  pss {_detail.pss / 1024 ** 2:>9,.1f} MB")
@@ -0,0 +1,62 @@
+import pytest
+
+from aggregate import aggregate
+from scanner import MemInfo
+
+
+def info(pid, ppid, name, rss, user="user", cgroup=""):
+    return dict(pid=pid, ppid=ppid, name=name, user=user, cgroup=cgroup, memory_info=MemInfo(rss, rss * 10))
+
+
+PROCESSES = [
+    info(1, 0, "init", 10, user="root"),
+    info(100, 1, "bash", 50, cgroup="/a"),
+    info(101, 100, "python", 300, cgroup="/a"),
+    info(102, 100, "python", 200, cgroup="/b"),
+    info(103, 101, "worker", 100, cgroup="/a"),
+    info(200, 1, "sshd", 40, user="root"),
+    info(201, 999, "orphan", 5, user=""),
+]
+
+
+def test_empty():
+    assert aggregate([], "name") == []
+
+
+def test_invalid_key():
+    with pytest.raises(ValueError):
+        aggregate(PROCESSES, "size")
+
+
+def test_by_name():
+    groups = aggregate(PROCESSES, "name", top=1)
+    assert [(g.label, g.count, g.rss, g.vms) for g in groups[:2]] == [("python", 2, 500, 5000), ("worker", 1, 100, 1000)]
+    assert groups[0].members == [101]
+    assert sum(g.count for g in groups) == len(PROCESSES)
+
+
+def test_by_user_and_cgroup():
+    groups = aggregate(PROCESSES, "user")
+    assert [(g.label, g.count, g.rss) for g in groups] == [("user", 4, 650), ("root", 2, 50), ("(不明)", 1, 5)]
+    assert groups[0].members == [101, 102, 103, 100]
+
+    groups = aggregate(PROCESSES, "cgroup")
+    assert [(g.label, g.rss) for g in groups] == [("/a", 450), ("/b", 200), ("(不明)", 55)]
+
+
+def test_by_parent():
+    groups = aggregate(PROCESSES, "parent")
+    assert [(g.label, g.count, g.rss) for g in groups] == [
+        ("bash (100)", 2, 500), ("python (101)", 1, 100), ("init (1)", 2, 90), ("? (0)", 1, 10), ("? (999)", 1, 5)]
+
+
+def test_by_tree():
+    groups = aggregate(PROCESSES, "tree")
+    assert [(g.label, g.count, g.rss) for g in groups] == [
+        ("bash (100)", 4, 650), ("sshd (200)", 1, 40), ("init (1)", 1, 10), ("orphan (201)", 1, 5)]
+
+
+def test_tree_cycle():
+    # PID の再利用などで親子関係が循環していても終了する
+    groups = aggregate([info(10, 11, "a", 1), info(11, 10, "b", 2)], "tree")
+    assert sum(g.count for g in groups) == 2
@@ -0,0 +1,46 @@
+import time
+
+import pytest
+
+from config import RamNotifyConfig
+from daemon import Daemon
+
+
+class RunningWatcher(object):
+    is_running = True
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    config = RamNotifyConfig(tmp_path / "settings.json")
+    config.history_file = False
+    config.refresh_rate_ms = 5000
+    config.pressure_idle_ms = 60000
+    config.virtual_percent = config.swap_percent = 101  # しきい値を超えないようにする
+    daemon = Daemon(config)
+    yield daemon
+    daemon.engine.close()
+    daemon.sampler.close()
+
+
+def next_tick(daemon):
+    daemon.on_timer()
+    return daemon._tick.when - time.monotonic()
+
+
+def test_refresh_interval_without_watcher(daemon):
+    assert next_tick(daemon) == pytest.approx(5, abs=1)
+
+
+def test_idle_interval_while_watcher_running(daemon):
+    daemon.pressure_watcher = RunningWatcher()
+    assert next_tick(daemon) == pytest.approx(60, abs=1)
+
+
+def test_refresh_interval_when_samples_are_needed(daemon):
+    daemon.pressure_watcher = RunningWatcher()
+    daemon.config.forecast = True
+    assert next_tick(daemon) == pytest.approx(5, abs=1)
+    daemon.config.forecast = False
+    daemon.config.history_file = True
+    assert next_tick(daemon) == pytest.approx(5, abs=1)
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from decimate import DecimationCache, lttb, minmax
+
+
+@pytest.mark.parametrize("method", [lttb, minmax])
+def test_small_input(method):
+    assert list(method(np.array([]), 10)) == []
+    assert list(method(np.array([1.]), 10)) == [0]
+    assert list(method(np.arange(5.), 10)) == [0, 1, 2, 3, 4]
+    # 閾値が小さすぎる場合は間引かない
+    assert list(method(np.arange(100.), 2)) == list(range(100))
+
+
+@pytest.mark.parametrize("method", [lttb, minmax])
+def test_keeps_ends_and_spikes(method):
+    rng = np.random.default_rng(0)
+    values = rng.normal(0, 1, 10000)
+    values[1234] = 100.
+    values[7777] = -100.
+    indexes = method(values, 200)
+    assert len(indexes) <= 200
+    assert indexes[0] == 0 and indexes[-1] == len(values) - 1
+    assert np.all(np.diff(indexes) > 0)
+    assert 1234 in indexes
+    if method is minmax:
+        assert 7777 in indexes
+
+
+def test_lttb_size():
+    assert len(lttb(np.arange(1000.), 100)) == 100
+
+
+def test_cache():
+    cache = DecimationCache()
+    values = np.sin(np.arange(1000.) / 10)
+    first = cache.indexes("physical", values, 100, version=1)
+    assert cache.indexes("physical", values, 100, version=1) is first
+    assert cache.indexes("physical", values, 100, version=2) is not first
+    assert cache.indexes("physical", values, 50, version=2) is not first
+    assert cache.indexes("physical", values[:500], 50, version=2) is not first
+
+    # version が None の場合はキャッシュしない
+    cache.clear()
+    assert cache.indexes("swap", values, 100) is not cache.indexes("swap", values, 100)
+
+    cache.method = "minmax"
+    assert list(cache.indexes("swap", values, 100, version=1)) == list(minmax(values, 100))
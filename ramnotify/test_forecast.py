@@ -0,0 +1,59 @@
+import pytest
+
+from forecast import TrendForecaster
+from history import MemoryHistory
+from sampler import MemorySnapshot
+
+
+def history_of(values, start=0.):
+    history = MemoryHistory(((1, 30), ))
+    for index, used in enumerate(values):
+        history.add(MemorySnapshot(time=start + index, total=1000, available=1000 - used, percent=0.,
+                                   swap_total=0, swap_used=0, swap_free=0, swap_percent=0.,
+                                   swap_sin=0, swap_sout=0))
+    return history
+
+
+def test_empty_history():
+    forecaster = TrendForecaster(MemoryHistory(((1, 30), )))
+    assert forecaster.slope("physical", 0.) is None
+    assert forecaster.seconds_to_limit("physical", 1000, 90, 0.) is None
+
+
+def test_too_few_samples():
+    forecaster = TrendForecaster(history_of([100, 110, 120]), min_samples=5)
+    assert forecaster.seconds_to_limit("physical", 1000, 90, 2.) is None
+
+
+def test_linear_growth():
+    forecaster = TrendForecaster(history_of([100 + 10 * t for t in range(20)]), window=60)
+    slope, current = forecaster.slope("physical", 19.)
+    assert slope == pytest.approx(10.)
+    assert current == pytest.approx(290.)
+    assert forecaster.seconds_to_limit("physical", 1000, 90, 19.) == pytest.approx(61.)
+
+
+def test_flat_or_falling():
+    forecaster = TrendForecaster(history_of([500] * 10))
+    assert forecaster.seconds_to_limit("physical", 1000, 90, 9.) is None
+    forecaster = TrendForecaster(history_of([500 - t for t in range(10)]))
+    assert forecaster.seconds_to_limit("physical", 1000, 90, 9.) is None
+
+
+def test_already_over_limit():
+    forecaster = TrendForecaster(history_of([950] * 10))
+    assert forecaster.seconds_to_limit("physical", 1000, 90, 9.) == 0.
+
+
+def test_no_total():
+    forecaster = TrendForecaster(history_of([100 + t for t in range(10)]))
+    assert forecaster.seconds_to_limit("swap", 0, 90, 9.) is None
+
+
+def test_window_and_wraparound():
+    # 容量 (30件) を超えて記録し、古い下降部分は window の外になる
+    values = [900 - 10 * t for t in range(40)] + [100 + 20 * t for t in range(10)]
+    forecaster = TrendForecaster(history_of(values), window=9)
+    slope, current = forecaster.slope("physical", 49.)
+    assert slope == pytest.approx(20.)
+    assert current == pytest.approx(280.)
@@ -0,0 +1,84 @@
+import pytest
+
+from growth import GrowthTracker
+from scanner import MemInfo
+
+MB = 1024 ** 2
+
+
+def info(pid, rss, create_time=1.):
+    return dict(pid=pid, create_time=create_time, memory_info=MemInfo(int(rss), 0))
+
+
+def test_empty():
+    tracker = GrowthTracker(capacity=10, window=10, min_samples=3)
+    assert tracker.growth(0.) == []
+    tracker.add(0., [])
+    assert len(tracker) == 0
+    assert tracker.top_growers(now=0.) == []
+    assert tracker.leaks(0, now=0.) == []
+
+
+def test_rates():
+    tracker = GrowthTracker(capacity=20, window=16, min_samples=3)
+    for t in range(10):
+        tracker.add(float(t), [info(1, 100 * MB + t * MB), info(2, 50 * MB), info(3, 80 * MB - t * MB)])
+    rates = {entry.pid: entry for entry in tracker.growth(9.)}
+    assert rates[1].rate == pytest.approx(MB)
+    assert rates[1].r2 == pytest.approx(1.)
+    assert rates[1].span == 9.
+    assert rates[1].rss == 109 * MB
+    assert rates[2].rate == 0.
+    assert rates[3].rate == pytest.approx(-MB)
+
+    assert [entry.pid for entry in tracker.top_growers(now=9.)] == [1]
+    assert [entry.pid for entry in tracker.leaks(MB / 2, now=9.)] == [1]
+    assert tracker.leaks(MB * 2, now=9.) == []
+
+
+def test_min_samples():
+    tracker = GrowthTracker(capacity=20, window=100, min_samples=5)
+    for t in range(4):
+        tracker.add(float(t), [info(1, t * MB)])
+    assert tracker.growth(3.) == []
+    tracker.add(4., [info(1, 4 * MB), info(2, MB)])
+    assert [entry.pid for entry in tracker.growth(4.)] == [1]
+
+
+def test_wraparound_and_window():
+    tracker = GrowthTracker(capacity=8, window=5, min_samples=3)
+    # 前半は減少、容量を超えた後半は増加
+    for t in range(30):
+        tracker.add(float(t), [info(1, (100 - t) * MB if t < 20 else (t * 2) * MB)])
+    (entry, ) = tracker.growth(29.)
+    assert entry.rate == pytest.approx(2 * MB)
+    assert entry.span == 5.
+    assert entry.rss == 58 * MB
+
+
+def test_pid_reuse_and_exit():
+    tracker = GrowthTracker(capacity=10, window=100, min_samples=3)
+    for t in range(5):
+        tracker.add(float(t), [info(1, t * MB), info(2, MB)])
+    # pid 1 が別のプロセスとして再利用され、pid 2 は終了した
+    tracker.add(5., [info(1, MB, create_time=2.)])
+    assert len(tracker) == 1
+    assert tracker.growth(5.) == []
+    for t in range(6, 8):
+        tracker.add(float(t), [info(1, t * MB, create_time=2.)])
+    (entry, ) = tracker.growth(7.)
+    assert entry.span == 2.
+
+
+def test_rows_are_reused():
+    tracker = GrowthTracker(capacity=4, window=10, min_samples=2)
+    for t in range(200):
+        tracker.add(float(t), [info(pid, MB) for pid in range(t, t + 10)])
+    assert len(tracker) == 10
+    assert len(tracker._pids) == 64
+
+    tracker.clear()
+    assert len(tracker) == 0
+    for t in range(10):
+        tracker.add(float(t), [info(pid, MB) for pid in range(20)])
+    assert len(tracker._pids) == 64
@@ -0,0 +1,146 @@
+import math
+
+from history import HistoryTier, MemoryHistory, RingBuffer
+from sampler import MemorySnapshot
+
+
+def snapshot(time, used, swap_used=0):
+    return MemorySnapshot(time=time, total=1000, available=1000 - used, percent=used / 10,
+                          swap_total=100, swap_used=swap_used, swap_free=100 - swap_used,
+                          swap_percent=float(swap_used), swap_sin=0, swap_sout=0)
+
+
+def test_ring_buffer_empty():
+    buffer = RingBuffer(4)
+    assert len(buffer) == 0
+    assert math.isnan(buffer.last)
+    assert len(buffer.view()) == 4
+    assert all(math.isnan(value) for value in buffer.view())
+    assert list(buffer.view(0)) == []
+
+
+def test_ring_buffer_wraparound():
+    buffer = RingBuffer(4, fill=0.)
+    for value in range(1, 11):
+        buffer.append(float(value))
+    assert len(buffer) == 4
+    assert buffer.last == 10.
+    assert list(buffer.view()) == [7., 8., 9., 10.]
+    assert list(buffer.view(2)) == [9., 10.]
+    assert list(buffer.view(10)) == [7., 8., 9., 10.]
+
+    buffer.replace_last(-1.)
+    assert list(buffer.view()) == [7., 8., 9., -1.]
+
+
+def test_ring_buffer_partial():
+    buffer = RingBuffer(4, fill=0.)
+    buffer.append(1.)
+    buffer.append(2.)
+    assert list(buffer.view()) == [0., 0., 1., 2.]
+
+
+def test_tier_aggregates_bucket():
+    tier = HistoryTier(10, 3, ("physical", ))
+    for time, value in ((100, 5.), (103, 1.), (109, 9.)):
+        tier.add(time, dict(physical=value))
+    assert list(tier.time_view(1)) == [100.]
+    assert list(tier.series("physical", "mean", 1)) == [5.]
+    assert list(tier.series("physical", "min", 1)) == [1.]
+    assert list(tier.series("physical", "max", 1)) == [9.]
+    assert tier.version == 3
+
+    tier.add(110, dict(physical=2.))
+    assert list(tier.time_view(2)) == [100., 110.]
+    assert list(tier.series("physical", "mean", 2)) == [5., 2.]
+
+
+def test_tier_wraparound():
+    tier = HistoryTier(1, 3, ("physical", ))
+    for time in range(10):
+        tier.add(float(time), dict(physical=float(time * 2)))
+    assert list(tier.time_view()) == [7., 8., 9.]
+    assert list(tier.series("physical", "max")) == [14., 16., 18.]
+
+
+def test_tier_sparse_samples():
+    # 5秒ごとのサンプルでも、1秒の段の1スロットは1秒に対応する
+    tier = HistoryTier(1, 11, ("physical", ))
+    for time in (100., 105., 110.):
+        tier.add(time, dict(physical=time))
+    assert list(tier.time_view()) == [float(t) for t in range(100, 111)]
+    values = list(tier.series("physical"))
+    assert [(t, v) for t, v in zip(range(100, 111), values) if not math.isnan(v)] == [
+        (100, 100.), (105, 105.), (110, 110.)]
+
+
+def test_tier_long_gap():
+    tier = HistoryTier(60, 4, ("physical", ))
+    tier.add(0., dict(physical=1.))
+    tier.add(60. * 1000, dict(physical=2.))
+    # 容量を超える空白は容量分だけ埋める
+    assert list(tier.time_view()) == [60. * 997, 60. * 998, 60. * 999, 60. * 1000]
+    assert [v for v in tier.series("physical") if not math.isnan(v)] == [2.]
+
+
+def test_tier_clock_goes_back():
+    tier = HistoryTier(1, 4, ("physical", ))
+    tier.add(10., dict(physical=1.))
+    tier.add(5., dict(physical=2.))
+    tier.add(6., dict(physical=3.))
+    assert list(tier.series("physical", count=3)) == [1., 2., 3.]
+
+
+def test_history_tiers():
+    history = MemoryHistory(((1, 10), (10, 10)))
+    for time in range(30):
+        history.add(snapshot(float(time), 100 + time, time))
+    assert history.last_time == 29.
+    assert (history.physical_total, history.swap_total) == (1000, 100)
+
+    fine, coarse = history.tiers
+    assert list(fine.series("physical", "mean", 2)) == [128., 129.]
+    assert list(coarse.time_view(3)) == [0., 10., 20.]
+    assert list(coarse.series("swap", "mean", 3)) == [4.5, 14.5, 24.5]
+    assert list(coarse.series("physical", "min", 1)) == [120.]
+
+    assert history.tier_for(5) is fine
+    assert history.tier_for(10) is fine
+    assert history.tier_for(50) is coarse
+    assert history.tier_for(10 ** 6) is coarse
+
+
+def test_tier_slots():
+    tier = HistoryTier(1, 600, ("physical", ))
+    for time in range(1000, 2000, 5):  # 5秒ごとのサンプル
+        tier.add(float(time), dict(physical=float(time)))
+    times = tier.time_view()
+
+    count, back = tier.slots(60)
+    assert (count, back) == (60, 0)
+    assert times[-1] - times[-count] == 59
+
+    # 1分前までの10秒間
+    count, back = tier.slots(10, 1995. - 60)
+    shown = list(tier.time_view(count + back))[:count]
+    assert shown == [float(t) for t in range(1926, 1936)]
+
+    # 記録より前や未来の範囲は両端に収める
+    assert tier.slots(10, 0.) == (10, 590)
+    assert tier.slots(10, 5000.) == (10, 0)
+    assert tier.slots(10 ** 6) == (600, 0)
+    assert HistoryTier(1, 10, ("physical", )).slots(1, 5.) == (2, 0)
+
+
+def test_tier_appended_follows_slots():
+    tier = HistoryTier(1, 20, ("physical", ))
+    previous, appended = None, 0
+    for time in (0., 0.5, 5., 7., 7.2, 30., 31.):
+        tier.add(time, dict(physical=time))
+        view = [None if math.isnan(t) else t for t in tier.time_view()]
+        advance = tier.appended - appended
+        # appended の増分だけ古い値が左へずれている
+        if previous is not None and advance < len(view):
+            assert view[:len(view) - advance] == previous[advance:]
+        previous, appended = view, tier.appended
+    assert tier.appended == 8 + 20 + 1 + 1  # 7秒から30秒の空白は容量 (20) までしか埋めない
@@ -0,0 +1,129 @@
+import os
+
+import pytest
+
+from historyfile import HEADER, RECORD, HistoryReader, HistoryWriter, read_history, rotated_path
+from sampler import MemorySnapshot
+
+
+def snapshot(time):
+    return MemorySnapshot(time=time, total=1000, available=1000 - int(time), percent=0.,
+                          swap_total=100, swap_used=int(time) % 100, swap_free=0, swap_percent=0.,
+                          swap_sin=1, swap_sout=2)
+
+
+def write(path, times, **kwargs):
+    writer = HistoryWriter(path, **kwargs)
+    for time in times:
+        writer.add(snapshot(float(time)))
+    writer.close()
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path / "history.bin"
+    write(path, range(100), batch_size=8)
+    assert path.stat().st_size == HEADER.size + RECORD.size * 100
+
+    reader = HistoryReader(path)
+    try:
+        assert len(reader) == 100
+        record = reader[42]
+        assert record.time == 42.
+        assert (record.physical_used, record.physical_total) == (42, 1000)
+        assert (record.swap_used, record.swap_total, record.swap_in, record.swap_out) == (42, 100, 1, 2)
+        with pytest.raises(IndexError):
+            reader[100]
+    finally:
+        reader.close()
+
+
+def test_query_bisect(tmp_path):
+    path = tmp_path / "history.bin"
+    write(path, range(0, 200, 2))
+    reader = HistoryReader(path)
+    try:
+        assert [r.time for r in reader.query(10, 16)] == [10., 12., 14.]
+        assert [r.time for r in reader.query(11, 15)] == [12., 14.]
+        assert [r.time for r in reader.query(None, 4)] == [0., 2.]
+        assert [r.time for r in reader.query(196)] == [196., 198.]
+        assert list(reader.query(500)) == []
+        assert list(reader.query(20, 10)) == []
+        assert len(list(reader.query())) == 100
+    finally:
+        reader.close()
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "history.bin"
+    path.write_bytes(b"")
+    reader = HistoryReader(path)
+    assert len(reader) == 0
+    assert list(reader.query()) == []
+    reader.close()
+
+    # ヘッダーだけのファイル
+    write(path, [])
+    assert read_history(path) == []
+
+
+def test_unsupported_file(tmp_path):
+    path = tmp_path / "history.bin"
+    path.write_bytes(HEADER.pack(b"XXXX", 1, RECORD.size, 0))
+    with pytest.raises(ValueError):
+        HistoryReader(path)
+    assert read_history(path) == []
+
+
+def test_reopen_truncated_file(tmp_path):
+    path = tmp_path / "history.bin"
+    write(path, range(10))
+    os.truncate(path, path.stat().st_size - RECORD.size // 2)
+    assert [r.time for r in read_history(path)] == [float(t) for t in range(9)]
+
+    # 不完全なレコードを切り詰めてから追記する
+    write(path, range(100, 103))
+    assert path.stat().st_size == HEADER.size + RECORD.size * 12
+    assert [r.time for r in read_history(path)] == [float(t) for t in range(9)] + [100., 101., 102.]
+
+
+def test_reopen_truncated_header(tmp_path):
+    path = tmp_path / "history.bin"
+    path.write_bytes(HEADER.pack(b"RNHS", 1, RECORD.size, 0)[:5])
+    write(path, [1, 2])
+    assert [r.time for r in read_history(path)] == [1., 2.]
+
+
+def test_rotation(tmp_path):
+    path = tmp_path / "history.bin"
+    write(path, range(50), batch_size=4, max_bytes=HEADER.size + RECORD.size * 20)
+    assert rotated_path(path).is_file()
+    assert path.stat().st_size <= HEADER.size + RECORD.size * 20
+
+    times = [r.time for r in read_history(path)]
+    assert times == sorted(times)
+    assert times[-1] == 49.
+    assert [r.time for r in read_history(path, 45, 48)] == [45., 46., 47.]
+
+
+@pytest.mark.parametrize("content", [
+    HEADER.pack(b"RNHS", 0, RECORD.size, 0) + bytes(RECORD.size * 3),  # 古い形式
+    HEADER.pack(b"RNHS", 1, RECORD.size + 8, 0),  # レコードの大きさが違う
+    b"unrelated text file\n",
+    b"XY",  # 途中で途切れた別のヘッダー
+])
+def test_reopen_unsupported_file(tmp_path, content):
+    path = tmp_path / "history.bin"
+    path.write_bytes(content)
+    write(path, [1, 2])
+    assert (tmp_path / "history.bin.invalid").read_bytes() == content
+    assert [r.time for r in read_history(path)] == [1., 2.]
+
+
+def test_config_history_file_is_opt_in(tmp_path):
+    from config import RamNotifyConfig
+
+    config = RamNotifyConfig(tmp_path / "settings.json")
+    config.load()
+    assert not config.history_file
+    assert not config.history_path.exists()
+
@@ -0,0 +1,70 @@
+import random
+
+from processindex import COLUMN_KEYS, ProcessIndex
+from scanner import MemInfo
+
+
+def info(pid, name, rss, vms=0):
+    return dict(pid=pid, name=name, memory_info=MemInfo(rss, vms))
+
+
+def expected(processes, column, descending):
+    ordered = sorted(processes, key=COLUMN_KEYS[column])
+    return [p["pid"] for p in (reversed(ordered) if descending else ordered)]
+
+
+def test_empty():
+    index = ProcessIndex()
+    assert len(index) == 0
+    assert list(index) == []
+    assert index.index_of(1) is None
+    assert index.select([1, 2]) == []
+    assert index.remove(1) is None
+    assert not index.update_memory(1, MemInfo(0, 0))
+
+
+def test_orders():
+    processes = [info(3, "b", 300, 1), info(1, "C", 100, 3), info(2, "a", 300, 2)]
+    index = ProcessIndex()
+    index.rebuild(processes)
+    for column in range(len(COLUMN_KEYS)):
+        for descending in (False, True):
+            index.set_order(column, descending)
+            pids = [p["pid"] for p in index]
+            assert pids == expected(processes, column, descending)
+            assert [index.index_of(pid) for pid in pids] == list(range(len(pids)))
+            assert [p["pid"] for p in index.ordered(column, descending)] == pids
+
+    index.set_order(2, True)
+    assert [p["pid"] for p in index.select([1, 3, 99])] == [3, 1]
+
+
+def test_incremental_matches_rebuild():
+    rng = random.Random(0)
+    processes = {}
+    index = ProcessIndex()
+    index.set_order(2, True)
+    for _ in range(500):
+        pid = rng.randrange(50)
+        action = rng.random()
+        if action < .4:
+            processes[pid] = info(pid, rng.choice("abcAB"), rng.randrange(10), rng.randrange(10))
+            index.add(processes[pid])
+        elif action < .6:
+            assert (index.remove(pid) is not None) == (processes.pop(pid, None) is not None)
+        elif pid in processes:
+            assert index.update_memory(pid, MemInfo(rng.randrange(10), rng.randrange(10)))
+
+        assert [p["pid"] for p in index] == expected(processes.values(), 2, True)
+
+    rebuilt = ProcessIndex()
+    rebuilt.rebuild(processes.values())
+    assert rebuilt._sorted == index._sorted
+
+
+def test_clear():
+    index = ProcessIndex()
+    index.rebuild([info(1, "a", 1)])
+    index.clear()
+    assert len(index) == 0
+    assert index._sorted == [[] for _ in COLUMN_KEYS]
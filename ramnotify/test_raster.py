@@ -0,0 +1,85 @@
+import numpy as np
+
+from raster import Rasterizer
+
+BLACK = (0, 0, 0, 255)
+RED = (255, 0, 0, 255)
+
+
+def test_clear_and_resize():
+    raster = Rasterizer(4, 3)
+    assert raster.pixels.shape == (3, 4, 3)
+    raster.clear((1, 2, 3, 255))
+    assert (raster.finish() == (1, 2, 3)).all()
+    raster.resize(5, 2)
+    assert raster.pixels.shape == (2, 5, 3)
+
+
+def test_lines_ignore_outside():
+    raster = Rasterizer(6, 4)
+    raster.clear(BLACK)
+    raster.hlines([1, -1, 4], RED)
+    raster.vlines([2, 99], RED)
+    red = (raster.pixels == RED[:3]).all(axis=2)
+    expected = np.zeros((4, 6), dtype=bool)
+    expected[1, :] = expected[:, 2] = True
+    assert (red == expected).all()
+
+
+def test_short_polyline_is_ignored():
+    raster = Rasterizer(6, 4)
+    raster.clear(BLACK)
+    raster.fill_area(np.empty((0, 2)), RED)
+    raster.polyline(np.array([[1, 1]]), RED)
+    assert not raster.pixels.any()
+
+
+def test_fill_area():
+    raster = Rasterizer(10, 10)
+    raster.clear(BLACK)
+    raster.fill_area(np.array([[2, 4], [7, 4]]), RED)
+    red = (raster.pixels == RED[:3]).all(axis=2)
+    expected = np.zeros((10, 10), dtype=bool)
+    expected[4:, 2:8] = True
+    assert (red == expected).all()
+
+
+def test_alpha_blend():
+    raster = Rasterizer(4, 4)
+    raster.clear((100, 100, 100, 255))
+    raster.fill_area(np.array([[0, 0], [3, 0]]), (200, 0, 100, 128))
+    assert raster.pixels[0, 0].tolist() == [150, 50, 100]
+    raster.fill_area(np.array([[0, 0], [3, 0]]), (255, 255, 255, 0))
+    assert raster.pixels[0, 0].tolist() == [150, 50, 100]
+
+
+def test_polyline_is_connected():
+    raster = Rasterizer(20, 20)
+    raster.clear(BLACK)
+    raster.polyline(np.array([[0, 2], [10, 18], [19, 2]]), RED, width=1)
+    red = (raster.pixels == RED[:3]).all(axis=2)
+    assert red[:, :20].any(axis=0).all()
+    # 急な傾きでも各列の線が隣の列とつながる
+    for x in range(19):
+        rows = np.flatnonzero(red[:, x])
+        following = np.flatnonzero(red[:, x + 1])
+        assert rows.min() <= following.max() + 1 and following.min() <= rows.max() + 1
+
+
+def test_polyline_clipped():
+    raster = Rasterizer(10, 10)
+    raster.clear(BLACK)
+    raster.polyline(np.array([[-5, -50], [15, -50]]), RED)
+    assert not raster.pixels.any()
+    raster.polyline(np.array([[-5, 50], [15, 50]]), RED)
+    assert not raster.pixels.any()
+
+
+def test_polyline_width():
+    for width, rows in ((1, [5]), (2, [4, 5]), (3, [4, 5, 6])):
+        raster = Rasterizer(10, 10)
+        raster.clear(BLACK)
+        raster.polyline(np.array([[0, 5.2], [9, 4.8]]), RED, width=width)
+        red = (raster.pixels == RED[:3]).all(axis=2)
+        assert np.flatnonzero(red.any(axis=1)).tolist() == rows
+        assert red.any(axis=0).all()
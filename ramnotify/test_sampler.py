@@ -0,0 +1,86 @@
+import os
+
+import pytest
+
+from sampler import MemorySampler, ProcMeminfoBackend
+
+MEMINFO = """MemTotal:       16000000 kB
+MemFree:         2000000 kB
+MemAvailable:    4000000 kB
+Buffers:          100000 kB
+Cached:          3000000 kB
+SwapTotal:       2000000 kB
+SwapFree:        1500000 kB
+"""
+VMSTAT = """nr_free_pages 500000
+pswpin 10
+pswpout 20
+"""
+
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch):
+    meminfo = tmp_path / "meminfo"
+    vmstat = tmp_path / "vmstat"
+    meminfo.write_text(MEMINFO)
+    vmstat.write_text(VMSTAT)
+    monkeypatch.setattr(ProcMeminfoBackend, "MEMINFO_PATH", str(meminfo))
+    monkeypatch.setattr(ProcMeminfoBackend, "VMSTAT_PATH", str(vmstat))
+    backend = ProcMeminfoBackend()
+    backend.meminfo, backend.vmstat = meminfo, vmstat
+    yield backend
+    backend.close()
+
+
+def test_procfs_parse(backend):
+    snapshot = backend.read()
+    page = os.sysconf("SC_PAGE_SIZE")
+    assert snapshot.total == 16000000 * 1024
+    assert snapshot.available == 4000000 * 1024
+    assert snapshot.percent == 75.0
+    assert snapshot.swap_total == 2000000 * 1024
+    assert snapshot.swap_used == 500000 * 1024
+    assert snapshot.swap_percent == 25.0
+    assert (snapshot.swap_sin, snapshot.swap_sout) == (10 * page, 20 * page)
+
+
+def test_procfs_fields_moved(backend):
+    backend.read()
+    # 前回の位置に別のフィールドが来ても探し直す
+    backend.meminfo.write_text("MemTotal:        8000000 kB\nHugePages_Total:       0\n"
+                               + MEMINFO.split("\n", 1)[1].replace("4000000", "2000000"))
+    snapshot = backend.read()
+    assert snapshot.total == 8000000 * 1024
+    assert snapshot.available == 2000000 * 1024
+
+
+def test_procfs_without_memavailable(backend):
+    backend.meminfo.write_text(MEMINFO.replace("MemAvailable:    4000000 kB\n", ""))
+    snapshot = backend.read()
+    assert snapshot.available == (2000000 + 100000 + 3000000) * 1024
+
+
+def test_procfs_without_swap(backend):
+    backend.meminfo.write_text(MEMINFO.replace("2000000 kB\nSwapFree:        1500000", "0 kB\nSwapFree:        0"))
+    backend.vmstat.write_text("nr_free_pages 1\n")
+    snapshot = backend.read()
+    assert (snapshot.swap_total, snapshot.swap_used, snapshot.swap_percent) == (0, 0, 0.0)
+    assert (snapshot.swap_sin, snapshot.swap_sout) == (0, 0)
+
+
+def test_procfs_buffer_grows(backend):
+    padding = "".join(f"Field{i}:    {i} kB\n" for i in range(1000))
+    backend.meminfo.write_text(MEMINFO.replace("SwapTotal:", padding + "SwapTotal:"))
+    snapshot = backend.read()
+    assert snapshot.swap_total == 2000000 * 1024
+    assert len(backend._meminfo_buf) > 8192
+
+
+def test_sampler_get_does_not_publish(backend):
+    sampler = MemorySampler(backend)
+    received = []
+    sampler.subscribe(received.append)
+    first = sampler.sample()
+    assert received == [first]
+    assert sampler.get(-1) is not first  # 期限切れとして読み直させる
+    assert received == [first]
@@ -0,0 +1,104 @@
+import pytest
+
+from scanner import MemInfo, ProcessBatch, ProcessDiff, ProcessSnapshotEngine
+
+
+def info(pid, rss=100, *, name="proc", cmdline=("proc", "--flag"), create_time=1.):
+    return dict(pid=pid, ppid=1, create_time=create_time, name=name, exe=f"/usr/bin/{name}", user="user",
+                cgroup="/user.slice", memory_info=MemInfo(rss, rss * 2),
+                cmdline=list(cmdline) if cmdline is not None else None)
+
+
+class FakeSource(object):
+    name = "fake"
+
+    def __init__(self):
+        self.processes = {}  # type: dict[int, dict]
+        self.forgotten = []
+
+    def pids(self):
+        return list(self.processes)
+
+    def read_stat(self, pid):
+        p = self.processes.get(pid)
+        return p and (p["create_time"], p["name"], p["memory_info"], p["ppid"])
+
+    def read_static(self, pid, name):
+        p = self.processes[pid]
+        return name, p["cmdline"], p["exe"], p["user"], p["cgroup"]
+
+    def forget(self, pid):
+        self.forgotten.append(pid)
+
+
+def test_batch_round_trip():
+    batch = ProcessBatch()
+    batch.append(info(10))
+    batch.append(info(11, name="日本語", cmdline=("a b", "ü")))
+    batch.append(info(12, name="kworker", cmdline=None))
+    batch.append(info(13, cmdline=()))
+    batch.append(info(14, name="bad\udcff"))
+
+    result = ProcessBatch.from_bytes(batch.to_bytes())
+    assert [result.record(i) for i in range(len(result))] == list(batch.records())
+    assert result.record(1)["cmdline"] == ["a b", "ü"]
+    assert result.record(2)["cmdline"] is None
+    assert result.record(3)["cmdline"] == []
+    assert result.record(4)["name"] == "bad\udcff"
+
+
+def test_empty_batch_and_diff():
+    batch = ProcessBatch.from_bytes(ProcessBatch().to_bytes())
+    assert len(batch) == 0
+    assert list(batch.records()) == []
+
+    diff = ProcessDiff.from_bytes(ProcessDiff().to_bytes())
+    assert not diff
+    assert list(diff.changed()) == []
+    assert len(diff.added) == 0
+
+
+def test_diff_round_trip():
+    diff = ProcessDiff()
+    diff.removed.extend([3, 4])
+    for pid, rss in ((5, 500), (6, 600)):
+        diff.changed_pids.append(pid)
+        diff.changed_rss.append(rss)
+        diff.changed_vms.append(rss * 2)
+    diff.added.append(info(7, name="新規"))
+
+    result = ProcessDiff.from_bytes(diff.to_bytes())
+    assert result
+    assert list(result.removed) == [3, 4]
+    assert list(result.changed()) == [(5, MemInfo(500, 1000)), (6, MemInfo(600, 1200))]
+    assert list(result.added.records()) == [info(7, name="新規")]
+
+
+def test_invalid_magic():
+    with pytest.raises(ValueError):
+        ProcessBatch.from_bytes(ProcessDiff().to_bytes())
+    with pytest.raises(ValueError):
+        ProcessDiff.from_bytes(ProcessBatch().to_bytes())
+
+
+def test_engine_diff():
+    source = FakeSource()
+    source.processes = {pid: info(pid) for pid in (1, 2, 3)}
+    engine = ProcessSnapshotEngine(source)
+
+    first = engine.update()
+    assert sorted(first.added.pids) == [1, 2, 3]
+    assert not engine.update()
+
+    source.processes[2] = info(2, rss=200)
+    del source.processes[3]
+    source.processes[1] = info(1, create_time=2.)  # PID の再利用
+    source.processes[4] = info(4)
+    diff = engine.update()
+    assert sorted(diff.removed) == [1, 3]
+    assert list(diff.changed()) == [(2, MemInfo(200, 400))]
+    assert sorted(diff.added.pids) == [1, 4]
+    assert source.forgotten == [3]
+
+    assert sorted(engine.snapshot().records(), key=lambda r: r["pid"]) == [
+        info(1, create_time=2.), info(2, rss=200), info(4)]
@@ -0,0 +1,78 @@
+import random
+
+from search import TrigramIndex
+
+
+def info(pid, name, *cmdline):
+    return dict(pid=pid, name=name, cmdline=list(cmdline) if cmdline else None)
+
+
+PROCESSES = [
+    info(1, "python3", "python3", "-m", "http.server"),
+    info(2, "Firefox", "/usr/lib/firefox/firefox", "-contentproc"),
+    info(3, "bash"),
+    info(4, "sshd", "sshd: user@pts/0"),
+    info(5, "日本語プロセス", "日本語プロセス", "--オプション"),
+]
+
+
+def brute_force(processes, query):
+    query = query.lower()
+    return {p["pid"] for p in processes if query in TrigramIndex.make_text(p)}
+
+
+def test_empty_index():
+    index = TrigramIndex()
+    assert len(index) == 0
+    assert index.search("") == set()
+    assert index.search("python") == set()
+    index.remove(1)
+
+
+def test_search():
+    index = TrigramIndex()
+    index.rebuild(PROCESSES)
+    assert index.search("") == {1, 2, 3, 4, 5}
+    assert index.search("FIREFOX") == {2}
+    assert index.search("py") == {1}
+    assert index.search("sh") == {3, 4}
+    assert index.search("server") == {1}
+    assert index.search("オプション") == {5}
+    assert index.search("user@pts") == {4}
+    assert index.search("no such process") == set()
+    # 名前とコマンドラインの境界をまたぐ一致はしない
+    assert index.search("sshd sshd") == set()
+
+
+def test_refined_query_after_update():
+    index = TrigramIndex()
+    index.rebuild(PROCESSES)
+    assert index.search("fire") == {2}
+    index.add(info(6, "firewalld"))
+    # 前回の結果を使い回さずに新しいプロセスも見つける
+    assert index.search("firew") == {6}
+    index.remove(2)
+    assert index.search("fire") == {6}
+
+
+def test_matches_brute_force():
+    rng = random.Random(0)
+    words = ["alpha", "beta", "gamma", "ALPHABET", "bet", "amma", "ph"]
+    processes = {}
+    index = TrigramIndex()
+    for step in range(300):
+        pid = rng.randrange(30)
+        if rng.random() < .7:
+            processes[pid] = info(pid, rng.choice(words), *rng.sample(words, rng.randrange(3)))
+            index.add(processes[pid])
+        else:
+            processes.pop(pid, None)
+            index.remove(pid)
+
+        word = rng.choice(words)
+        for end in range(1, len(word) + 1):  # 1文字ずつ入力する
+            assert index.search(word[:end]) == brute_force(processes.values(), word[:end]), (step, word[:end])
+
+    rebuilt = TrigramIndex()
+    rebuilt.rebuild(processes.values())
+    assert rebuilt._postings == index._postings
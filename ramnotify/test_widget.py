@@ -0,0 +1,25 @@
+import pytest
+
+from history import HistoryTier
+
+pytest.importorskip("wx")
+
+from widget import PlotCanvas  # noqa: E402
+
+
+def test_scroll_matches_full_redraw_with_sparse_samples():
+    # 1秒の段に5秒ごとのサンプルを入れ、スクロールした位置と全体を描き直した位置を比べる
+    tier = HistoryTier(1, 600, ("physical", ))
+    width, samples = 300, 60
+    step = width / (samples - 1)
+    last = None
+    for time in range(0, 300, 5):
+        tier.add(float(time), dict(physical=1.))
+        position = tier.appended - 1
+        if last is not None:
+            shift = round(position * step) - round(last * step)
+            for number in range(position - samples + 1, last + 1):
+                scrolled = PlotCanvas._x_of(number - (last - samples + 1), samples, width, step, last) - shift
+                full = PlotCanvas._x_of(number - (position - samples + 1), samples, width, step, position)
+                assert scrolled == full, (time, number)
+        last = position
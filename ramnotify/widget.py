@@ -1,28 +1,46 @@
 import copy
-from typing import Optional, List, Sequence
+from typing import Hashable, Optional, List, Sequence
 
+import numpy as np
 import wx
+import wx.grid
 import wx.lib.agw.pygauge
 
+from decimate import DecimationCache
+from raster import Rasterizer
+
 __all__ = [
+    "BACKENDS",
     "PlotLine",
     "PlotCanvas",
     "PyGauge",
+    "GaugeCellRenderer",
 ]
 
 
+BACKENDS = ("gcdc", "numpy")
+
+
 class PlotLine(object):
     def __init__(self,
                  min_value: float, max_value: float,
-                 values: Sequence[float], color: wx.Colour, fill_color: wx.Colour = None):
+                 values: Sequence[float], color: wx.Colour, fill_color: wx.Colour = None,
+                 version: Hashable = None):
         self.min_value = min_value
         self.max_value = max_value
         self.values = values
         self.color = color
         self.fill_color = fill_color
+        self.version = version  # values の内容を表す値 (同じ値の間は間引いた結果を使い回す)
 
 
 class PlotCanvas(wx.Panel):
+    """
+    PlotLine を右端が最新になるように描画するキャンバス
+
+    draw() に最新サンプルの通し番号 (position) を渡すと、前回の描画をサンプルの増えた分だけ左へずらし、
+    右端の新しい部分だけを描き足します (サイズやスケールが変わった場合は全体を描き直します)
+    """
     _buffer: wx.Bitmap
 
     def __init__(self, parent, id=wx.ID_ANY, pos=wx.DefaultPosition,
@@ -44,8 +62,17 @@ class PlotCanvas(wx.Panel):
         self.SetBackgroundColour(wx.BLACK)
 
         self._last_draw = None
+        self._last_position = None  # type: int | None
+        self._last_layout = None
         self._count = 0
         self.divider = 5
+        self.incremental = True
+        self.grid_colour = wx.Colour(60, 60, 60)
+        self._pens = {}  # type: dict[tuple, wx.Pen]
+        self._brushes = {}  # type: dict[int, wx.Brush]
+        self.decimation = DecimationCache()
+        self.backend = "gcdc"
+        self._raster = None  # type: Rasterizer | None
 
         self.OnSize(None)
         self.canvas.Bind(wx.EVT_PAINT, self.OnPaint)
@@ -61,13 +88,46 @@ class PlotCanvas(wx.Panel):
         size.height = max(1, size.height)
 
         self._buffer = wx.Bitmap(size.width, size.height)
+        self._back_buffer = wx.Bitmap(size.width, size.height)  # スクロール時の転送先
+        self._last_layout = None
 
         if self._last_draw is None:
             self.clear()
         else:
-            self.draw(self._last_draw)
+            self.draw(self._last_draw, position=self._last_position)
+
+    @staticmethod
+    def _layout_key(size: wx.Size, lines: List[PlotLine]):
+        return (size.width, size.height) + tuple(
+            (len(line.values), line.min_value, line.max_value,
+             line.color.GetRGBA(), line.fill_color and line.fill_color.GetRGBA())
+            for line in lines
+        )
+
+    def draw(self, lines: List[PlotLine], *, position: int = None):
+        """
+        position: 各 PlotLine.values の最後の値の通し番号 (省略した場合は常に全体を描き直します)
+        """
+        size = self._buffer.GetSize()
+        layout = self._layout_key(size, lines)
+        last_position = self._last_position
+        self._last_draw = lines
+        self._last_position = position
+
+        samples = min((len(line.values) for line in lines), default=0)
+        # 間引いて描く場合は点の位置がサンプルと対応しないため、スクロールせずに描き直す
+        if self.backend == "numpy":
+            self._draw_raster(lines, position)
+        elif (self.incremental and position is not None and last_position is not None
+              and samples - 1 <= size.width and layout == self._last_layout
+              and 0 <= position - last_position < samples - 2):
+            self._draw_scroll(lines, position, position - last_position)
+        else:
+            self._draw_full(lines, position)
+        self._last_layout = layout
+        self._count += 1
 
-    def draw(self, lines: List[PlotLine]):
+    def _draw_full(self, lines: List[PlotLine], position: Optional[int]):
         dc = wx.BufferedDC(wx.ClientDC(self.canvas), self._buffer)
         dc = wx.GCDC(dc)
         bbr = wx.Brush(self.GetBackgroundColour(), wx.BRUSHSTYLE_SOLID)
@@ -75,55 +135,179 @@ class PlotCanvas(wx.Panel):
         dc.SetBackgroundMode(wx.SOLID)
         dc.Clear()
 
-        self._draw_background_line(dc)
+        self._draw_background_line(dc, position)
+
+        for key, line in enumerate(lines):
+            self._draw_line(dc, line, position, key=key)
+
+    def _draw_scroll(self, lines: List[PlotLine], position: int, advance: int):
+        width, height = self._buffer.GetSize()
+        samples = min(len(line.values) for line in lines)
+        step = width / (samples - 1)
+        shift = round(position * step) - round((position - advance) * step)
+
+        # 同じビットマップ内での重なった転送は環境によって壊れるため、もう1枚のビットマップへ転送して入れ替える
+        if shift:
+            src = wx.MemoryDC(self._buffer)
+            dst = wx.MemoryDC(self._back_buffer)
+            dst.Blit(0, 0, width - shift, height, src, shift, 0)
+            del src, dst
+            self._buffer, self._back_buffer = self._back_buffer, self._buffer
+
+        # 追加されたサンプルと、値が更新されている可能性のある直前のサンプルまでを描き直す
+        first = samples - 2 - advance
+        left = self._x_of(first, samples, width, step, position)
+
+        dc = wx.BufferedDC(wx.ClientDC(self.canvas), self._buffer)
+        dc = wx.GCDC(dc)
+        dc.SetClippingRegion(left, 0, width - left, height)
+        dc.SetPen(wx.TRANSPARENT_PEN)
+        dc.SetBrush(wx.Brush(self.GetBackgroundColour(), wx.BRUSHSTYLE_SOLID))
+        dc.DrawRectangle(left, 0, width - left, height)
+
+        self._draw_background_line(dc, position)
 
         for line in lines:
-            self._draw_line(dc, line)
+            self._draw_line(dc, line, position, max(0, first - 1))
+        dc.DestroyClippingRegion()
 
-        self._count += 1
-        pass
+    @staticmethod
+    def _x_of(index: int, count: int, width: int, step: float, position: Optional[int]):
+        """
+        count 件のうち index 番目の値の x 座標
 
-    def _draw_line(self, dc: wx.DC, line: PlotLine):
-        width, height = dc.GetSize()
+        通し番号から丸めるため、スクロールで何サンプルずらしても全体を描き直した場合と同じ位置になります
+        """
+        if position is None:
+            position = count - 1
+        return width - (round(position * step) - round((position - count + 1 + index) * step))
+
+    def _pen(self, colour: wx.Colour, width: int = 1) -> wx.Pen:
+        key = colour.GetRGBA(), width
+        pen = self._pens.get(key)
+        if pen is None:
+            self._pens[key] = pen = wx.Pen(colour, width=width)
+        return pen
+
+    def _brush(self, colour: wx.Colour) -> wx.Brush:
+        key = colour.GetRGBA()
+        brush = self._brushes.get(key)
+        if brush is None:
+            self._brushes[key] = brush = wx.Brush(colour)
+        return brush
+
+    @staticmethod
+    def _x_array(indexes: np.ndarray, count: int, width: int, step: float, position: Optional[int]) -> np.ndarray:
+        """
+        _x_of() を indexes の全ての値についてまとめて計算します
+        """
+        if position is None:
+            position = count - 1
+        numbers = (indexes + (position - count + 1)).astype(np.float64)
+        return width - (round(position * step) - np.rint(numbers * step)).astype(np.int64)
+
+    def _line_points(self, line: PlotLine, width: int, height: int, position: Optional[int], first: int,
+                     key=None):
+        count = len(line.values)
+        values = np.asarray(line.values, dtype=np.float64)
         min_v, max_v = line.min_value, line.max_value
+        # 途中の未記録 (NaN) の値は直前の値を引き継ぎ、記録が始まる前の値は最小値として扱う
+        missing = np.isnan(values)
+        if missing.any():
+            filled = np.where(missing, 0, np.arange(count))
+            values = values[np.maximum.accumulate(filled)]
+        values = np.clip(np.nan_to_num(values, nan=min_v), min_v, max_v)
+        if first == 0 and count - 1 > width:
+            # 1ピクセルに複数の点が重なるため、キャンバスの幅程度まで間引く
+            indexes = self.decimation.indexes(key, values, max(3, width), line.version if key is not None else None)
+        else:
+            indexes = np.arange(first, count)
+        ys = np.rint(height - (values[indexes] - min_v) / (max_v - min_v) * height).astype(np.int64)
+        xs = self._x_array(indexes, count, width, width / (count - 1), position)
+        return np.column_stack((xs, ys))
 
-        val_width = width / (len(line.values) - 1)
-        vh = vw = None
-        for idx, val in enumerate(line.values):
-            val = max(min_v, min(val, max_v))
-            val_height = (val - min_v) / (max_v - min_v) * height
-
-            if vh is not None and vw is not None:
-                if line.fill_color is not None:
-                    dc.SetPen(wx.Pen(wx.Colour(0, 0, 0, 0)))
-                    dc.SetBrush(wx.Brush(line.fill_color))
-                    dc.DrawPolygon(
-                        (
-                            (vw, height - vh),
-                            (vw + val_width, height - val_height),
-                            (vw + val_width, height),
-                            (vw, height),
-                        ),
-                    )
-
-                dc.SetPen(wx.Pen(line.color, width=2))
-                dc.DrawLine(vw, height - vh, vw + val_width, height - val_height)
-
-            vh = val_height
-            vw = 0 if vw is None else vw + val_width
-
-    def _draw_background_line(self, dc: wx.DC):
+    def _draw_line(self, dc: wx.DC, line: PlotLine, position: int = None, first: int = 0, key=None):
         width, height = dc.GetSize()
-        dc.SetPen(wx.Pen(wx.Colour(60, 60, 60), width=1))
+        points = self._line_points(line, width, height, position, first, key)
+        if len(points) < 2:
+            return
+
+        if line.fill_color is not None:
+            polygon = np.concatenate((
+                [[points[0, 0], height]],
+                points,
+                [[points[-1, 0], height]],
+            )).tolist()
+            dc.SetPen(wx.TRANSPARENT_PEN)
+            dc.SetBrush(self._brush(line.fill_color))
+            dc.DrawPolygon(polygon)
+
+        dc.SetPen(self._pen(line.color, 2))
+        dc.DrawLines(points.tolist())
+
+    def _draw_background_line(self, dc: wx.DC, position: int = None):
+        width, height = dc.GetSize()
+        ys, xs = self._grid_lines(width, height, position)
+        lines = [(0, y, width, y) for y in ys]
+        lines.extend((x, 0, x, height) for x in xs)
+        dc.SetPen(self._pen(self.grid_colour))
+        dc.DrawLineList(lines)
+
+    def _grid_lines(self, width: int, height: int, position: Optional[int]):
+        """
+        グリッドの横線の y 座標と縦線の x 座標
+        """
         h = round(height / 10)
-        for n in range(10):
-            y = h * n
-            dc.DrawLine(0, y, width, y)
+        ys = [h * n for n in range(10)]
+
+        # 縦線は divider サンプルごとに引き、サンプルと一緒に流れるようにする
+        samples = 60
+        if self._last_draw:
+            samples = min(len(line.values) for line in self._last_draw)
+        samples = max(2, samples)
+        if position is None:
+            position = self._count
+        xs = self._x_array(np.arange(samples), samples, width, width / (samples - 1), position)
+        numbers = np.arange(position - samples + 1, position + 1)
+        return ys, xs[numbers % self.divider == 0].tolist()
+
+    def set_backend(self, backend: str):
+        """
+        描画方法を切り替えます
+
+        gcdc: wx.GCDC で描画し、サンプルが増えた分だけスクロールします (アンチエイリアスあり)
+        numpy: Rasterizer で NumPy 配列へ描画してからビットマップへ転送します (毎回全体を描画)
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"invalid backend: {backend!r}")
+        self.backend = backend
+        self._last_layout = None
+        self._raster = None
+        if self._last_draw is not None:
+            self.draw(self._last_draw, position=self._last_position)
+
+    def _draw_raster(self, lines: List[PlotLine], position: Optional[int]):
+        width, height = self._buffer.GetSize()
+        raster = self._raster
+        if raster is None:
+            self._raster = raster = Rasterizer(width, height)
+        else:
+            raster.resize(width, height)
+
+        raster.clear(self.GetBackgroundColour().Get(True))
+        ys, xs = self._grid_lines(width, height, position)
+        grid_colour = self.grid_colour.Get(True)
+        raster.hlines(ys, grid_colour)
+        raster.vlines(xs, grid_colour)
 
-        w = round(width / 12)
-        for n in range(12):
-            x = w * n + (5 - self._count % 5) * round(width / 59)
-            dc.DrawLine(x, 0, x, height)
+        for key, line in enumerate(lines):
+            points = self._line_points(line, width, height, position, 0, key)
+            if line.fill_color is not None:
+                raster.fill_area(points, line.fill_color.Get(True))
+            raster.polyline(points, line.color.Get(True))
+
+        self._buffer.CopyFromBuffer(raster.finish(), wx.BitmapBufferFormat_RGB)
+        wx.ClientDC(self.canvas).DrawBitmap(self._buffer, 0, 0)
 
     def clear(self):
         dc = wx.BufferedDC(wx.ClientDC(self.canvas), self._buffer)
@@ -134,6 +318,8 @@ class PlotCanvas(wx.Panel):
         dc.SetTextForeground(self.GetForegroundColour())
         dc.SetTextBackground(self.GetBackgroundColour())
         self._last_draw = None
+        self._last_position = None
+        self._last_layout = None
 
 
 class PyGauge(wx.lib.agw.pygauge.PyGauge):
@@ -199,3 +385,91 @@ class PyGauge(wx.lib.agw.pygauge.PyGauge):
                 textXPos = 0
 
             dc.DrawText(drawString, textXPos, textYPos)
+
+
+class GaugeCellRenderer(wx.grid.GridCellRenderer):
+    """
+    グリッドのセルにゲージとラベルを直接描画します (行ごとに子ウィンドウを作りません)
+
+    値はテーブルの GetGaugeValue(row, col) -> (0.0 ~ 1.0, ラベル) から取得します
+    """
+
+    def __init__(self, bar_colour: wx.Colour, padding: int = 2):
+        wx.grid.GridCellRenderer.__init__(self)
+        self.bar_colour = bar_colour
+        self.padding = padding
+        self._bar_brush = wx.Brush(bar_colour)
+
+    def Draw(self, grid: wx.grid.Grid, attr: wx.grid.GridCellAttr, dc: wx.DC, rect: wx.Rect,
+             row: int, col: int, isSelected: bool):
+        value, label = grid.GetTable().GetGaugeValue(row, col)
+
+        if isSelected:
+            background = grid.GetSelectionBackground()
+            foreground = grid.GetSelectionForeground()
+        else:
+            background = attr.GetBackgroundColour()
+            foreground = attr.GetTextColour()
+
+        dc.SetPen(wx.TRANSPARENT_PEN)
+        dc.SetBrush(wx.Brush(background))
+        dc.DrawRectangle(rect)
+
+        bar = wx.Rect(rect)
+        bar.Deflate(self.padding, self.padding)
+        bar.width = round(bar.width * max(0., min(value, 1.)))
+        if bar.width > 0:
+            dc.SetBrush(self._bar_brush)
+            dc.DrawRectangle(bar)
+
+        dc.SetFont(attr.GetFont())
+        dc.SetTextForeground(foreground)
+        dc.SetBackgroundMode(wx.TRANSPARENT)
+        text_width, text_height = dc.GetTextExtent(label)
+        dc.SetClippingRegion(rect)
+        dc.DrawText(label, rect.right - text_width - self.padding, rect.y + (rect.height - text_height) // 2)
+        dc.DestroyClippingRegion()
+
+    def GetBestSize(self, grid: wx.grid.Grid, attr: wx.grid.GridCellAttr, dc: wx.DC, row: int, col: int):
+        _, label = grid.GetTable().GetGaugeValue(row, col)
+        dc.SetFont(attr.GetFont())
+        text_width, text_height = dc.GetTextExtent(label)
+        return wx.Size(text_width + self.padding * 2, text_height + self.padding * 2)
+
+    def Clone(self):
+        return GaugeCellRenderer(self.bar_colour, self.padding)
+
+
+if __name__ == "__main__":
+    # 2つの描画方法で、同じ系列を描く1フレームあたりの時間を比較する
+    import math
+    import time
+
+    _app = wx.App()
+    _frame = wx.Frame(None, size=(700, 300))
+    _canvas = PlotCanvas(_frame)
+    _frame.Show()
+    _app.Yield()
+
+    for _points in (60, 600, 3600):
+        _series = [
+            [50 + 40 * math.sin((_i + _offset) / 17) for _i in range(_points + 200)]
+            for _offset in (0, 40)
+        ]
+        for _backend, _incremental in (("gcdc", False), ("gcdc", True), ("numpy", False)):
+            _canvas.set_backend(_backend)
+            _canvas.incremental = _incremental
+            _canvas.clear()
+            _frames = 100
+            _start = time.perf_counter()
+            for _position in range(_frames):
+                _canvas.draw([
+                    PlotLine(0, 100, _values[_position:_position + _points], wx.Colour(170, 80, 180),
+                             wx.Colour(170, 80, 180, 70), version=_position)
+                    for _values in _series
+                ], position=_position)
+            _elapsed = (time.perf_counter() - _start) / _frames
+            _label = f"{_backend}{' (scroll)' if _incremental else ''}"
+            print(f"{_points:>5} points  {_label:<14} {_elapsed * 1e3:7.2f} ms/frame")
+
+    _frame.Destroy()